@@ -1,10 +1,9 @@
 # 导入 Python 标准库
 import asyncio
-import configparser
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from xhs import XhsClient
 from utils.log import douyin_logger
 
 # 导入工具函数和配置
@@ -14,22 +13,34 @@ from uploader.bilibili_uploader.main import read_cookie_json_file, extract_keys_
 from uploader.douyin_uploader.main import douyin_setup, DouYinVideo
 from uploader.ks_uploader.main import ks_setup, KSVideo
 from uploader.tencent_uploader.main import weixin_setup, TencentVideo
-from uploader.xhs_uploader.main import sign_local, beauty_print
+from myUtils.topic_cache import get_topics
+from uploader.xhs_uploader.client_pool import xhs_client_pool, XhsCookieInvalid
+from uploader.xhs_uploader.main import beauty_print
+from utils.browser_pool import browser_pool
 from utils.constant import VideoZoneTypes, TencentZoneTypes
+from utils.rate_limiter import rate_limiter
 
-config = configparser.RawConfigParser()
-config.read(Path(BASE_DIR / "uploader" / "xhs_uploader" / "accounts.ini"))
+# 一键分发时运行同步上传（Bilibili、XHS）的线程数
+FAN_OUT_THREADS = 2
+# 各平台默认账号：XHS 为 accounts.ini 中的配置节名，其余平台为 cookie 文件
+DEFAULT_ACCOUNTS = {
+    'bilibili': Path(BASE_DIR / "cookies" / "bilibili_uploader" / "account.json"),
+    'xhs': 'account1',
+    'tencent': Path(BASE_DIR / "cookies" / "tencent_uploader" / "account.json"),
+    'douyin': Path(BASE_DIR / "cookies" / "douyin_uploader" / "account.json"),
+    'kuaishou': Path(BASE_DIR / "cookies" / "ks_uploader" / "account.json"),
+}
 
 
 # ==========================
 # 逻辑块：Bilibili 上传
 # ==========================
-def upload_to_bilibili(file, title, tags):
+def upload_to_bilibili(file, title, tags, account_file=None):
     # how to get cookie, see the file of get_bilibili_cookie.py.
-    account_file = Path(BASE_DIR / "cookies" / "bilibili_uploader" / "account.json")
+    account_file = Path(account_file or DEFAULT_ACCOUNTS['bilibili'])
     if not account_file.exists():
         print(f"{account_file.name} 配置文件不存在")
-        return  # 退出函数，相当于原脚本的 exit()
+        return False  # 退出函数，相当于原脚本的 exit()
     cookie_data = read_cookie_json_file(account_file)
     cookie_data = extract_keys_from_json(cookie_data)
 
@@ -49,31 +60,29 @@ def upload_to_bilibili(file, title, tags):
     # I set desc same as title, do what u like.
     desc = title
 
-    bili_uploader = BilibiliUploader(cookie_data, file, title, desc, tid, tags, None)
-    bili_uploader.upload()
-
     # life is beautiful don't so rush. be kind be patience
-    time.sleep(30)
+    # 同一账号发布过于频繁时在这里等待，避免风控
+    rate_limiter.acquire('bilibili', account_file)
+    bili_uploader = BilibiliUploader(cookie_data, file, title, desc, tid, tags, None)
+    return bili_uploader.upload()
 
 
 # ==========================
 # 逻辑块：XHS（小红书）上传
 # ==========================
-def upload_to_xhs(file, title, tags):
-    config = configparser.RawConfigParser()
-    config.read(Path(BASE_DIR / "uploader" / "xhs_uploader" / "accounts.ini"))
-    cookies = config.get('account1', 'cookies')
-    xhs_client = XhsClient(cookies, sign=sign_local, timeout=60)
-
+def upload_to_xhs(file, title, tags, account='account1'):
+    # 同一账号复用客户端和连接，cookie 校验通过后一段时间内不再重复校验
     try:
-        xhs_client.get_video_first_frame_image_id("3214")
-    except:
-        print("cookie 失效")
-        return  # 退出函数，相当于原脚本的 exit()
+        with xhs_client_pool.lease(account) as xhs_client:
+            return _publish_xhs_note(xhs_client, file, title, tags, account)
+    except XhsCookieInvalid as e:
+        print(f"cookie 失效: {e}")
+        return False  # 退出函数，相当于原脚本的 exit()
+
 
+def _publish_xhs_note(xhs_client, file, title, tags, account):
     # 加入到标题 补充标题（xhs 可以填1000字不写白不写）
     tags_str = ' '.join(['#' + tag for tag in tags])
-    hash_tags = []
 
     # 打印视频文件名、标题和 hashtag
     # 视频文件名：C:\Users\Missi\Framework\social - auto - upload - main\videos\demo.mp4
@@ -83,18 +92,13 @@ def upload_to_xhs(file, title, tags):
     print(f"标题：{title}")
     print(f"Hashtag：{tags}")
 
-    topics = []
-    # 获取hashtag
-    for i in tags[:3]:
-        topic_official = xhs_client.get_suggest_topic(i)
-        if topic_official:
-            topic_official[0]['type'] = 'topic'
-            topic_one = topic_official[0]
-            hash_tag_name = topic_one['name']
-            hash_tags.append(hash_tag_name)
-            topics.append(topic_one)
+    # 获取hashtag（重复的标签直接使用本地缓存的话题，不再请求接口）
+    topics = get_topics(xhs_client, tags[:3])
+    hash_tags = [topic['name'] for topic in topics]
 
     hash_tags_str = ' ' + ' '.join(['#' + tag + '[话题]#' for tag in hash_tags])
+    # 同一账号发布过于频繁时在这里等待，避免风控（必要）
+    rate_limiter.acquire('xhs', account)
     note = xhs_client.create_video_note(title=title[:20], video_path=str(file),
                                         desc=title + tags_str + hash_tags_str,
                                         topics=topics,
@@ -102,20 +106,20 @@ def upload_to_xhs(file, title, tags):
                                         post_time=None)
 
     beauty_print(note)
-    # 强制休眠30s，避免风控（必要）
-    time.sleep(30)
+    return True
 
 
 # ==========================
 # 逻辑块：Tencent 上传
 # ==========================
-def upload_to_tencent(file, title, tags):
+async def upload_to_tencent_async(file, title, tags, account_file=None):
     # 获取 cookie 文件
-    account_file = Path(BASE_DIR / "cookies" / "tencent_uploader" / "account.json")
+    account_file = Path(account_file or DEFAULT_ACCOUNTS['tencent'])
 
     # 验证cookie，如果失效则会弹出浏览器登录
     print("[-] 正在验证视频号Cookie，如果失效将自动打开浏览器处理...")
-    asyncio.run(weixin_setup(account_file, handle=True))
+    if not await weixin_setup(account_file, handle=True):
+        return False
     print("[+] Cookie验证或处理完成，继续上传流程。")
 
     category = TencentZoneTypes.LIFESTYLE.value  # 标记原创需要否则不需要传
@@ -125,22 +129,29 @@ def upload_to_tencent(file, title, tags):
     print(f"标题：{title}")
     print(f"Hashtag：{tags}")
     app = TencentVideo(title, file, tags, 0, account_file, category)
-    asyncio.run(app.main(), debug=False)
+    await app.main()
+    return True
+
+
+def upload_to_tencent(file, title, tags, account_file=None):
+    return asyncio.run(upload_to_tencent_async(file, title, tags, account_file), debug=False)
 
 
 # ==========================
 # 逻辑块：Douyin 上传
 # ==========================
-def upload_to_douyin(file, title, tags, headless: bool = False, location: str | None = None):
+async def upload_to_douyin_async(file, title, tags, account_file=None, headless: bool = False,
+                                 location: str | None = None):
     # 获取cookie
-    account_file = Path(BASE_DIR / "cookies" / "douyin_uploader" / "account.json")
+    account_file = Path(account_file or DEFAULT_ACCOUNTS['douyin'])
     # 验证cookie，如果失效则会弹出浏览器登录
     print("[-] 正在验证抖音Cookie，如果失效将自动打开浏览器处理...")
-    asyncio.run(douyin_setup(account_file, handle=True))
+    if not await douyin_setup(account_file, handle=True):
+        return False
     print("[+] Cookie验证或处理完成，继续上传流程。")
 
     # 获取封面图
-    thumbnail_path = file.with_suffix('.png')
+    thumbnail_path = Path(file).with_suffix('.png')
 
     # 打印ビデ文件名、标题和 hashtag
     print(f"视频文件名：{file}")
@@ -152,7 +163,12 @@ def upload_to_douyin(file, title, tags, headless: bool = False, location: str |
     # app = DouYinVideo(title, file, tags, publish_datetimes[index], account_file, thumbnail_path=thumbnail_path)
     # else:
     app = DouYinVideo(title, file, tags, 0, account_file, headless=headless, location=location)
-    asyncio.run(app.main(), debug=False)
+    await app.main()
+    return True
+
+
+def upload_to_douyin(file, title, tags, headless: bool = False, location: str | None = None, account_file=None):
+    return asyncio.run(upload_to_douyin_async(file, title, tags, account_file, headless, location), debug=False)
 
 
 # ==========================
@@ -160,12 +176,13 @@ def upload_to_douyin(file, title, tags, headless: bool = False, location: str |
 # ==========================
 # 函数：上传视频到 Kuaishou
 # 直接复制 upload_video_to_kuaishou.py 的逻辑，未做任何修改
-def upload_to_kuaishou(file, title, tags, headless: bool = False):
+async def upload_to_kuaishou_async(file, title, tags, account_file=None, headless: bool = False):
     # 获取cookie
-    account_file = Path(BASE_DIR / "cookies" / "ks_uploader" / "account.json")
+    account_file = Path(account_file or DEFAULT_ACCOUNTS['kuaishou'])
     # 验证cookie，如果失效则会弹出浏览器登录
     print("[-] 正在验证快手Cookie，如果失效将自动打开浏览器处理...")
-    asyncio.run(ks_setup(account_file, handle=True))
+    if not await ks_setup(account_file, handle=True):
+        return False
     print("[+] Cookie验证或处理完成，继续上传流程。")
 
     # 打印视频文件名、标题和 hashtag
@@ -174,38 +191,114 @@ def upload_to_kuaishou(file, title, tags, headless: bool = False):
     print(f"Hashtag：{tags}")
 
     app = KSVideo(title, file, tags, 0, account_file, headless=headless)
-    asyncio.run(app.main(), debug=False)
+    await app.main()
+    return True
+
+
+def upload_to_kuaishou(file, title, tags, headless: bool = False, account_file=None):
+    return asyncio.run(upload_to_kuaishou_async(file, title, tags, account_file, headless), debug=False)
+
+
+# ==========================
+# 逻辑块：一键分发
+# ==========================
+async def _run_target(platform, account, file, title, tags, headless, thread_pool):
+    loop = asyncio.get_running_loop()
+    if platform == 'bilibili':
+        # 同步上传放到线程池，不阻塞事件循环中的浏览器上传
+        return await loop.run_in_executor(thread_pool, upload_to_bilibili, file, title, tags, account)
+    if platform == 'xhs':
+        return await loop.run_in_executor(thread_pool, upload_to_xhs, file, title, tags, account)
+    if platform == 'tencent':
+        return await upload_to_tencent_async(file, title, tags, account)
+    if platform == 'douyin':
+        return await upload_to_douyin_async(file, title, tags, account, headless=headless)
+    if platform == 'kuaishou':
+        return await upload_to_kuaishou_async(file, title, tags, account, headless=headless)
+    raise ValueError(f"不支持的平台: {platform}")
+
+
+async def _timed_target(platform, account, file, title, tags, headless, thread_pool):
+    started = time.monotonic()
+    report = {'platform': platform, 'account': str(account)}
+    try:
+        ok = await _run_target(platform, account, file, title, tags, headless, thread_pool)
+        report['status'] = 'success' if ok is not False else 'failed'
+        report['error'] = None if ok is not False else 'cookie 无效或上传未完成'
+    except Exception as e:
+        douyin_logger.exception(f"[fan-out] {platform} {account} 上传失败")
+        report['status'] = 'failed'
+        report['error'] = f"{type(e).__name__}: {e}"
+    report['elapsed'] = round(time.monotonic() - started, 1)
+    return report
+
+
+async def fan_out_async(file, title, tags, targets, headless: bool = False):
+    """
+    把一个视频并发发布到多个 (平台, 账号)
+
+    浏览器上传（视频号、抖音、快手）在同一个事件循环中共享浏览器池，
+    同步上传（Bilibili、XHS）放到线程池执行；单个目标失败不影响其他目标。
+
+    Args:
+        targets: [(platform, account), ...]，platform 为 bilibili / xhs / tencent / douyin / kuaishou，
+                 account 为 None 时使用 DEFAULT_ACCOUNTS 中的默认账号
+    Returns:
+        list: 与 targets 顺序一致的状态报告，每项包含 platform、account、status、error、elapsed
+    """
+    # 同一 (平台, 账号) 只发布一次，避免同一份 cookie 同时登录多个浏览器
+    unique_targets = []
+    for platform, account in targets:
+        target = (platform, account or DEFAULT_ACCOUNTS.get(platform))
+        if target not in unique_targets:
+            unique_targets.append(target)
+
+    with ThreadPoolExecutor(max_workers=FAN_OUT_THREADS) as thread_pool:
+        async with browser_pool.session():
+            return await asyncio.gather(*[
+                _timed_target(platform, account, file, title, tags, headless, thread_pool)
+                for platform, account in unique_targets
+            ])
+
+
+def print_fan_out_report(reports):
+    print("\n=== 发布结果 ===")
+    for report in reports:
+        mark = '✅' if report['status'] == 'success' else '❌'
+        line = f"{mark} {report['platform']:<9} {report['account']}  {report['elapsed']}s"
+        if report['error']:
+            line += f"  {report['error']}"
+        print(line)
+
+
+def fan_out(file, title, tags, targets, headless: bool = False):
+    """
+    fan_out_async 的同步入口，打印并返回状态报告
+    """
+    reports = asyncio.run(fan_out_async(file, title, tags, targets, headless=headless))
+    print_fan_out_report(reports)
+    return reports
 
 
 # ==========================
 # 逻辑块：程序主入口
 # ==========================
-# 这是程序的起点，按顺序调用五个平台的上传函数
+# 这是程序的起点，把同一个视频同时发布到选中的平台
 if __name__ == '__main__':
     print("=== 开始一键上传到所有平台 ===")
     file = Path(r"C:\Users\Missi\Framework\social-auto-upload\videos\demo.mp4")
     title = "这位勇敢的男子为了心爱之人每天坚守 🥺❤️‍🩹🍋"
     tags = ['坚持不懈', '爱情执着', '奋斗使者', '短视频']
 
-    # 调用 Bilibili 上传
-    # print("\n=== Bilibili ===")
-    # upload_to_bilibili(file=file, title=title, tags=tags)
-
-    # 调用 XHS 上传
-    # print("\n=== XHS ===")
-    # upload_to_xhs(file=file, title=title, tags=tags)
-
-    # # 调用 Tencent 上传
-    # print("\n=== Tencent ===")
-    # upload_to_tencent(file=file, title=title, tags=tags)
-
-    # # 调用 Douyin 上传
-    print("\n=== Douyin ===")
-    upload_to_douyin(file=file, title=title, tags=tags)
-
-    # # 调用 Kuaishou 上传
-    # print("\n=== Kuaishou ===")
-    # upload_to_kuaishou(file=file, title=title, tags=tags)
+    # (平台, 账号)，账号为 None 时使用默认账号；取消注释即可同时发布到对应平台
+    targets = [
+        # ('bilibili', None),
+        # ('xhs', 'account1'),
+        # ('tencent', None),
+        ('douyin', None),
+        # ('kuaishou', None),
+    ]
+    fan_out(file, title, tags, targets)
 
     # 所有上传完成
     print("\n=== 所有平台上传完成！ ===")
@@ -1,11 +1,16 @@
+import asyncio
+import functools
+import time
+import uuid
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
 
-from api_main import upload_to_kuaishou, upload_to_bilibili, upload_to_xhs, upload_to_tencent, upload_to_douyin
+from api_main import upload_to_kuaishou_async, upload_to_bilibili, upload_to_xhs, upload_to_tencent_async, \
+    upload_to_douyin_async
 from conf import BASE_DIR
 from uploader.douyin_uploader.main import douyin_setup
 from uploader.ks_uploader.main import ks_setup
@@ -15,6 +20,22 @@ from myUtils.auth import cookie_auth_douyin, cookie_auth_tencent, cookie_auth_ks
 # 配置 FastAPI 应用，设置标题和描述
 app = FastAPI(title="自动化部署视频", description="通过API来自动化部署视频到各个平台。")
 
+# 同时执行的上传任务数，超出的任务排队等待
+API_MAX_CONCURRENT_UPLOADS = 4
+# 同步上传（B站、小红书）使用的线程数
+API_SYNC_UPLOAD_THREADS = 2
+# 内存中保留的已结束任务数，超出后删除最早的任务
+API_JOB_HISTORY = 200
+JOB_FINISHED_STATUSES = ('success', 'failed', 'cancelled')
+# 在线程池中执行、开始后无法取消的平台
+SYNC_UPLOAD_PLATFORMS = ('bilibili', 'xhs')
+
+_sync_executor = ThreadPoolExecutor(max_workers=API_SYNC_UPLOAD_THREADS, thread_name_prefix="api-upload")
+_upload_slots = asyncio.Semaphore(API_MAX_CONCURRENT_UPLOADS)
+# job_id -> 任务信息 / asyncio.Task
+_jobs = {}
+_tasks = {}
+
 
 # 定义 Pydantic 模型，用于请求体
 class UploadRequest(BaseModel):
@@ -25,77 +46,125 @@ class UploadRequest(BaseModel):
     location: str | None = None
 
 
+async def _run_job(job, func, *args, **kwargs):
+    async with _upload_slots:
+        if job['status'] == 'cancelled':
+            return
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        try:
+            if asyncio.iscoroutinefunction(func):
+                ok = await func(*args, **kwargs)
+            else:
+                # 同步上传放到共享线程池，不阻塞事件循环
+                loop = asyncio.get_running_loop()
+                ok = await loop.run_in_executor(_sync_executor, functools.partial(func, *args, **kwargs))
+            job['status'] = 'success' if ok is not False else 'failed'
+            if ok is False:
+                job['error'] = 'cookie 无效或上传未完成'
+        except asyncio.CancelledError:
+            job['status'] = 'cancelled'
+            raise
+        except Exception as e:
+            print(f"[-] 上传任务 {job['id']} 失败: {e}")
+            job['status'] = 'failed'
+            job['error'] = f"{type(e).__name__}: {e}"
+        finally:
+            job['finished_at'] = time.time()
+
+
+def _prune_jobs():
+    finished = [job for job in _jobs.values() if job['status'] in JOB_FINISHED_STATUSES]
+    for job in sorted(finished, key=lambda j: j['created_at'])[:max(0, len(finished) - API_JOB_HISTORY)]:
+        _jobs.pop(job['id'], None)
+
+
+def submit_job(platform, func, *args, **kwargs):
+    """
+    创建上传任务并立即返回任务信息，任务在当前事件循环中后台执行
+    """
+    _prune_jobs()
+    job_id = uuid.uuid4().hex
+    job = {'id': job_id, 'platform': platform, 'status': 'queued', 'error': None,
+           'created_at': time.time(), 'started_at': None, 'finished_at': None}
+    _jobs[job_id] = job
+    task = asyncio.create_task(_run_job(job, func, *args, **kwargs))
+    _tasks[job_id] = task
+    task.add_done_callback(lambda t: _tasks.pop(job_id, None))
+    return job
+
+
+def _job_response(job, message):
+    return {"message": message, "job_id": job['id'], "status": job['status']}
+
+
 @app.post("/api/bilibili", summary="将视频部署到 B 站")
 async def api_bilibili(request: UploadRequest):
-    """测试方法：接收 file_path, title, tags 并触发 Bilibili 视频上传"""
-    with ThreadPoolExecutor() as executor:
-        # 将 Pydantic 模型的字段传递给上传函数
-        executor.submit(
-            upload_to_bilibili,
-            file=Path(request.file_path),
-            title=request.title,
-            tags=request.tags
-        ).result()
-    return {"message": "视频已成功上传至B站!"}
+    """测试方法：接收 file_path, title, tags 并触发 Bilibili 视频上传，立即返回任务 ID"""
+    job = submit_job('bilibili', upload_to_bilibili, file=Path(request.file_path), title=request.title,
+                     tags=request.tags)
+    return _job_response(job, "B站上传任务已提交")
 
 
 @app.post("/api/xhs", summary="将视频部署到小红书。")
 async def api_xhs(request: UploadRequest):
-    """测试方法：接收 file_path, title, tags 并触发 小红书 视频上传"""
-    with ThreadPoolExecutor() as executor:
-        # 将 Pydantic 模型的字段传递给上传函数
-        executor.submit(
-            upload_to_xhs,
-            file=Path(request.file_path),
-            title=request.title,
-            tags=request.tags
-        ).result()
-    return {"message": "视频已成功上传至小红书!"}
+    """测试方法：接收 file_path, title, tags 并触发 小红书 视频上传，立即返回任务 ID"""
+    job = submit_job('xhs', upload_to_xhs, file=Path(request.file_path), title=request.title, tags=request.tags)
+    return _job_response(job, "小红书上传任务已提交")
 
 
 @app.post("/api/tencent", summary="将视频部署到视频号。")
 async def api_tencent(request: UploadRequest):
-    """测试方法：接收 file_path, title, tags 并触发 视频号 视频上传"""
-    with ThreadPoolExecutor() as executor:
-        # 将 Pydantic 模型的字段传递给上传函数
-        executor.submit(
-            upload_to_tencent,
-            file=Path(request.file_path),
-            title=request.title,
-            tags=request.tags
-        ).result()
-    return {"message": "视频已成功上传至视频号!"}
+    """测试方法：接收 file_path, title, tags 并触发 视频号 视频上传，立即返回任务 ID"""
+    job = submit_job('tencent', upload_to_tencent_async, file=Path(request.file_path), title=request.title,
+                     tags=request.tags)
+    return _job_response(job, "视频号上传任务已提交")
 
 
 @app.post("/api/douyin", summary="将视频部署到抖音。")
 async def api_douyin(request: UploadRequest):
-    """测试方法：接收 file_path, title, tags 并触发 抖音 视频上传"""
-    with ThreadPoolExecutor() as executor:
-        # 将 Pydantic 模型的字段传递给上传函数
-        executor.submit(
-            upload_to_douyin,
-            file=Path(request.file_path),
-            title=request.title,
-            tags=request.tags,
-            headless=request.headless,
-            location=request.location
-        ).result()
-    return {"message": "视频已成功上传至抖音!"}
+    """测试方法：接收 file_path, title, tags 并触发 抖音 视频上传，立即返回任务 ID"""
+    job = submit_job('douyin', upload_to_douyin_async, file=Path(request.file_path), title=request.title,
+                     tags=request.tags, headless=request.headless, location=request.location)
+    return _job_response(job, "抖音上传任务已提交")
 
 
 @app.post("/api/kuaishou", summary="将视频部署到快手。")
 async def api_kuaishou(request: UploadRequest):
-    """测试方法：接收 file_path, title, tags 并触发 kuaishou 视频上传"""
-    with ThreadPoolExecutor() as executor:
-        # 将 Pydantic 模型的字段传递给上传函数
-        executor.submit(
-            upload_to_kuaishou,
-            file=Path(request.file_path),
-            title=request.title,
-            tags=request.tags,
-            headless=request.headless
-        ).result()
-    return {"message": "视频已成功上传至快手!"}
+    """测试方法：接收 file_path, title, tags 并触发 kuaishou 视频上传，立即返回任务 ID"""
+    job = submit_job('kuaishou', upload_to_kuaishou_async, file=Path(request.file_path), title=request.title,
+                     tags=request.tags, headless=request.headless)
+    return _job_response(job, "快手上传任务已提交")
+
+
+@app.get("/jobs/{job_id}", summary="查询上传任务状态")
+async def get_job(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", summary="取消上传任务")
+async def cancel_job(job_id: str):
+    """
+    排队中的任务直接取消，浏览器上传会在下一个 await 处中断；
+    已经在线程池中执行的同步上传（B站、小红书）无法中断，返回 409
+    """
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job['status'] in JOB_FINISHED_STATUSES:
+        return {"message": "任务已结束", "job": job}
+    if job['status'] == 'running' and job['platform'] in SYNC_UPLOAD_PLATFORMS:
+        raise HTTPException(status_code=409, detail="该平台的上传已经开始，无法中断")
+    if job['status'] == 'queued':
+        job['status'] = 'cancelled'
+        job['finished_at'] = time.time()
+    task = _tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+    return {"message": "已请求取消", "job": job}
 
 
 @app.post("/auth/douyin", summary="验证抖音的cookie是否有效。")
@@ -9,34 +9,197 @@ db_file = './database.db'
 # if os.path.exists(db_file):
 #     os.remove(db_file)
 
-# 连接到SQLite数据库（如果文件不存在则会自动创建）
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
-
-# 创建账号记录表
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS user_info (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    type INTEGER NOT NULL,
-    filePath TEXT NOT NULL,  -- 存储文件路径
-    userName TEXT NOT NULL,
-    status INTEGER DEFAULT 0
-)
-''')
-
-# 创建文件记录表
-cursor.execute('''CREATE TABLE IF NOT EXISTS file_records (
-    id INTEGER PRIMARY KEY AUTOINCREMENT, -- 唯一标识每条记录
-    filename TEXT NOT NULL,               -- 文件名
-    filesize REAL,                     -- 文件大小（单位：MB）
-    upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, -- 上传时间，默认当前时间
-    file_path TEXT                        -- 文件路径
-)
-''')
-
-
-# 提交更改
-conn.commit()
-print("✅ 表创建成功")
-# 关闭连接
-conn.close()
\ No newline at end of file
+
+def _create_base_tables(cursor):
+    # 创建账号记录表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_info (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type INTEGER NOT NULL,
+        filePath TEXT NOT NULL,  -- 存储文件路径
+        userName TEXT NOT NULL,
+        status INTEGER DEFAULT 0
+    )
+    ''')
+
+    # 创建文件记录表
+    cursor.execute('''CREATE TABLE IF NOT EXISTS file_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, -- 唯一标识每条记录
+        filename TEXT NOT NULL,               -- 文件名
+        filesize REAL,                     -- 文件大小（单位：MB）
+        upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, -- 上传时间，默认当前时间
+        file_path TEXT,                       -- 文件路径
+        content_hash TEXT                     -- 文件内容 sha256，用于去重
+    )
+    ''')
+    # 兼容旧数据库：补上 content_hash 列
+    if 'content_hash' not in [row[1] for row in cursor.execute("PRAGMA table_info(file_records)").fetchall()]:
+        cursor.execute('ALTER TABLE file_records ADD COLUMN content_hash TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_records_content_hash ON file_records (content_hash)')
+
+    # 创建发布任务表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS publish_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type INTEGER NOT NULL,                 -- 平台 1 小红书 2 视频号 3 抖音 4 快手
+        title TEXT NOT NULL,
+        tags TEXT,                             -- JSON 数组
+        category TEXT,
+        file_path TEXT NOT NULL,               -- videoFile 下的文件名
+        account_file TEXT NOT NULL,            -- cookiesFile 下的文件名
+        publish_time DATETIME,                 -- 定时发布时间，为空表示立即发布
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_publish_jobs_status ON publish_jobs (status, id)')
+
+    # 创建发布限流令牌桶表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        bucket TEXT PRIMARY KEY,               -- platform:<平台> 或 account:<平台>:<账号>
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL               -- unix 时间戳，用于重启后继续计算补充的令牌
+    )
+    ''')
+
+    # 创建分片上传会话表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS upload_sessions (
+        upload_id TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,                -- 素材显示名
+        file_path TEXT NOT NULL,               -- videoFile 下的最终文件名
+        total_size INTEGER NOT NULL,
+        chunk_size INTEGER NOT NULL,
+        received INTEGER NOT NULL DEFAULT 0,   -- 已确认写入的字节数，断点续传从这里继续
+        save_record INTEGER NOT NULL DEFAULT 1, -- 完成后是否写入 file_records
+        status TEXT NOT NULL DEFAULT 'uploading',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _add_list_indexes(cursor):
+    # 账号列表按平台、状态筛选
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_info_type_status ON user_info (type, status)')
+    # 素材列表按上传时间排序
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_records_upload_time ON file_records (upload_time)')
+
+
+def _add_material_size_index(cursor):
+    # 素材列表按文件大小排序
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_records_filesize ON file_records (filesize)')
+
+
+def _add_publish_history(cursor):
+    # 发布任务记录内容哈希，以及是否允许重复发布（允许时不检查发布历史）
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(publish_jobs)").fetchall()]
+    if 'content_hash' not in columns:
+        cursor.execute('ALTER TABLE publish_jobs ADD COLUMN content_hash TEXT')
+    if 'allow_republish' not in columns:
+        cursor.execute('ALTER TABLE publish_jobs ADD COLUMN allow_republish INTEGER NOT NULL DEFAULT 0')
+
+    # 创建发布历史表，每条记录对应一次成功的发布
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS publish_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_hash TEXT NOT NULL,            -- 素材内容 sha256（没有时为 file:<文件名>）
+        type INTEGER NOT NULL,                 -- 平台 1 小红书 2 视频号 3 抖音 4 快手
+        account_file TEXT NOT NULL,            -- cookiesFile 下的文件名
+        publish_time TEXT NOT NULL DEFAULT '', -- 定时发布时间，空字符串表示立即发布
+        job_id INTEGER,                        -- 对应的 publish_jobs.id
+        file_path TEXT,
+        title TEXT,
+        published_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # 幂等键：同一内容、平台、账号、发布时间只会有一条记录
+    cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS ux_publish_history_key
+    ON publish_history (content_hash, type, account_file, publish_time)''')
+    # 按平台、账号查看历史
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_publish_history_account ON publish_history (type, account_file)')
+
+
+def _add_xhs_topic_cache(cursor):
+    # 创建小红书话题缓存表，按标签缓存 get_suggest_topic 的第一个话题
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS xhs_topic_cache (
+        tag TEXT PRIMARY KEY,
+        topic TEXT,                            -- 话题 JSON，为空表示该标签没有推荐话题
+        fetched_at REAL NOT NULL               -- unix 时间戳，超过有效期后重新请求
+    )
+    ''')
+
+
+def _add_publish_job_cover(cursor):
+    # 发布任务是否设置封面（视频旁的同名 .png 或缓存的竖版封面帧），默认不设置
+    if 'use_cover' not in [row[1] for row in cursor.execute("PRAGMA table_info(publish_jobs)").fetchall()]:
+        cursor.execute('ALTER TABLE publish_jobs ADD COLUMN use_cover INTEGER NOT NULL DEFAULT 0')
+
+
+def _add_publish_history_type_index(cursor):
+    # 只按平台查看历史：(type) 索引中同一平台的记录按 rowid 排列，ORDER BY id 不需要额外排序
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_publish_history_type ON publish_history (type)')
+
+
+def _add_user_info_type_index(cursor):
+    # 只按平台查看账号：(type, status) 索引中同一平台的记录按 status 排列，ORDER BY id 需要临时排序
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_info_type ON user_info (type)')
+
+
+def _add_enqueue_lookup_indexes(cursor):
+    # 入队时在写锁内按 文件 × 账号 查询：按文件名找素材记录（content_key / find_content_hash 也用到），
+    # 按 平台 × 账号 找已有任务
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_records_file_path ON file_records (file_path)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_publish_jobs_account ON publish_jobs (type, account_file)')
+
+
+# 按顺序执行的迁移，数据库当前版本记录在 PRAGMA user_version 中；新增表结构变更时追加到末尾，不要修改已有的迁移
+MIGRATIONS = [
+    _create_base_tables,
+    _add_list_indexes,
+    _add_material_size_index,
+    _add_publish_history,
+    _add_xhs_topic_cache,
+    _add_publish_job_cover,
+    _add_publish_history_type_index,
+    _add_user_info_type_index,
+    _add_enqueue_lookup_indexes,
+]
+
+
+def migrate(conn):
+    """
+    把数据库升级到最新版本，已执行过的迁移会跳过，可以重复调用
+
+    每个迁移在独立的 IMMEDIATE 事务中执行，多个进程同时启动时只有一个会真正执行
+    """
+    # WAL 模式写入数据库文件头，对之后所有连接生效：读写互不阻塞
+    conn.execute('PRAGMA journal_mode=WAL')
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 拿到写锁后再确认一次，其他进程可能刚刚执行完
+            if conn.execute('PRAGMA user_version').fetchone()[0] < version:
+                migration(conn.cursor())
+                conn.execute(f'PRAGMA user_version = {version}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    return len(MIGRATIONS)
+
+
+if __name__ == '__main__':
+    # 连接到SQLite数据库（如果文件不存在则会自动创建）
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    version = migrate(conn)
+    print(f"✅ 表创建成功，数据库版本 {version}")
+    # 关闭连接
+    conn.close()
@@ -0,0 +1,80 @@
+"""
+/getFile 并发 Range 请求压测
+
+模拟多个预览窗口同时拖动进度条：每个请求随机读取视频中的一段字节区间，统计吞吐和延迟。
+
+用法（先启动 sau_backend.py，并在 videoFile 下准备一个较大的视频）：
+    python examples/benchmark_get_file.py <videoFile 下的文件名> --concurrency 32 --requests 500 --range-size 1048576
+"""
+import argparse
+import http.client
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+
+def fetch_range(base_url, filename, size, range_size):
+    parsed = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+    start = random.randrange(0, max(1, size - range_size))
+    end = min(size, start + range_size) - 1
+    started = time.perf_counter()
+    try:
+        conn.request('GET', f"/getFile?filename={quote(filename)}", headers={'Range': f'bytes={start}-{end}'})
+        response = conn.getresponse()
+        body = response.read()
+        return response.status, len(body), time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def get_size(base_url, filename):
+    parsed = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+    try:
+        conn.request('GET', f"/getFile?filename={quote(filename)}", headers={'Range': 'bytes=0-0'})
+        response = conn.getresponse()
+        response.read()
+        content_range = response.getheader('Content-Range')
+        if response.status != 206 or not content_range:
+            raise SystemExit(f"服务器不支持 Range 请求: HTTP {response.status}")
+        return int(content_range.split('/')[-1])
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/getFile Range 请求压测")
+    parser.add_argument('filename')
+    parser.add_argument('--url', default='http://127.0.0.1:5409')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--range-size', type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    size = get_size(args.url, args.filename)
+    print(f"文件大小 {size / 1024 / 1024:.1f} MB，并发 {args.concurrency}，"
+          f"请求 {args.requests} 次，每次 {args.range_size / 1024:.0f} KB")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda _: fetch_range(args.url, args.filename, size, args.range_size),
+                                    range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    total_bytes = sum(length for _, length, _ in results)
+    latencies = sorted(latency for _, _, latency in results)
+    print(f"状态码: {statuses}")
+    print(f"总耗时 {elapsed:.2f}s，{len(results) / elapsed:.1f} req/s，{total_bytes / elapsed / 1024 / 1024:.1f} MB/s")
+    print(f"延迟 p50 {statistics.median(latencies) * 1000:.1f}ms，"
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms，"
+          f"max {latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+小红书签名服务压测
+
+多个线程通过 keep-alive 连接并发请求 /sign，统计每秒签名数和延迟分布。
+首次请求某个 a1 时服务端需要预热页面，压测前会先对每个 a1 签名一次，不计入结果。
+
+用法（先启动 python -m uploader.xhs_uploader.sign_server）：
+    python examples/benchmark_xhs_sign.py --a1 <a1 cookie> --concurrency 16 --requests 1000
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+SIGN_URI = "/api/sns/web/v1/feed"
+SIGN_DATA = {"source_note_id": "000000000000000000000000"}
+
+_local = threading.local()
+
+
+def get_connection(base_url):
+    # 每个线程一个长连接，和签名客户端的连接池行为一致
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        parsed = urlsplit(base_url)
+        conn = _local.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+    return conn
+
+
+def request_sign(base_url, a1):
+    body = json.dumps({"uri": SIGN_URI, "data": SIGN_DATA, "a1": a1, "web_session": ""})
+    started = time.perf_counter()
+    conn = get_connection(base_url)
+    try:
+        conn.request('POST', '/sign', body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        payload = response.read()
+        ok = response.status == 200 and 'x-s' in json.loads(payload)
+        return response.status, ok, time.perf_counter() - started
+    except (OSError, http.client.HTTPException, ValueError):
+        conn.close()
+        _local.conn = None
+        return 0, False, time.perf_counter() - started
+
+
+def percentile(latencies, p):
+    return latencies[max(0, int(len(latencies) * p) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="小红书签名服务压测")
+    parser.add_argument('--url', default='http://127.0.0.1:11901')
+    parser.add_argument('--a1', action='append', required=True, help="可以重复指定多个 a1，请求轮流使用")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    for a1 in args.a1:
+        status, ok, latency = request_sign(args.url, a1)
+        if not ok:
+            raise SystemExit(f"预热失败: HTTP {status}")
+        print(f"预热 a1={a1[:8]}... 耗时 {latency:.2f}s")
+    print(f"并发 {args.concurrency}，请求 {args.requests} 次，a1 {len(args.a1)} 个")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda i: request_sign(args.url, args.a1[i % len(args.a1)]),
+                                    range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    succeeded = sum(1 for _, ok, _ in results if ok)
+    latencies = sorted(latency for _, _, latency in results)
+    print(f"状态码: {statuses}，成功 {succeeded}/{len(results)}")
+    print(f"总耗时 {elapsed:.2f}s，{succeeded / elapsed:.1f} 签名/s")
+    print(f"延迟 p50 {statistics.median(latencies) * 1000:.1f}ms，"
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f}ms，"
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f}ms，"
+          f"max {latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
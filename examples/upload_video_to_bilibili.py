@@ -1,10 +1,10 @@
-import time
 from pathlib import Path
 
 from uploader.bilibili_uploader.main import read_cookie_json_file, extract_keys_from_json, random_emoji, BilibiliUploader
 from conf import BASE_DIR
 from utils.constant import VideoZoneTypes
 from utils.files_times import generate_schedule_time_next_day, get_title_and_hashtags
+from utils.rate_limiter import rate_limiter
 
 if __name__ == '__main__':
     filepath = Path(BASE_DIR) / "videos"
@@ -35,8 +35,7 @@ if __name__ == '__main__':
         print(f"Hashtag：{tags}")
         # I set desc same as title, do what u like.
         desc = title
+        # life is beautiful don't so rush. be kind be patience
+        rate_limiter.acquire('bilibili', account_file)
         bili_uploader = BilibiliUploader(cookie_data, file, title, desc, tid, tags, timestamps[index])
         bili_uploader.upload()
-
-        # life is beautiful don't so rush. be kind be patience
-        time.sleep(30)
@@ -1,15 +1,11 @@
-import configparser
 from pathlib import Path
-from time import sleep
-
-from xhs import XhsClient
 
 from conf import BASE_DIR
 from utils.files_times import generate_schedule_time_next_day, get_title_and_hashtags
-from uploader.xhs_uploader.main import sign_local, beauty_print
-
-config = configparser.RawConfigParser()
-config.read(Path(BASE_DIR / "uploader" / "xhs_uploader" / "accounts.ini"))
+from myUtils.topic_cache import get_topics, warm_up
+from uploader.xhs_uploader.client_pool import xhs_client_pool, XhsCookieInvalid
+from uploader.xhs_uploader.main import beauty_print
+from utils.rate_limiter import rate_limiter
 
 
 if __name__ == '__main__':
@@ -20,49 +16,41 @@ if __name__ == '__main__':
     files = list(folder_path.glob("*.mp4"))
     file_num = len(files)
 
-    cookies = config['account1']['cookies']
-    xhs_client = XhsClient(cookies, sign=sign_local, timeout=60)
-    # auth cookie
-    # 注意：该校验cookie方式可能并没那么准确
+    publish_datetimes = generate_schedule_time_next_day(file_num, 1, daily_times=[16])
+    titles_and_tags = [get_title_and_hashtags(str(file)) for file in files]
+
+    # auth cookie，并先批量预热所有视频的话题，之后每个视频都直接命中缓存
     try:
-        xhs_client.get_video_first_frame_image_id("3214")
-    except:
+        with xhs_client_pool.lease('account1') as xhs_client:
+            warm_up(xhs_client, [tag for _, tags in titles_and_tags for tag in tags[:3]])
+    except XhsCookieInvalid:
         print("cookie 失效")
         exit()
 
-    publish_datetimes = generate_schedule_time_next_day(file_num, 1, daily_times=[16])
-
     for index, file in enumerate(files):
-        title, tags = get_title_and_hashtags(str(file))
+        title, tags = titles_and_tags[index]
         # 加入到标题 补充标题（xhs 可以填1000字不写白不写）
         tags_str = ' '.join(['#' + tag for tag in tags])
-        hash_tags_str = ''
-        hash_tags = []
 
         # 打印视频文件名、标题和 hashtag
         print(f"视频文件名：{file}")
         print(f"标题：{title}")
         print(f"Hashtag：{tags}")
 
-        topics = []
-        # 获取hashtag
-        for i in tags[:3]:
-            topic_official = xhs_client.get_suggest_topic(i)
-            if topic_official:
-                topic_official[0]['type'] = 'topic'
-                topic_one = topic_official[0]
-                hash_tag_name = topic_one['name']
-                hash_tags.append(hash_tag_name)
-                topics.append(topic_one)
+        # 每次借出的都是同一个客户端（同一组 keep-alive 连接），校验有效期内不再重复校验 cookie
+        with xhs_client_pool.lease('account1') as xhs_client:
+            # 获取hashtag（重复的标签直接使用本地缓存的话题，不再请求接口）
+            topics = get_topics(xhs_client, tags[:3])
+            hash_tags = [topic['name'] for topic in topics]
 
-        hash_tags_str = ' ' + ' '.join(['#' + tag + '[话题]#' for tag in hash_tags])
+            hash_tags_str = ' ' + ' '.join(['#' + tag + '[话题]#' for tag in hash_tags])
 
-        note = xhs_client.create_video_note(title=title[:20], video_path=str(file),
-                                            desc=title + tags_str + hash_tags_str,
-                                            topics=topics,
-                                            is_private=False,
-                                            post_time=publish_datetimes[index].strftime("%Y-%m-%d %H:%M:%S"))
+            # 同一账号发布过于频繁时在这里等待，避免风控（必要）
+            rate_limiter.acquire('xhs', 'account1')
+            note = xhs_client.create_video_note(title=title[:20], video_path=str(file),
+                                                desc=title + tags_str + hash_tags_str,
+                                                topics=topics,
+                                                is_private=False,
+                                                post_time=publish_datetimes[index].strftime("%Y-%m-%d %H:%M:%S"))
 
         beauty_print(note)
-        # 强制休眠30s，避免风控（必要）
-        sleep(30)
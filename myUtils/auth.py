@@ -2,15 +2,20 @@ import asyncio
 import configparser
 import os
 
-from playwright.async_api import async_playwright
 from xhs import XhsClient
 
 from conf import BASE_DIR
+from myUtils.cookie_cache import cached_cookie_auth
+from myUtils.cookie_probe import probe_cookie
 from utils.base_social_media import set_init_script
+from utils.browser_pool import browser_pool
 from utils.log import tencent_logger, kuaishou_logger
 from pathlib import Path
 from uploader.xhs_uploader.main import sign_local
 
+# 批量校验 cookie 时每个平台的最大并发数
+COOKIE_CHECK_CONCURRENCY = 3
+
 
 async def wait_for_login_success(page, initial_url, platform_name="平台", timeout=300):
     """
@@ -125,10 +130,14 @@ async def wait_for_login_success(page, initial_url, platform_name="平台", time
             # 异常情况下短暂等待后继续
             await asyncio.sleep(1)
 
+@cached_cookie_auth
 async def cookie_auth_douyin(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
+    # 先用轻量 HTTP 接口探测，结论不明确时再打开浏览器校验
+    probe_result = await probe_cookie('douyin', account_file)
+    if probe_result is not None:
+        return probe_result
+    async with browser_pool.session():
+        context = await browser_pool.new_context(storage_state=account_file, headless=True)
         context = await set_init_script(context)
         page = await context.new_page()
         try:
@@ -161,19 +170,22 @@ async def cookie_auth_douyin(account_file):
             print(f"[-] 抖音Cookie验证过程中发生异常: {e}")
             return False
         finally:
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
 
+@cached_cookie_auth
 async def cookie_auth_tencent(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
+    # 先用轻量 HTTP 接口探测，结论不明确时再打开浏览器校验
+    probe_result = await probe_cookie('tencent', account_file)
+    if probe_result is not None:
+        return probe_result
+    async with browser_pool.session():
+        context = await browser_pool.new_context(storage_state=account_file, headless=True)
         context = await set_init_script(context)
         # 创建一个新的页面
         page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://channels.weixin.qq.com/platform/post/create")
         try:
+            # 访问指定的 URL
+            await page.goto("https://channels.weixin.qq.com/platform/post/create")
             # 等待页面加载稳定，以便获取最终URL
             await page.wait_for_load_state('networkidle', timeout=10000)
             
@@ -204,19 +216,22 @@ async def cookie_auth_tencent(account_file):
                 tencent_logger.error(f"[-] 视频号Cookie验证过程中发生异常: {e}")
                 return False
         finally:
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
 
+@cached_cookie_auth
 async def cookie_auth_ks(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
+    # 先用轻量 HTTP 接口探测，结论不明确时再打开浏览器校验
+    probe_result = await probe_cookie('kuaishou', account_file)
+    if probe_result is not None:
+        return probe_result
+    async with browser_pool.session():
+        context = await browser_pool.new_context(storage_state=account_file, headless=True)
         context = await set_init_script(context)
         # 创建一个新的页面
         page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
         try:
+            # 访问指定的 URL
+            await page.goto("https://cp.kuaishou.com/article/publish/video")
             # 等待页面加载稳定，以便获取最终URL
             await page.wait_for_load_state('networkidle', timeout=10000)
             
@@ -247,33 +262,40 @@ async def cookie_auth_ks(account_file):
                 kuaishou_logger.info(f"[-] 快手Cookie验证过程中发生异常: {e}")
                 return False
         finally:
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
 
 
+@cached_cookie_auth
 async def cookie_auth_xhs(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=account_file)
+    # 先用轻量 HTTP 接口探测，结论不明确时再打开浏览器校验
+    probe_result = await probe_cookie('xhs', account_file)
+    if probe_result is not None:
+        return probe_result
+    async with browser_pool.session():
+        context = await browser_pool.new_context(storage_state=account_file, headless=True)
         context = await set_init_script(context)
         # 创建一个新的页面
         page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
         try:
-            await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
+            # 访问指定的 URL
+            await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
+            try:
+                await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
+            except Exception as e:
+                print(f"[+] 小红书页面跳转异常，cookie可能失效: {e}")
+                return False
+            # 2024.06.17 抖音创作者中心改版
+            if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            else:
+                print("[+] cookie 有效")
+                return True
         except Exception as e:
-            print(f"[+] 小红书页面跳转异常，cookie可能失效: {e}")
-            await context.close()
-            await browser.close()
-            return False
-        # 2024.06.17 抖音创作者中心改版
-        if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
-            print("[+] 等待5秒 cookie 失效")
+            print(f"[-] 小红书Cookie验证过程中发生异常: {e}")
             return False
-        else:
-            print("[+] cookie 有效")
-            return True
+        finally:
+            await browser_pool.release(context)
 
 
 async def check_cookie(type,file_path):
@@ -293,5 +315,31 @@ async def check_cookie(type,file_path):
         case _:
             return False
 
+
+async def check_cookies(accounts, per_platform_limit=COOKIE_CHECK_CONCURRENCY):
+    """
+    并发校验多个账号的 cookie，所有校验共用同一个浏览器池
+
+    Args:
+        accounts: [(type, file_path), ...]
+        per_platform_limit: 每个平台同时校验的账号数量上限，避免同一平台请求过于密集
+
+    Returns:
+        list[bool]: 与 accounts 顺序一一对应的校验结果
+    """
+    semaphores = {}
+
+    async def check_one(type, file_path):
+        semaphore = semaphores.setdefault(type, asyncio.Semaphore(per_platform_limit))
+        async with semaphore:
+            try:
+                return await check_cookie(type, file_path)
+            except Exception as e:
+                print(f"[-] 账号 {file_path} cookie 校验异常: {e}")
+                return False
+
+    async with browser_pool.session():
+        return await asyncio.gather(*(check_one(type, file_path) for type, file_path in accounts))
+
 # a = asyncio.run(check_cookie(1,"3a6cfdc0-3d51-11f0-8507-44e51723d63c.json"))
 # print(a)
\ No newline at end of file
@@ -0,0 +1,265 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.database import execute, query, query_one
+from myUtils.material_store import find_material_by_hash, hash_file, new_content_hasher, record_material
+
+# 默认分片大小，前端可在 init 时指定
+CHUNK_UPLOAD_DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# 单个分片的上限，需要小于 Flask 的 MAX_CONTENT_LENGTH
+CHUNK_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# 从请求体读取、写入磁盘时使用的缓冲区大小，内存占用与文件大小无关
+CHUNK_UPLOAD_BUFFER_SIZE = 1024 * 1024
+# 上传中的文件后缀，完成后重命名为最终文件名
+CHUNK_UPLOAD_PART_SUFFIX = '.part'
+# 超过该时间（秒）没有收到新分片的上传会话视为已放弃，删除 .part 文件和会话记录
+CHUNK_UPLOAD_SESSION_TTL = 24 * 3600
+# 后台清理过期会话的间隔（秒）
+CHUNK_UPLOAD_SWEEP_INTERVAL = 3600
+
+# 上传会话状态
+UPLOAD_UPLOADING = 'uploading'
+UPLOAD_COMPLETED = 'completed'
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+
+class ChunkUploadError(Exception):
+    """
+    分片上传的业务错误，status 为建议返回的 HTTP 状态码，data 为附带给前端的数据（如当前偏移量）
+    """
+
+    def __init__(self, msg, status=400, data=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+        self.data = data
+
+
+# 同一个上传会话的分片串行写入
+_session_locks = {}
+_session_locks_lock = threading.Lock()
+# upload_id -> (偏移量, 整个文件的内容哈希对象)，分片按顺序到达时顺带计算，进程重启后在完成时重新计算
+_content_hashers = {}
+
+
+def _session_lock(upload_id):
+    with _session_locks_lock:
+        if upload_id not in _session_locks:
+            _session_locks[upload_id] = threading.Lock()
+        return _session_locks[upload_id]
+
+
+def _part_path(session):
+    return VIDEO_DIR / (session['file_path'] + CHUNK_UPLOAD_PART_SUFFIX)
+
+
+def _session_info(session):
+    return {
+        "uploadId": session['upload_id'],
+        "filename": session['filename'],
+        "filepath": session['file_path'],
+        "size": session['total_size'],
+        "chunkSize": session['chunk_size'],
+        "offset": session['received'],
+        "status": session['status'],
+    }
+
+
+def get_upload_session(upload_id):
+    session = query_one("SELECT * FROM upload_sessions WHERE upload_id = ?", (upload_id,))
+    if session is None:
+        raise ChunkUploadError("upload session not found", 404)
+    return session
+
+
+def get_upload_status(upload_id):
+    return _session_info(get_upload_session(upload_id))
+
+
+def init_upload(filename, total_size, chunk_size=None, custom_filename=None, save_record=True):
+    """
+    创建上传会话，预先创建 .part 文件
+
+    Returns:
+        dict: 会话信息，前端从 offset 开始按 chunkSize 上传
+    """
+    if not filename or '/' in filename or '\\' in filename or '..' in filename:
+        raise ChunkUploadError("Invalid filename")
+    try:
+        total_size = int(total_size)
+        chunk_size = int(chunk_size or CHUNK_UPLOAD_DEFAULT_CHUNK_SIZE)
+    except (TypeError, ValueError):
+        raise ChunkUploadError("size and chunkSize must be integers")
+    if total_size <= 0:
+        raise ChunkUploadError("size must be positive")
+    chunk_size = max(1, min(chunk_size, CHUNK_UPLOAD_MAX_CHUNK_SIZE))
+
+    # 与 /uploadSave 一致：自定义文件名保留原始扩展名
+    if custom_filename:
+        filename = custom_filename + "." + filename.split('.')[-1]
+    upload_id = uuid.uuid4().hex
+    final_filename = f"{uuid.uuid1()}_{filename}"
+
+    VIDEO_DIR.mkdir(parents=True, exist_ok=True)
+    with open(VIDEO_DIR / (final_filename + CHUNK_UPLOAD_PART_SUFFIX), 'wb'):
+        pass
+    execute('''
+    INSERT INTO upload_sessions (upload_id, filename, file_path, total_size, chunk_size, save_record)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (upload_id, filename, final_filename, total_size, chunk_size, 1 if save_record else 0))
+    return _session_info(get_upload_session(upload_id))
+
+
+def write_chunk(upload_id, offset, stream, length, checksum):
+    """
+    把一个分片从请求流直接写入 .part 文件的 offset 处，带了 checksum 时边读边计算 sha256 校验
+
+    只接受 offset 等于已确认偏移量的分片；长度不足或校验失败时丢弃本次写入，偏移量不变，前端可重传。
+    checksum 可以为空：浏览器在非安全上下文（如 http://局域网IP）中没有 crypto.subtle，无法计算分片哈希。
+    重复发送已确认的分片（例如确认响应丢失后重传）会直接返回当前偏移量。
+
+    Returns:
+        dict: 会话信息，offset 为新的已确认偏移量
+    """
+    try:
+        offset = int(offset)
+        length = int(length)
+    except (TypeError, ValueError):
+        raise ChunkUploadError("offset and Content-Length must be integers")
+
+    with _session_lock(upload_id):
+        session = get_upload_session(upload_id)
+        if session['status'] != UPLOAD_UPLOADING:
+            raise ChunkUploadError("upload already completed", 409, _session_info(session))
+        received = session['received']
+        if offset + length <= received:
+            return _session_info(session)
+        if offset != received:
+            raise ChunkUploadError("offset mismatch", 409, _session_info(session))
+        if length <= 0 or length > session['chunk_size'] or offset + length > session['total_size']:
+            raise ChunkUploadError("invalid chunk length", 400, _session_info(session))
+
+        sha256 = hashlib.sha256() if checksum else None
+        offset_hasher = _content_hashers.get(upload_id)
+        if offset_hasher is None and received == 0:
+            offset_hasher = (0, new_content_hasher())
+        content_hasher = offset_hasher[1].copy() if offset_hasher and offset_hasher[0] == received else None
+        written = 0
+        part_path = _part_path(session)
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(CHUNK_UPLOAD_BUFFER_SIZE, length - written))
+                if not block:
+                    break
+                if sha256 is not None:
+                    sha256.update(block)
+                if content_hasher is not None:
+                    content_hasher.update(block)
+                f.write(block)
+                written += len(block)
+            if written != length or (sha256 is not None and sha256.hexdigest() != checksum.lower()):
+                # 丢弃未确认的数据，下次从 received 重新写
+                f.truncate(received)
+                raise ChunkUploadError("chunk checksum mismatch" if written == length else "incomplete chunk",
+                                       422, _session_info(session))
+
+        execute('''
+        UPDATE upload_sessions SET received = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE upload_id = ? AND received = ?
+        ''', (offset + length, upload_id, received))
+        if content_hasher is not None:
+            _content_hashers[upload_id] = (offset + length, content_hasher)
+        return _session_info(get_upload_session(upload_id))
+
+
+def complete_upload(upload_id):
+    """
+    所有分片确认后把 .part 文件重命名为最终文件（同目录 rename，不再复制），按需写入 file_records
+
+    内容与已有素材相同时删除 .part 文件，直接复用已有素材。
+
+    Returns:
+        dict: 与 /uploadSave 相同的 {"filename", "filepath", "duplicate"}
+    """
+    with _session_lock(upload_id):
+        session = get_upload_session(upload_id)
+        if session['status'] == UPLOAD_COMPLETED:
+            return {"filename": session['filename'], "filepath": session['file_path'], "duplicate": False}
+        if session['received'] != session['total_size']:
+            raise ChunkUploadError("upload not finished", 409, _session_info(session))
+
+        part_path = _part_path(session)
+        offset_hasher = _content_hashers.pop(upload_id, None)
+        if offset_hasher is not None and offset_hasher[0] == session['total_size']:
+            content_hash = offset_hasher[1].hexdigest()
+        else:
+            content_hash = hash_file(part_path)
+
+        existing = find_material_by_hash(content_hash)
+        if existing is not None:
+            part_path.unlink()
+            filename, file_path = existing['filename'], existing['file_path']
+            print(f"♻️ 素材已存在，复用 {file_path}")
+        else:
+            os.replace(part_path, VIDEO_DIR / session['file_path'])
+            filename, file_path = session['filename'], session['file_path']
+            if session['save_record']:
+                record_material(filename, file_path, session['total_size'], content_hash)
+
+        execute('''
+        UPDATE upload_sessions SET status = ?, file_path = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE upload_id = ?
+        ''', (UPLOAD_COMPLETED, file_path, upload_id))
+    with _session_locks_lock:
+        _session_locks.pop(upload_id, None)
+    print(f"✅ 分片上传完成: {file_path}")
+    return {"filename": filename, "filepath": file_path, "duplicate": existing is not None}
+
+
+def expire_stale_uploads(max_age=CHUNK_UPLOAD_SESSION_TTL):
+    """
+    清理超过 max_age 秒没有新分片的上传会话：删除 .part 文件和会话记录，释放内存中的哈希状态和锁
+
+    Returns:
+        int: 清理的会话数
+    """
+    cutoff = f"-{int(max_age)} seconds"
+    stale_sql = "SELECT * FROM upload_sessions WHERE status = ? AND updated_at < datetime('now', ?)"
+    expired = 0
+    for row in query(stale_sql, (UPLOAD_UPLOADING, cutoff)):
+        upload_id = row['upload_id']
+        with _session_lock(upload_id):
+            # 拿到锁后再确认一次，期间可能刚好收到新分片或已经完成
+            session = query_one(stale_sql + " AND upload_id = ?", (UPLOAD_UPLOADING, cutoff, upload_id))
+            if session is None:
+                continue
+            _part_path(session).unlink(missing_ok=True)
+            execute("DELETE FROM upload_sessions WHERE upload_id = ?", (upload_id,))
+            _content_hashers.pop(upload_id, None)
+        with _session_locks_lock:
+            _session_locks.pop(upload_id, None)
+        expired += 1
+    return expired
+
+
+def start_expiry_sweeper(interval=CHUNK_UPLOAD_SWEEP_INTERVAL):
+    """
+    启动后台线程，启动时和之后每隔 interval 秒清理一次过期的上传会话
+    """
+    def run():
+        while True:
+            try:
+                expired = expire_stale_uploads()
+                if expired:
+                    print(f"🧹 已清理 {expired} 个过期的分片上传会话")
+            except Exception as e:
+                print(f"[-] 清理过期的分片上传会话失败: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="chunk-upload-sweeper", daemon=True).start()
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import threading
+import time
+from functools import wraps
+
+from utils.browser_pool import browser_pool
+
+# cookie 校验结果的有效期（秒），期内直接返回缓存结果
+COOKIE_CACHE_TTL = 30 * 60
+# 过期后仍可返回旧结果的时间（秒），同时在后台重新校验（stale-while-revalidate）
+COOKIE_CACHE_STALE_TTL = 2 * 60 * 60
+# 校验失败结果的有效期（秒）：失败可能只是网络或页面加载问题，过期后直接重新校验，不返回旧结果
+COOKIE_CACHE_INVALID_TTL = 60
+# 后台巡检间隔（秒）
+COOKIE_SWEEP_INTERVAL = 60
+# 距离过期还剩多少秒时由巡检提前刷新
+COOKIE_REFRESH_AHEAD = 5 * 60
+# 后台刷新的最大并发数
+COOKIE_REFRESH_CONCURRENCY = 3
+
+
+class _CacheEntry(object):
+    def __init__(self, mtime, valid, checker):
+        self.mtime = mtime
+        self.valid = valid
+        self.checker = checker
+        self.checked_at = time.monotonic()
+        self.refreshing = False
+
+
+class CookieValidityCache(object):
+    """
+    cookie 有效性缓存，按 (cookie 文件路径, 文件修改时间) 作为键
+
+    - TTL 内直接返回缓存结果
+    - 过期但仍在 stale 窗口内时先返回旧结果，并在后台线程重新校验
+    - 校验失败的结果只缓存 invalid_ttl 秒，过期后同步重新校验，避免一次误判让账号长时间显示失效
+    - cookie 文件被重新登录/上传覆盖后修改时间变化，缓存自动失效
+    - 后台巡检会在过期前主动刷新，保证接口和上传前的校验基本都能命中缓存
+
+    校验在独立的后台事件循环线程中执行，调用方可以来自任意线程/事件循环。
+    """
+
+    def __init__(self, ttl=COOKIE_CACHE_TTL, stale_ttl=COOKIE_CACHE_STALE_TTL, invalid_ttl=COOKIE_CACHE_INVALID_TTL,
+                 sweep_interval=COOKIE_SWEEP_INTERVAL, refresh_ahead=COOKIE_REFRESH_AHEAD,
+                 refresh_concurrency=COOKIE_REFRESH_CONCURRENCY):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.invalid_ttl = invalid_ttl
+        self.sweep_interval = sweep_interval
+        self.refresh_ahead = refresh_ahead
+        self.refresh_concurrency = refresh_concurrency
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._sweeper_started = False
+
+    @staticmethod
+    def _key(account_file):
+        return os.path.abspath(str(account_file))
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _fresh_ttl(self, entry):
+        return self.ttl if entry.valid else self.invalid_ttl
+
+    def _max_age(self, entry):
+        # 失败结果没有 stale 窗口
+        return self.ttl + self.stale_ttl if entry.valid else self.invalid_ttl
+
+    def peek(self, account_file):
+        """
+        只读缓存，不触发校验。返回 True/False，没有可用的缓存时返回 None
+        """
+        path = self._key(account_file)
+        mtime = self._mtime(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.mtime != mtime:
+                return None
+            if time.monotonic() - entry.checked_at >= self._max_age(entry):
+                return None
+            return entry.valid
+
+    def mark(self, account_file, valid: bool, checker=None):
+        """
+        直接写入一条结果，例如上传成功并保存 cookie 后，可以确定 cookie 有效
+        """
+        path = self._key(account_file)
+        mtime = self._mtime(path)
+        if mtime is None:
+            return
+        with self._lock:
+            old = self._entries.get(path)
+            checker = checker or (old.checker if old else None)
+            self._entries[path] = _CacheEntry(mtime, valid, checker)
+
+    def invalidate(self, account_file=None):
+        with self._lock:
+            if account_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(account_file), None)
+
+    async def get(self, account_file, checker):
+        """
+        获取 cookie 是否有效，checker 为真正执行校验的协程函数 checker(account_file) -> bool
+        """
+        path = self._key(account_file)
+        mtime = self._mtime(path)
+        if mtime is None:
+            return await checker(account_file)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == mtime:
+                if entry.checker is None:
+                    entry.checker = checker
+                age = time.monotonic() - entry.checked_at
+                if age < self._fresh_ttl(entry):
+                    return entry.valid
+                if age < self._max_age(entry):
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        self._submit(self._refresh(path, entry))
+                    return entry.valid
+        valid = await checker(account_file)
+        self._store(path, mtime, valid, checker)
+        return valid
+
+    def _store(self, path, mtime, valid, checker):
+        with self._lock:
+            # 校验期间文件可能被覆盖，只保存与校验时一致的版本
+            if self._mtime(path) == mtime:
+                self._entries[path] = _CacheEntry(mtime, valid, checker)
+
+    async def _refresh(self, path, entry):
+        try:
+            valid = await entry.checker(path)
+            self._store(path, entry.mtime, valid, entry.checker)
+        except Exception as e:
+            print(f"[-] 后台刷新 cookie 校验结果失败 {path}: {e}")
+        finally:
+            entry.refreshing = False
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="cookie-cache", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def start_sweeper(self):
+        """
+        启动后台巡检，在缓存过期前主动刷新，可重复调用
+        """
+        with self._lock:
+            if self._sweeper_started:
+                return
+            self._sweeper_started = True
+        self._submit(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
+
+        async def refresh(path, entry):
+            async with semaphore:
+                await self._refresh(path, entry)
+
+        # 整个巡检过程共用一个浏览器池会话，避免每次刷新都冷启动浏览器
+        async with browser_pool.session():
+            while True:
+                await asyncio.sleep(self.sweep_interval)
+                due = []
+                now = time.monotonic()
+                with self._lock:
+                    for path, entry in list(self._entries.items()):
+                        age = now - entry.checked_at
+                        if entry.mtime != self._mtime(path) or age >= self._max_age(entry):
+                            del self._entries[path]
+                        elif (entry.valid and entry.checker and not entry.refreshing
+                              and age >= self.ttl - self.refresh_ahead):
+                            entry.refreshing = True
+                            due.append((path, entry))
+                if due:
+                    await asyncio.gather(*(refresh(path, entry) for path, entry in due))
+
+
+cookie_cache = CookieValidityCache()
+
+
+def cached_cookie_auth(func):
+    """
+    给 cookie_auth_* 校验函数加上 cookie_cache 缓存，原始函数可通过 __wrapped__ 访问
+    """
+    @wraps(func)
+    async def wrapper(account_file):
+        return await cookie_cache.get(account_file, func)
+
+    return wrapper
+
+
+async def save_published_cookie(context, account_file):
+    """
+    发布成功后保存浏览器上下文的 cookie，并直接记为有效，避免下次上传前重复校验
+    """
+    await context.storage_state(path=str(account_file))
+    cookie_cache.mark(account_file, True)
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+# 是否先用 HTTP 接口探测 cookie，结论不明确时再回退到浏览器校验
+COOKIE_PROBE_ENABLED = True
+# 单次探测的超时时间（秒）
+COOKIE_PROBE_TIMEOUT = 8
+
+PROBE_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
+
+
+def _judge_douyin(data):
+    return data.get('status_code') == 0 and bool(data.get('user'))
+
+
+def _judge_tencent(data):
+    return data.get('errCode') == 0 and bool((data.get('data') or {}).get('finderUser'))
+
+
+def _judge_ks(data):
+    return data.get('result') == 1 and bool(data.get('data'))
+
+
+def _judge_xhs(data):
+    return data.get('success') is True and data.get('code') == 0 and bool(data.get('data'))
+
+
+# 各平台用于探测登录态的轻量接口，judge 只负责识别"已登录"的响应
+# login_pages 为各平台登录页的 (域名, 路径前缀)，接口重定向到这些地址时说明 cookie 已失效
+# 测试时可以把 url 和 login_pages 指向本地模拟跳转行为的服务
+PROBE_ENDPOINTS = {
+    'douyin': {
+        'method': 'GET',
+        'url': 'https://creator.douyin.com/web/api/media/user/info/',
+        'referer': 'https://creator.douyin.com/creator-micro/content/upload',
+        'judge': _judge_douyin,
+        'login_pages': [('sso.douyin.com', '/'), ('creator.douyin.com', '/login')],
+    },
+    'tencent': {
+        'method': 'POST',
+        'url': 'https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/auth/auth_data',
+        'referer': 'https://channels.weixin.qq.com/platform/post/create',
+        'judge': _judge_tencent,
+        'login_pages': [('channels.weixin.qq.com', '/login'), ('open.weixin.qq.com', '/connect/')],
+    },
+    'kuaishou': {
+        'method': 'GET',
+        'url': 'https://cp.kuaishou.com/rest/pc/user/myInfo',
+        'referer': 'https://cp.kuaishou.com/article/publish/video',
+        'judge': _judge_ks,
+        'login_pages': [('passport.kuaishou.com', '/'), ('cp.kuaishou.com', '/login')],
+    },
+    'xhs': {
+        'method': 'GET',
+        'url': 'https://creator.xiaohongshu.com/api/galaxy/user/info',
+        'referer': 'https://creator.xiaohongshu.com/creator-micro/content/upload',
+        'judge': _judge_xhs,
+        'login_pages': [('creator.xiaohongshu.com', '/login'), ('customer.xiaohongshu.com', '/login')],
+    },
+}
+
+# httpx 的连接池绑定在事件循环上：所有探测请求都在一个常驻的后台事件循环中发出，共用一个客户端，
+# 调用方来自 asyncio.run 等短生命周期的事件循环时也不会每次新建（并遗留）一个连接池
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+
+
+def _ensure_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="cookie-probe", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+async def _send(method, url, headers, json_body):
+    # 只在后台事件循环中调用
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=COOKIE_PROBE_TIMEOUT,
+            follow_redirects=False,
+            headers={'User-Agent': PROBE_USER_AGENT},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return await _client.request(method, url, headers=headers, json=json_body)
+
+
+def load_storage_state_cookies(account_file):
+    """
+    从 Playwright storage_state 文件中读取 cookie，过滤掉已过期的
+    """
+    with open(account_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    now = time.time()
+    cookies = []
+    for cookie in state.get('cookies', []):
+        expires = cookie.get('expires', -1)
+        if expires not in (-1, None) and 0 < expires < now:
+            continue
+        cookies.append(cookie)
+    return cookies
+
+
+def build_cookie_header(cookies, url):
+    """
+    按域名和路径筛选出发往 url 时浏览器会携带的 cookie，拼成 Cookie 请求头
+    """
+    parsed = urlsplit(url)
+    host = parsed.hostname or ''
+    path = parsed.path or '/'
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.get('domain', '').lstrip('.')
+        if not domain or not (host == domain or host.endswith('.' + domain)):
+            continue
+        if not path.startswith(cookie.get('path') or '/'):
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return '; '.join(pairs)
+
+
+def _is_login_redirect(response, endpoint):
+    if not response.is_redirect:
+        return False
+    # Location 可能是相对地址，按接口地址解析后再比较域名和路径
+    location = urlsplit(urljoin(endpoint['url'], response.headers.get('location', '')))
+    host = (location.hostname or '').lower()
+    path = location.path or '/'
+    return any(host == login_host and path.startswith(login_path)
+               for login_host, login_path in endpoint['login_pages'])
+
+
+async def probe_cookie(platform, account_file):
+    """
+    不启动浏览器，用一次 HTTP 请求判断 cookie 是否有效
+
+    Returns:
+        True: 接口返回了已登录的数据
+        False: 被重定向到登录页或返回 401
+        None: 结论不明确（网络异常、接口变化、返回了未知格式等），调用方应回退到浏览器校验
+    """
+    if not COOKIE_PROBE_ENABLED:
+        return None
+    endpoint = PROBE_ENDPOINTS.get(platform)
+    if endpoint is None:
+        return None
+    try:
+        cookie_header = build_cookie_header(load_storage_state_cookies(account_file), endpoint['url'])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[-] 读取cookie文件失败 {account_file}: {e}")
+        return None
+    if not cookie_header:
+        print(f"[+] {platform} cookie 文件中没有未过期的登录cookie，判定为cookie失效")
+        return False
+
+    try:
+        response = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_send(
+            endpoint['method'],
+            endpoint['url'],
+            {'Referer': endpoint['referer'], 'Cookie': cookie_header},
+            {} if endpoint['method'] == 'POST' else None,
+        ), _ensure_loop()))
+    except httpx.HTTPError as e:
+        print(f"[-] {platform} cookie 探测请求失败，回退到浏览器校验: {e}")
+        return None
+
+    if _is_login_redirect(response, endpoint) or response.status_code == 401:
+        print(f"[+] {platform} cookie 探测被重定向到登录页，判定为cookie失效")
+        return False
+    if response.status_code != 200:
+        return None
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    if isinstance(data, dict) and endpoint['judge'](data):
+        print(f"[+] {platform} cookie 探测通过，cookie有效")
+        return True
+    # 接口明确返回未登录时也交给浏览器复核，避免接口调整导致误判账号失效
+    return None
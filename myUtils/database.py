@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from conf import BASE_DIR
+from db.createTable import migrate
+
+DB_PATH = Path(BASE_DIR / "db" / "database.db")
+# 等待其他连接释放写锁的时间（秒）
+SQLITE_BUSY_TIMEOUT = 30
+# 每个连接缓存的预编译语句数量，相同 SQL 再次执行时不用重新解析
+SQLITE_STATEMENT_CACHE = 256
+
+_local = threading.local()
+_migrate_lock = threading.Lock()
+_migrated = False
+
+
+def _open():
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                           cached_statements=SQLITE_STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    # WAL 下 NORMAL 只在检查点时 fsync，掉电最多丢最后几个事务，不会损坏数据库
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def get_connection():
+    """
+    返回当前线程的数据库连接（首次调用时创建并执行迁移）
+
+    连接处于自动提交模式：单条语句立即生效，多条语句需要原子执行时使用 transaction()
+    """
+    global _migrated
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = _open()
+        if not _migrated:
+            with _migrate_lock:
+                if not _migrated:
+                    migrate(conn)
+                    _migrated = True
+    return conn
+
+
+def query(sql, params=()):
+    return get_connection().execute(sql, params).fetchall()
+
+
+def query_one(sql, params=()):
+    return get_connection().execute(sql, params).fetchone()
+
+
+def execute(sql, params=()):
+    """
+    执行单条写语句，返回 cursor（可读取 lastrowid / rowcount）
+    """
+    return get_connection().execute(sql, params)
+
+
+def executemany(sql, seq_of_params):
+    with transaction() as conn:
+        return conn.executemany(sql, seq_of_params)
+
+
+@contextmanager
+def transaction():
+    """
+    在一个 IMMEDIATE 事务中执行多条语句：开始时就拿到写锁，避免读后写升级锁时出现 database is locked
+    """
+    conn = get_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def close_connection():
+    """
+    关闭当前线程的连接；线程结束时连接也会随线程局部变量一起释放
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        conn.close()
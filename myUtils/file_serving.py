@@ -0,0 +1,70 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+# 素材文件名带 uuid 前缀，写入后不会原地修改，浏览器可以长期缓存
+VIDEO_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+# 部署在 nginx 后面时配置为 nginx 中 internal location 的前缀（如 '/protected-videos/'），
+# 由 nginx 用 sendfile 直接发送文件，Flask 线程只负责鉴权和定位文件
+VIDEO_ACCEL_REDIRECT_PREFIX = None
+# 上传中的临时文件不对外提供
+HIDDEN_SUFFIXES = ('.part', '.tmp')
+# 服务器不支持 sendfile 时逐块读取文件的缓冲区大小
+VIDEO_SEND_BLOCK_SIZE = 64 * 1024
+
+
+def _send_range_with_file_wrapper(response, path):
+    """
+    把 send_file 生成的 206 响应改为交给服务器的 wsgi.file_wrapper 发送
+
+    werkzeug 对区间响应使用 _RangeWrapper 在 Python 中逐块读取，服务器无法识别为文件，也就不会用 sendfile。
+    这里沿用 send_file 算好的状态码和 Content-Range / Content-Length（Range、If-Range 的处理不变），
+    只把响应体换成已经 seek 到区间起点的文件：gunicorn 从文件当前位置 sendfile Content-Length 个字节，
+    waitress 同样按 Content-Length 在自己的 I/O 线程中发送。
+    没有 wsgi.file_wrapper 的服务器（Flask 开发服务器）保持原样，仍在请求线程中逐块复制。
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if response.status_code != 206 or file_wrapper is None or response.content_range is None:
+        return response
+    f = open(path, 'rb')
+    try:
+        f.seek(response.content_range.start)
+    except OSError:
+        f.close()
+        return response
+    # 关闭 _RangeWrapper 持有的文件
+    response.close()
+    response.response = file_wrapper(f, VIDEO_SEND_BLOCK_SIZE)
+    response.direct_passthrough = True
+    return response
+
+
+def send_video_file(directory, filename):
+    """
+    发送 videoFile 下的素材，支持浏览器拖动进度条时的 Range 请求和条件请求
+
+    - Range / If-Range：只返回请求的字节区间（206），拖动进度条不会重新传整个文件
+    - ETag / Last-Modified + If-None-Match / If-Modified-Since：未变化时返回 304
+    - 完整文件（200）和区间（206）都通过 wsgi.file_wrapper 发送：gunicorn 使用 sendfile 零拷贝，
+      waitress 在自己的 I/O 线程中读文件发送；默认的 `python sau_backend.py`（Flask 开发服务器）
+      没有 wsgi.file_wrapper，会在请求线程中逐块复制文件。gunicorn 的启动方式见 sau_backend.create_app
+    - 配置 VIDEO_ACCEL_REDIRECT_PREFIX 后改由 nginx 发送（包括 Range 请求），不占用 Flask 工作线程
+    """
+    path = safe_join(directory, filename)
+    if path is None or filename.endswith(HIDDEN_SUFFIXES) or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if VIDEO_ACCEL_REDIRECT_PREFIX:
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = VIDEO_ACCEL_REDIRECT_PREFIX + quote(filename)
+        response.headers['Cache-Control'] = f'public, max-age={VIDEO_CACHE_MAX_AGE}, immutable'
+        return response
+
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=VIDEO_CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return _send_range_with_file_wrapper(response, path)
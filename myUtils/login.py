@@ -1,10 +1,10 @@
 import asyncio
-import sqlite3
-
-from playwright.async_api import async_playwright
 
 from myUtils.auth import check_cookie
+from myUtils.database import execute
+from myUtils.pagination import count_cache
 from utils.base_social_media import set_init_script
+from utils.browser_pool import browser_pool
 import uuid
 from pathlib import Path
 from conf import BASE_DIR
@@ -16,14 +16,10 @@ async def douyin_cookie_gen(id,status_queue):
         # 检查是否是主框架的变化
         if page.url != original_url:
             url_changed_event.set()
-    async with async_playwright() as playwright:
-        options = {
-            'headless': False
-        }
+    async with browser_pool.session():
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
-        # Setup context however you like.
-        context = await browser.new_context()  # Pass any options
+        # 有界面的浏览器在登录之间复用，每次登录使用独立的上下文
+        context = await browser_pool.new_context(headless=False)
         context = await set_init_script(context)
         # Pause the page, and start recording manually.
         page = await context.new_page()
@@ -44,8 +40,7 @@ async def douyin_cookie_gen(id,status_queue):
         except asyncio.TimeoutError:
             print("监听页面跳转超时")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             status_queue.put("500")
             return None
         uuid_v1 = uuid.uuid1()
@@ -55,20 +50,16 @@ async def douyin_cookie_gen(id,status_queue):
         if not result:
             status_queue.put("500")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         await page.close()
-        await context.close()
-        await browser.close()
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO user_info (type, filePath, userName, status)
-                                VALUES (?, ?, ?, ?)
-                                ''', (3, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        await browser_pool.release(context)
+        execute('''
+                INSERT INTO user_info (type, filePath, userName, status)
+                VALUES (?, ?, ?, ?)
+                ''', (3, f"{uuid_v1}.json", id, 1))
+        count_cache.invalidate('user_info')
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 
@@ -80,17 +71,10 @@ async def get_tencent_cookie(id,status_queue):
         if page.url != original_url:
             url_changed_event.set()
 
-    async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': False,  # Set headless option here
-        }
+    async with browser_pool.session():
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
-        # Setup context however you like.
-        context = await browser.new_context()  # Pass any options
+        # 有界面的浏览器在登录之间复用，每次登录使用独立的上下文
+        context = await browser_pool.new_context(headless=False, args=['--lang en-GB'])
         # Pause the page, and start recording manually.
         context = await set_init_script(context)
         page = await context.new_page()
@@ -120,8 +104,7 @@ async def get_tencent_cookie(id,status_queue):
             status_queue.put("500")
             print("监听页面跳转超时")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         uuid_v1 = uuid.uuid1()
         print(f"UUID v1: {uuid_v1}")
@@ -130,21 +113,17 @@ async def get_tencent_cookie(id,status_queue):
         if not result:
             status_queue.put("500")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         await page.close()
-        await context.close()
-        await browser.close()
-
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO user_info (type, filePath, userName, status)
-                                VALUES (?, ?, ?, ?)
-                                ''', (2, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        await browser_pool.release(context)
+
+        execute('''
+                INSERT INTO user_info (type, filePath, userName, status)
+                VALUES (?, ?, ?, ?)
+                ''', (2, f"{uuid_v1}.json", id, 1))
+        count_cache.invalidate('user_info')
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 # 快手登录
@@ -154,17 +133,10 @@ async def get_ks_cookie(id,status_queue):
         # 检查是否是主框架的变化
         if page.url != original_url:
             url_changed_event.set()
-    async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': False,  # Set headless option here
-        }
+    async with browser_pool.session():
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
-        # Setup context however you like.
-        context = await browser.new_context()  # Pass any options
+        # 有界面的浏览器在登录之间复用，每次登录使用独立的上下文
+        context = await browser_pool.new_context(headless=False, args=['--lang en-GB'])
         context = await set_init_script(context)
         # Pause the page, and start recording manually.
         page = await context.new_page()
@@ -191,8 +163,7 @@ async def get_ks_cookie(id,status_queue):
             status_queue.put("500")
             print("监听页面跳转超时")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         uuid_v1 = uuid.uuid1()
         print(f"UUID v1: {uuid_v1}")
@@ -201,21 +172,17 @@ async def get_ks_cookie(id,status_queue):
         if not result:
             status_queue.put("500")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         await page.close()
-        await context.close()
-        await browser.close()
-
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                        INSERT INTO user_info (type, filePath, userName, status)
-                                        VALUES (?, ?, ?, ?)
-                                        ''', (4, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        await browser_pool.release(context)
+
+        execute('''
+                INSERT INTO user_info (type, filePath, userName, status)
+                VALUES (?, ?, ?, ?)
+                ''', (4, f"{uuid_v1}.json", id, 1))
+        count_cache.invalidate('user_info')
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 # 小红书登录
@@ -227,17 +194,10 @@ async def xiaohongshu_cookie_gen(id,status_queue):
         if page.url != original_url:
             url_changed_event.set()
 
-    async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': False,  # Set headless option here
-        }
+    async with browser_pool.session():
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
-        # Setup context however you like.
-        context = await browser.new_context()  # Pass any options
+        # 有界面的浏览器在登录之间复用，每次登录使用独立的上下文
+        context = await browser_pool.new_context(headless=False, args=['--lang en-GB'])
         context = await set_init_script(context)
         # Pause the page, and start recording manually.
         page = await context.new_page()
@@ -262,8 +222,7 @@ async def xiaohongshu_cookie_gen(id,status_queue):
             status_queue.put("500")
             print("监听页面跳转超时")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         uuid_v1 = uuid.uuid1()
         print(f"UUID v1: {uuid_v1}")
@@ -272,21 +231,17 @@ async def xiaohongshu_cookie_gen(id,status_queue):
         if not result:
             status_queue.put("500")
             await page.close()
-            await context.close()
-            await browser.close()
+            await browser_pool.release(context)
             return None
         await page.close()
-        await context.close()
-        await browser.close()
-
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                           INSERT INTO user_info (type, filePath, userName, status)
-                           VALUES (?, ?, ?, ?)
-                           ''', (1, f"{uuid_v1}.json", id, 1))
-            conn.commit()
-            print("✅ 用户状态已记录")
+        await browser_pool.release(context)
+
+        execute('''
+                INSERT INTO user_info (type, filePath, userName, status)
+                VALUES (?, ?, ?, ?)
+                ''', (1, f"{uuid_v1}.json", id, 1))
+        count_cache.invalidate('user_info')
+        print("✅ 用户状态已记录")
         status_queue.put("200")
 
 # a = asyncio.run(xiaohongshu_cookie_gen(4,None))
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+from utils.browser_pool import browser_pool
+
+# 同时进行的扫码登录数，每个登录占用一个有界面的浏览器窗口
+LOGIN_MAX_CONCURRENCY = 4
+# 排队超过该时间（秒）仍未开始的登录直接失败
+LOGIN_QUEUE_TIMEOUT = 60
+
+
+class LoginService(object):
+    """
+    扫码登录的常驻服务
+
+    所有登录协程都提交到同一个后台事件循环线程中执行，共用一个 Playwright 驱动和浏览器池，
+    不再为每次 /login 新建线程、事件循环和驱动；同时进行的登录数量受 max_concurrency 限制。
+    """
+
+    def __init__(self, max_concurrency=LOGIN_MAX_CONCURRENCY, queue_timeout=LOGIN_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._semaphore = None
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="login-service", daemon=True)
+                thread.start()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop = loop
+                asyncio.run_coroutine_threadsafe(self._hold_session(), loop)
+            return self._loop
+
+    @staticmethod
+    async def _hold_session():
+        # 常驻的最外层会话，登录之间不会关闭 Playwright 驱动和浏览器
+        async with browser_pool.session():
+            await asyncio.Event().wait()
+
+    async def _run(self, login_func, id, status_queue):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            print(f"[-] 登录排队超时: {id}")
+            status_queue.put("500")
+            return
+        try:
+            await login_func(id, status_queue)
+        except asyncio.CancelledError:
+            print(f"[-] 登录已取消: {id}")
+            raise
+        except Exception as e:
+            print(f"[-] 登录失败 {id}: {e}")
+            status_queue.put("500")
+        finally:
+            self._semaphore.release()
+
+    def submit(self, login_func, id, status_queue):
+        """
+        提交一个登录协程（如 douyin_cookie_gen），可以在任意线程调用
+
+        Returns:
+            concurrent.futures.Future: 登录结束时完成，cancel() 会中断登录并关闭浏览器窗口
+        """
+        return asyncio.run_coroutine_threadsafe(self._run(login_func, id, status_queue), self._ensure_loop())
+
+
+login_service = LoginService()
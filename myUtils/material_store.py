@@ -0,0 +1,80 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.database import execute, query
+from myUtils.pagination import count_cache
+
+# 素材内容哈希算法（hashlib 内置，无需额外依赖）
+CONTENT_HASH_ALGORITHM = 'sha256'
+# 流式读写时的缓冲区大小
+MATERIAL_BUFFER_SIZE = 1024 * 1024
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+
+
+def new_content_hasher():
+    return hashlib.new(CONTENT_HASH_ALGORITHM)
+
+
+def hash_file(path):
+    hasher = new_content_hasher()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(MATERIAL_BUFFER_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def find_material_by_hash(content_hash):
+    """
+    按内容哈希查找已存在且文件仍在磁盘上的素材记录，没有时返回 None
+    """
+    rows = query("SELECT * FROM file_records WHERE content_hash = ? ORDER BY id", (content_hash,))
+    for row in rows:
+        if row['file_path'] and (VIDEO_DIR / row['file_path']).exists():
+            return dict(row)
+    return None
+
+
+def record_material(filename, file_path, size_bytes, content_hash):
+    record_id = execute('''
+    INSERT INTO file_records (filename, filesize, file_path, content_hash)
+    VALUES (?, ?, ?, ?)
+    ''', (filename, round(float(size_bytes) / (1024 * 1024), 2), file_path, content_hash)).lastrowid
+    count_cache.invalidate('file_records')
+    print("✅ 上传文件已记录")
+    return {"id": record_id, "filename": filename, "file_path": file_path, "content_hash": content_hash}
+
+
+def save_material(stream, filename):
+    """
+    把上传流写入 videoFile，写入的同时计算内容哈希；内容已存在时删除刚写的文件，直接复用已有素材
+
+    Returns:
+        (dict, bool): 素材记录，以及是否命中了已有素材
+    """
+    VIDEO_DIR.mkdir(parents=True, exist_ok=True)
+    final_filename = f"{uuid.uuid1()}_{filename}"
+    tmp_path = VIDEO_DIR / f".{final_filename}.tmp"
+    hasher = new_content_hasher()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in iter(lambda: stream.read(MATERIAL_BUFFER_SIZE), b''):
+                hasher.update(block)
+                f.write(block)
+                size += len(block)
+        content_hash = hasher.hexdigest()
+        existing = find_material_by_hash(content_hash)
+        if existing is not None:
+            tmp_path.unlink()
+            print(f"♻️ 素材已存在，复用 {existing['file_path']}")
+            return existing, True
+        os.replace(tmp_path, VIDEO_DIR / final_filename)
+    except Exception:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    return record_material(filename, final_filename, size, content_hash), False
@@ -0,0 +1,304 @@
+import json
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.material_store import hash_file
+from myUtils.thumbnails import FFMPEG_PATH, FFPROBE_PATH, find_content_hash
+
+# 预处理的进程数（转码很吃 CPU，不宜过多）
+MEDIA_NORMALIZE_WORKERS = 2
+# 单个视频预处理的超时时间（秒）
+MEDIA_NORMALIZE_TIMEOUT = 60 * 60
+
+# 各平台对上传视频的要求，超出时才转码；修改参数后需要同时修改 version，旧缓存自动失效
+PLATFORM_PROFILES = {
+    'xhs': {
+        'version': 1,
+        'containers': {'mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2'},
+        'video_codecs': {'h264', 'hevc'},
+        'audio_codecs': {'aac'},
+        'max_height': 2160,
+        'max_video_bitrate': 20_000_000,
+    },
+    'tencent': {
+        'version': 1,
+        'containers': {'mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2'},
+        'video_codecs': {'h264'},
+        'audio_codecs': {'aac'},
+        'max_height': 1920,
+        'max_video_bitrate': 10_000_000,
+    },
+    'douyin': {
+        'version': 1,
+        'containers': {'mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2'},
+        'video_codecs': {'h264', 'hevc'},
+        'audio_codecs': {'aac', 'mp3'},
+        'max_height': 2160,
+        'max_video_bitrate': 25_000_000,
+    },
+    'kuaishou': {
+        'version': 1,
+        'containers': {'mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2'},
+        'video_codecs': {'h264', 'hevc'},
+        'audio_codecs': {'aac'},
+        'max_height': 2160,
+        'max_video_bitrate': 20_000_000,
+    },
+}
+# 平台类型 -> 预处理配置名
+PLATFORM_TYPE_PROFILES = {1: 'xhs', 2: 'tencent', 3: 'douyin', 4: 'kuaishou'}
+
+# 预处理结果缓存目录，文件名为 <内容哈希>_<配置名>v<版本>.mp4（无需处理的素材只留一个 .unchanged 标记）
+NORMALIZED_DIR = Path(BASE_DIR / "normalizedFile")
+# 预处理结果超过该时间（秒）没有被使用就清理，命中缓存时会刷新修改时间；修改配置版本后旧结果也随之清理
+NORMALIZED_MAX_AGE = 30 * 24 * 3600
+# 后台清理的间隔（秒）
+NORMALIZED_PRUNE_INTERVAL = 24 * 3600
+
+NORMALIZE_NONE = 'none'
+NORMALIZE_REMUX = 'remux'
+NORMALIZE_TRANSCODE = 'transcode'
+
+
+def is_faststart(path):
+    """
+    读取 mp4 顶层 box，moov 在 mdat 之前即为 faststart（浏览器/平台无需读完整个文件就能开始解析）
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 8 <= size:
+            f.seek(offset)
+            header = f.read(8)
+            box_size, box_type = struct.unpack('>I4s', header)
+            if box_type == b'moov':
+                return True
+            if box_type == b'mdat':
+                return False
+            if box_size == 1:
+                box_size = struct.unpack('>Q', f.read(8))[0]
+            elif box_size == 0:
+                break
+            if box_size < 8:
+                break
+            offset += box_size
+    return False
+
+
+def probe_media(path):
+    result = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-show_format', '-show_streams', '-of', 'json', str(path)],
+        check=True, capture_output=True, timeout=120)
+    return json.loads(result.stdout)
+
+
+def plan_normalization(info, faststart, profile):
+    """
+    根据探测结果决定处理方式：不处理 / 只重新封装到 faststart（不重新编码）/ 转码
+    """
+    formats = set(info.get('format', {}).get('format_name', '').split(','))
+    video = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in info.get('streams', []) if s.get('codec_type') == 'audio'), None)
+    if video is None:
+        raise ValueError("视频文件中没有视频流")
+
+    bit_rate = int(video.get('bit_rate') or info.get('format', {}).get('bit_rate') or 0)
+    if (video.get('codec_name') not in profile['video_codecs']
+            or (audio is not None and audio.get('codec_name') not in profile['audio_codecs'])
+            or int(video.get('height') or 0) > profile['max_height']
+            or bit_rate > profile['max_video_bitrate']):
+        return NORMALIZE_TRANSCODE
+    if not formats & profile['containers'] or not faststart:
+        return NORMALIZE_REMUX
+    return NORMALIZE_NONE
+
+
+def _touch(path):
+    # 命中缓存时刷新修改时间，清理时按最近使用时间判断
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def normalize_video(video_path, profile_name, content_hash=None):
+    """
+    在子进程中执行：按平台配置预处理视频，返回可以直接上传的文件路径
+
+    结果按 (内容哈希, 配置) 缓存，同一素材再次发布到同一平台时直接返回缓存
+    """
+    profile = PLATFORM_PROFILES[profile_name]
+    video_path = Path(video_path)
+    content_hash = content_hash or hash_file(video_path)
+    output = NORMALIZED_DIR / f"{content_hash}_{profile_name}v{profile['version']}.mp4"
+    # 不需要处理的结论也缓存下来，避免每次发布都重新探测
+    unchanged_marker = output.with_suffix('.unchanged')
+    if _touch(output):
+        return str(output)
+    if _touch(unchanged_marker):
+        return str(video_path)
+
+    info = probe_media(video_path)
+    plan = plan_normalization(info, is_faststart(video_path), profile)
+    NORMALIZED_DIR.mkdir(parents=True, exist_ok=True)
+    if plan == NORMALIZE_NONE:
+        unchanged_marker.touch()
+        return str(video_path)
+
+    tmp = output.with_name(f".{output.stem}.tmp.mp4")
+    if plan == NORMALIZE_REMUX:
+        codec_args = ['-c', 'copy']
+    else:
+        max_rate = profile['max_video_bitrate']
+        codec_args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p',
+                      '-maxrate', str(max_rate), '-bufsize', str(max_rate * 2),
+                      '-vf', f"scale=-2:'min({profile['max_height']},ih)'",
+                      '-c:a', 'aac', '-b:a', '192k']
+    subprocess.run([FFMPEG_PATH, '-y', '-v', 'error', '-i', str(video_path), '-map', '0:v:0', '-map', '0:a:0?',
+                    *codec_args, '-movflags', '+faststart', str(tmp)],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=MEDIA_NORMALIZE_TIMEOUT)
+    os.replace(tmp, output)
+    print(f"✅ 视频预处理完成({plan}): {video_path.name} -> {output.name}")
+    return str(output)
+
+
+def remove_normalized(content_hash):
+    """
+    删除素材在所有平台配置下的预处理结果和 .unchanged 标记
+
+    Returns:
+        int: 删除的文件数
+    """
+    removed = 0
+    for path in NORMALIZED_DIR.glob(f"{content_hash}_*"):
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def prune_normalized(max_age=NORMALIZED_MAX_AGE):
+    """
+    删除超过 max_age 秒没有被使用的预处理结果、标记和中断遗留的临时文件
+
+    Returns:
+        int: 删除的文件数
+    """
+    if not NORMALIZED_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in NORMALIZED_DIR.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def start_prune_sweeper(interval=NORMALIZED_PRUNE_INTERVAL):
+    """
+    启动后台线程，启动时和之后每隔 interval 秒清理一次长期未使用的预处理结果
+    """
+    def run():
+        while True:
+            try:
+                removed = prune_normalized()
+                if removed:
+                    print(f"🧹 已清理 {removed} 个长期未使用的预处理文件")
+            except Exception as e:
+                print(f"[-] 清理预处理文件失败: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="normalized-pruner", daemon=True).start()
+
+
+class MediaNormalizer(object):
+    """
+    上传前的视频预处理，在有界进程池中执行；同一 (内容, 配置) 同时只处理一次
+
+    预处理失败或没有 ffmpeg 时返回原文件，由平台自行处理。
+    """
+
+    def __init__(self, workers=MEDIA_NORMALIZE_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._available = None
+
+    @property
+    def available(self):
+        if self._available is None:
+            self._available = bool(shutil.which(FFMPEG_PATH) and shutil.which(FFPROBE_PATH))
+            if not self._available:
+                print("[-] 未找到 ffmpeg/ffprobe，跳过上传前的视频预处理")
+        return self._available
+
+    def submit(self, type, video_path):
+        """
+        提交一个预处理任务，返回 Future（结果为处理后的路径）；不需要处理时返回 None
+        """
+        profile_name = PLATFORM_TYPE_PROFILES.get(type, type)
+        if profile_name not in PLATFORM_PROFILES or not self.available:
+            return None
+        video_path = str(video_path)
+        try:
+            content_hash = find_content_hash(Path(video_path).name)
+        except Exception:
+            content_hash = None
+        key = (content_hash or video_path, profile_name)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                # 后端是多线程的 Flask 服务，fork 出的子进程会继承其他线程持有的锁，用 spawn 启动全新的进程
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            future = self._executor.submit(normalize_video, video_path, profile_name, content_hash)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    @staticmethod
+    def _result(future, video_path):
+        if future is None:
+            return str(video_path)
+        try:
+            return future.result()
+        except Exception as e:
+            stderr = getattr(e, 'stderr', None)
+            print(f"[-] 视频预处理失败，使用原文件上传 {video_path}: {e} "
+                  f"{stderr.decode(errors='ignore') if stderr else ''}")
+            return str(video_path)
+
+    def prepare(self, type, video_path):
+        """
+        同步等待单个视频预处理完成，返回用于上传的路径
+        """
+        return self._result(self.submit(type, video_path), video_path)
+
+    def prepare_many(self, type, video_paths):
+        """
+        批量预处理，多个文件在进程池中并行执行，返回与输入顺序一致的路径列表
+        """
+        futures = [self.submit(type, path) for path in video_paths]
+        return [self._result(future, path) for future, path in zip(futures, video_paths)]
+
+
+media_normalizer = MediaNormalizer()
@@ -0,0 +1,124 @@
+import base64
+import binascii
+import json
+import threading
+import time
+
+from myUtils.database import query, query_one
+
+# 每页默认条数和上限
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+# 总数缓存的有效期（秒）；本进程内的写入会立即让对应表的缓存失效
+COUNT_CACHE_TTL = 30
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise PaginationError("无效的 cursor")
+
+
+def parse_limit(raw):
+    if raw in (None, ''):
+        return PAGE_SIZE_DEFAULT
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise PaginationError("limit 必须是整数")
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+
+def like_pattern(keyword):
+    """
+    把搜索关键词转成 LIKE 的包含匹配模式（转义 % 和 _），配合 ESCAPE '\\' 使用
+    """
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class CountCache(object):
+    """
+    列表总数缓存，按 (表, 筛选条件) 缓存 COUNT(*) 的结果
+
+    翻页时不用每一页都重新扫描统计；写入后调用 invalidate(表名) 立即失效，
+    其他进程的写入最多延迟 ttl 秒体现在总数中。
+    """
+
+    def __init__(self, ttl=COUNT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def count(self, table, where_sql='', params=()):
+        key = (table, where_sql, tuple(params))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+        value = query_one(f"SELECT COUNT(*) FROM {table}{where_sql}", params)[0]
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+        return value
+
+    def invalidate(self, table):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == table]:
+                del self._entries[key]
+
+
+count_cache = CountCache()
+
+
+def keyset_page(table, sort_key, sort_column, descending=True, conditions=(), params=(), cursor=None,
+                limit=PAGE_SIZE_DEFAULT, with_total=True):
+    """
+    按 (sort_column, id) 做游标分页，配合 sort_column 上的索引，任意一页都只读取 limit + 1 行
+
+    Args:
+        table: 表名（调用方保证是可信的常量）
+        sort_key: 排序方式的名称，写入 cursor，换了排序方式的旧 cursor 会被拒绝
+        sort_column: 排序列（调用方保证是可信的常量）
+        conditions / params: 筛选条件的 SQL 片段及参数，多个条件之间为 AND
+        cursor: 上一页返回的 nextCursor，为空时从第一页开始
+        with_total: 是否统计总数（COUNT(*) 需要扫描所有符合条件的行），不统计时 total 为 None
+    Returns:
+        dict: {"items": [...], "nextCursor": str | None, "total": int | None}
+    """
+    base_conditions = list(conditions)
+    base_params = list(params)
+    base_where = f" WHERE {' AND '.join(base_conditions)}" if base_conditions else ''
+
+    page_conditions = list(base_conditions)
+    page_params = list(base_params)
+    if cursor:
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != 3 or values[0] != sort_key:
+            raise PaginationError("cursor 与当前排序方式不匹配")
+        page_conditions.append(f"({sort_column}, id) {'<' if descending else '>'} (?, ?)")
+        page_params += values[1:]
+    page_where = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+    direction = 'DESC' if descending else 'ASC'
+
+    rows = query(f"SELECT * FROM {table}{page_where} ORDER BY {sort_column} {direction}, id {direction} LIMIT ?",
+                 page_params + [limit + 1])
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([sort_key, last[sort_column], last['id']])
+    return {
+        "items": items,
+        "nextCursor": next_cursor,
+        "total": count_cache.count(table, base_where, base_params) if with_total else None,
+    }
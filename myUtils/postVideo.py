@@ -1,4 +1,3 @@
-import asyncio
 from pathlib import Path
 
 from conf import BASE_DIR
@@ -6,83 +5,94 @@ from uploader.douyin_uploader.main import DouYinVideo
 from uploader.ks_uploader.main import KSVideo
 from uploader.tencent_uploader.main import TencentVideo
 from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo
+from myUtils.database import transaction
+from myUtils.media_normalize import media_normalizer
+from myUtils.publish_history import content_key, find_publish_history, record_publish
+from myUtils.thumbnails import find_cover
+from myUtils.upload_executor import run_uploads
 from utils.constant import TencentZoneTypes
 from utils.files_times import generate_schedule_time_next_day
 
 
-def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
-    # 生成文件的完整路径
-    account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(BASE_DIR / "videoFile" / file) for file in files]
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = TencentVideo(title, str(file), tags, publish_datetimes[index], cookie, category)
-            asyncio.run(app.main(), debug=False)
+def build_video_app(type, title, file, tags, account_file, category=None, publish_date=0, thumbnail_path=None):
+    """
+    按平台类型构造单个 文件 × 账号 的上传对象，file / account_file 为 videoFile / cookiesFile 下的文件名
+    （也可以传绝对路径，例如预处理后的文件）；thumbnail_path 目前只有抖音使用
+
+    type: 1 小红书 2 视频号 3 抖音 4 快手
+    """
+    account_file = Path(BASE_DIR / "cookiesFile" / account_file)
+    file = Path(BASE_DIR / "videoFile" / file)
+    match type:
+        case 1:
+            return XiaoHongShuVideo(title, file, tags, publish_date, account_file)
+        case 2:
+            return TencentVideo(title, str(file), tags, publish_date, account_file, category)
+        case 3:
+            return DouYinVideo(title, str(file), tags, publish_date, account_file, thumbnail_path=thumbnail_path)
+        case 4:
+            return KSVideo(title, str(file), tags, publish_date, account_file)
+        case _:
+            raise ValueError(f"不支持的平台类型: {type}")
 
 
-def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
-    # 生成文件的完整路径
-    account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(BASE_DIR / "videoFile" / file) for file in files]
+def _post_videos(type, title, files, tags, account_file, category=None, enableTimer=False, videos_per_day=1,
+                 daily_times=None, start_days=0, use_cover=False):
+    # 文件 × 账号 的上传交给并发执行器：不同账号并发，同一账号串行
     if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
+        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,
+                                                            start_days=start_days)
     else:
         publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
+    content_hashes = [content_key(file) for file in files]
+    # 上传前按平台要求预处理（faststart 重新封装 / 必要时转码），多个文件在进程池中并行
+    prepared = media_normalizer.prepare_many(type, [Path(BASE_DIR / "videoFile" / file) for file in files])
+    tasks = []
+    targets = []
+    for index, file in enumerate(prepared):
         for cookie in account_file:
-            print(f"文件路径{str(file)}")
+            # 发布历史中已有相同 内容 × 平台 × 账号 × 发布时间 的记录时跳过，重复调用不会重复发布
+            history = find_publish_history(content_hashes[index], type, cookie, publish_datetimes[index])
+            if history is not None:
+                print(f"[-] {files[index]} 已于 {history['published_at']} 发布到账号 {cookie}，跳过")
+                continue
             # 打印视频文件名、标题和 hashtag
             print(f"视频文件名：{file}")
             print(f"标题：{title}")
             print(f"Hashtag：{tags}")
-            app = DouYinVideo(title, str(file), tags, publish_datetimes[index], cookie, category)
-            asyncio.run(app.main(), debug=False)
+            thumbnail = find_cover(Path(BASE_DIR / "videoFile" / files[index])) if use_cover else None
+            app = build_video_app(type, title, file, tags, cookie, category, publish_datetimes[index], thumbnail)
+            tasks.append((type, cookie, app.main))
+            targets.append((index, cookie))
+    results = run_uploads(tasks)
+    with transaction() as conn:
+        for (index, cookie), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                print(f"[-] 账号 {cookie} 上传失败: {result}")
+            else:
+                record_publish(conn, content_hashes[index], type, cookie, publish_datetimes[index],
+                               file_path=files[index], title=title)
+    return results
+
+
+def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
+    return _post_videos(2, title, files, tags, account_file, category, enableTimer, videos_per_day, daily_times,
+                        start_days)
+
+
+def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, use_cover=False):
+    return _post_videos(3, title, files, tags, account_file, category, enableTimer, videos_per_day, daily_times,
+                        start_days, use_cover)
 
 
 def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
-    # 生成文件的完整路径
-    account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(BASE_DIR / "videoFile" / file) for file in files]
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = KSVideo(title, str(file), tags, publish_datetimes[index], cookie)
-            asyncio.run(app.main(), debug=False)
+    return _post_videos(4, title, files, tags, account_file, category, enableTimer, videos_per_day, daily_times,
+                        start_days)
+
 
 def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
-    # 生成文件的完整路径
-    account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(BASE_DIR / "videoFile" / file) for file in files]
-    file_num = len(files)
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(file_num, videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = 0
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = XiaoHongShuVideo(title, file, tags, publish_datetimes, cookie)
-            asyncio.run(app.main(), debug=False)
+    return _post_videos(1, title, files, tags, account_file, category, enableTimer, videos_per_day, daily_times,
+                        start_days)
 
 
 
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.database import query_one
+from myUtils.material_store import hash_file
+from myUtils.pagination import PAGE_SIZE_DEFAULT, count_cache, keyset_page
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+
+
+def format_publish_time(publish_time):
+    """
+    幂等键中的发布时间：datetime / 字符串原样格式化，立即发布（None / 0）为空字符串
+    """
+    if not publish_time:
+        return ''
+    if isinstance(publish_time, str):
+        return publish_time
+    return publish_time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def content_key(file_path, conn=None):
+    """
+    素材的内容标识：优先使用 file_records 中的内容哈希，没有记录时现算，文件也不存在时退化为文件名
+    """
+    sql = "SELECT content_hash FROM file_records WHERE file_path = ? AND content_hash IS NOT NULL LIMIT 1"
+    row = conn.execute(sql, (file_path,)).fetchone() if conn is not None else query_one(sql, (file_path,))
+    if row is not None:
+        return row[0]
+    path = VIDEO_DIR / file_path
+    if path.is_file():
+        return hash_file(path)
+    return f"file:{file_path}"
+
+
+def find_publish_history(content_hash, type, account_file, publish_time, conn=None):
+    """
+    按幂等键查询发布记录（唯一索引查找），没有时返回 None
+    """
+    sql = '''
+    SELECT * FROM publish_history
+    WHERE content_hash = ? AND type = ? AND account_file = ? AND publish_time = ?
+    '''
+    params = (content_hash, type, account_file, format_publish_time(publish_time))
+    row = conn.execute(sql, params).fetchone() if conn is not None else query_one(sql, params)
+    return dict(row) if row is not None else None
+
+
+def record_publish(conn, content_hash, type, account_file, publish_time, job_id=None, file_path=None, title=None):
+    """
+    在调用方的事务中写入一条发布记录，幂等键已存在时忽略（重复的成功回调不会报错）
+    """
+    cursor = conn.execute('''
+    INSERT OR IGNORE INTO publish_history (content_hash, type, account_file, publish_time, job_id, file_path, title)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (content_hash, type, account_file, format_publish_time(publish_time), job_id, file_path, title))
+    if cursor.rowcount:
+        count_cache.invalidate('publish_history')
+    return cursor.rowcount > 0
+
+
+def get_publish_history(type=None, account_file=None, cursor=None, limit=PAGE_SIZE_DEFAULT, with_total=False):
+    """
+    发布历史分页，按 id 倒序；按平台筛选走 (type) 索引，按平台和账号筛选走 (type, account_file) 索引，
+    索引中的记录已按 id 排列，任意一页都只读取 limit + 1 行。
+
+    历史表会一直增长，总数默认不统计（COUNT(*) 要扫描所有符合条件的行），with_total=True 时才返回
+    """
+    conditions, params = [], []
+    if type is not None:
+        conditions.append("type = ?")
+        params.append(type)
+    if account_file:
+        conditions.append("account_file = ?")
+        params.append(account_file)
+    return keyset_page('publish_history', 'id', 'id', True, conditions, params, cursor, limit, with_total)
@@ -0,0 +1,351 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.database import execute, get_connection, query, transaction
+from myUtils.media_normalize import media_normalizer
+from myUtils.postVideo import build_video_app
+from myUtils.publish_history import content_key, find_publish_history, record_publish
+from myUtils.thumbnails import find_cover
+from myUtils.upload_executor import UPLOAD_MAX_CONCURRENCY, UploadExecutor
+from utils.browser_pool import browser_pool
+from utils.files_times import generate_schedule_time_next_day
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_SUCCESS = 'success'
+JOB_FAILED = 'failed'
+
+# 单个任务最多执行次数；只有确定还没开始上传的失败（例如预处理失败）才会自动重试，
+# 上传过程中的失败和进程中断都可能已经点了发布，标记为 failed，确认后手动重试，避免重复发布
+PUBLISH_JOB_MAX_ATTEMPTS = 2
+# 没有新任务通知时，worker 轮询数据库的间隔（秒）
+PUBLISH_WORKER_POLL_INTERVAL = 5
+
+
+def _parse_daily_times(daily_times):
+    # 前端传 "10:00" 这种格式，调度函数只需要小时
+    if not daily_times:
+        return None
+    return [int(str(t).split(':')[0]) for t in daily_times]
+
+
+def _find_published_job(conn, type, file_path, account_file, publish_time):
+    # 同一内容（同一文件，或 content_hash 相同的其他素材）在同一发布时间已发布成功或正在发布到该账号，
+    # 与发布历史的幂等键一致；publish_time 为 None 表示立即发布
+    return conn.execute('''
+    SELECT * FROM publish_jobs
+    WHERE type = ? AND account_file = ? AND publish_time IS ? AND status != ?
+      AND (file_path = ? OR file_path IN (
+          SELECT same.file_path FROM file_records f
+          JOIN file_records same ON same.content_hash = f.content_hash
+          WHERE f.file_path = ? AND f.content_hash IS NOT NULL))
+    ORDER BY id LIMIT 1
+    ''', (type, account_file, publish_time, JOB_FAILED, file_path, file_path)).fetchone()
+
+
+def find_published_job(type, file_path, account_file, publish_time=None):
+    """
+    查询该素材是否已在该发布时间发布（或已在队列中）到指定平台的账号，返回对应任务，没有时返回 None
+    """
+    row = _find_published_job(get_connection(), type, file_path, account_file, publish_time)
+    return dict(row) if row else None
+
+
+def enqueue_publish(data, skipped=None):
+    """
+    把一次发布请求（与 /postVideo 的请求体相同）拆成 文件 × 账号 的任务写入 publish_jobs
+
+    已发布过（发布历史中有相同的 内容 × 平台 × 账号 × 发布时间，或已在队列中）的组合默认跳过，
+    重试或重复提交同一批任务不会重复发布；请求体带 allowRepublish 时照常入队
+
+    Args:
+        skipped: 可选列表，跳过的组合以 {"file", "account", "jobId"} 或 {"file", "account", "historyId"} 追加到其中
+
+    Returns:
+        list[int]: 新建任务的 id
+    """
+    file_list = data.get('fileList', [])
+    account_list = data.get('accountList', [])
+    type = data.get('type')
+    title = data.get('title')
+    tags = data.get('tags') or []
+    category = data.get('category')
+    if category == 0:
+        category = None
+
+    if data.get('enableTimer'):
+        publish_datetimes = generate_schedule_time_next_day(
+            len(file_list), data.get('videosPerDay') or 1, _parse_daily_times(data.get('dailyTimes')),
+            start_days=data.get('startDays') or 0)
+    else:
+        publish_datetimes = [None for _ in file_list]
+
+    allow_republish = 1 if data.get('allowRepublish') else 0
+    # 只有请求中明确要求时才设置封面
+    use_cover = 1 if data.get('useCover') else 0
+    job_ids = []
+    # 内容哈希在拿写锁之前算好（旧素材可能需要读一遍文件）
+    content_hashes = {file: content_key(file) for file in file_list}
+    rows = []
+    for index, file in enumerate(file_list):
+        publish_time = publish_datetimes[index].strftime("%Y-%m-%d %H:%M:%S") if publish_datetimes[index] else None
+        for account_file in account_list:
+            rows.append((type, title, json.dumps(tags, ensure_ascii=False), category, file, account_file,
+                         publish_time, content_hashes[file], allow_republish, use_cover))
+
+    # 检查和写入在同一个写事务中，并发提交同一批任务时只有第一个会入队
+    with transaction() as conn:
+        for row in rows:
+            if not allow_republish:
+                history = find_publish_history(row[7], type, row[5], row[6], conn=conn)
+                if history is not None:
+                    print(f"[-] {row[4]} 已于 {history['published_at']} 发布到账号 {row[5]}，跳过")
+                    if skipped is not None:
+                        skipped.append({"file": row[4], "account": row[5], "historyId": history['id']})
+                    continue
+                published = _find_published_job(conn, type, row[4], row[5], row[6])
+                if published is not None:
+                    print(f"[-] {row[4]} 已发布到账号 {row[5]}（任务 {published['id']}），跳过")
+                    if skipped is not None:
+                        skipped.append({"file": row[4], "account": row[5], "jobId": published['id']})
+                    continue
+            cursor = conn.execute('''
+            INSERT INTO publish_jobs (type, title, tags, category, file_path, account_file, publish_time,
+                                      content_hash, allow_republish, use_cover)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row)
+            job_ids.append(cursor.lastrowid)
+    print(f"✅ 已加入发布队列: {job_ids}")
+    return job_ids
+
+
+def get_publish_jobs(job_ids=None, status=None, limit=100):
+    sql = "SELECT * FROM publish_jobs"
+    conditions = []
+    params = []
+    if job_ids:
+        conditions.append(f"id IN ({','.join('?' for _ in job_ids)})")
+        params.extend(job_ids)
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    rows = query(sql, params)
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        job['tags'] = json.loads(job['tags']) if job['tags'] else []
+        jobs.append(job)
+    return jobs
+
+
+def recover_interrupted_jobs():
+    """
+    进程崩溃/重启时仍处于 running 的任务标记为 failed，不自动重新执行（中断前可能已经发布成功）
+    """
+    cursor = execute('''
+    UPDATE publish_jobs
+    SET status = ?, error = '进程中断，可能已经发布，请确认后手动重试', updated_at = CURRENT_TIMESTAMP
+    WHERE status = ?
+    ''', (JOB_FAILED, JOB_RUNNING))
+    if cursor.rowcount:
+        print(f"[-] {cursor.rowcount} 个发布任务因进程中断标记为失败，请确认后手动重试")
+
+
+def retry_jobs(job_ids):
+    """
+    把失败的任务重新放回队列（手动重试），返回实际放回的任务数
+    """
+    if not job_ids:
+        return 0
+    return execute(f'''
+    UPDATE publish_jobs
+    SET status = ?, error = NULL, updated_at = CURRENT_TIMESTAMP
+    WHERE status = ? AND id IN ({','.join('?' for _ in job_ids)})
+    ''', [JOB_PENDING, JOB_FAILED] + list(job_ids)).rowcount
+
+
+def claim_next_job(exclude_accounts=None):
+    """
+    取出最早的待执行任务并标记为 running，UPDATE 带状态条件，多个 worker 不会领到同一个任务
+
+    Args:
+        exclude_accounts: 跳过这些账号的任务（这些账号正在上传）
+    """
+    sql = "SELECT * FROM publish_jobs WHERE status = ?"
+    params = [JOB_PENDING]
+    if exclude_accounts:
+        sql += f" AND account_file NOT IN ({','.join('?' for _ in exclude_accounts)})"
+        params.extend(exclude_accounts)
+    sql += " ORDER BY id LIMIT 1"
+    conn = get_connection()
+    while True:
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            return None
+        cursor = conn.execute('''
+        UPDATE publish_jobs
+        SET status = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = ?
+        ''', (JOB_RUNNING, row['id'], JOB_PENDING))
+        if cursor.rowcount:
+            job = dict(row)
+            job['attempts'] += 1
+            job['tags'] = json.loads(job['tags']) if job['tags'] else []
+            return job
+
+
+def job_content_hash(job):
+    # 加入发布历史之前创建的任务没有记录内容哈希
+    return job.get('content_hash') or content_key(job['file_path'])
+
+
+def finish_job(job, error=None, retryable=False):
+    """
+    更新任务状态；成功时在同一个事务中写入发布历史
+
+    Args:
+        retryable: 失败发生在开始上传之前（不可能已经发布），未超过最大次数时放回队列
+    """
+    if error is None:
+        status = JOB_SUCCESS
+        content_hash = job_content_hash(job)
+    elif retryable and job['attempts'] < PUBLISH_JOB_MAX_ATTEMPTS:
+        status = JOB_PENDING
+    else:
+        status = JOB_FAILED
+    with transaction() as conn:
+        conn.execute('''
+        UPDATE publish_jobs
+        SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', (status, error, job['id']))
+        if status == JOB_SUCCESS:
+            record_publish(conn, content_hash, job['type'], job['account_file'], job['publish_time'],
+                           job_id=job['id'], file_path=job['file_path'], title=job['title'])
+    return status
+
+
+def job_to_app(job, file_path=None, thumbnail_path=None):
+    # file_path: 预处理后的文件路径，默认使用素材原文件；thumbnail_path: 任务要求设置封面时找到的封面
+    publish_date = datetime.strptime(job['publish_time'], "%Y-%m-%d %H:%M:%S") if job['publish_time'] else 0
+    return build_video_app(job['type'], job['title'], file_path or job['file_path'], job['tags'],
+                           job['account_file'], job['category'], publish_date, thumbnail_path)
+
+
+class PublishWorker(object):
+    """
+    后台发布 worker，从 publish_jobs 中领取任务并发执行，记录状态变化
+
+    不同账号的任务通过 UploadExecutor 并发执行（受全局和平台并发上限约束），
+    同一账号的任务在上一个完成前不会被领取。
+    """
+
+    def __init__(self, poll_interval=PUBLISH_WORKER_POLL_INTERVAL, max_concurrency=UPLOAD_MAX_CONCURRENCY):
+        self.poll_interval = poll_interval
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._wakeup = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        recover_interrupted_jobs()
+        threading.Thread(target=self._run, name="publish-worker", daemon=True).start()
+
+    def notify(self):
+        """
+        有新任务时唤醒 worker，worker 未启动时顺带启动
+        """
+        self.start()
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        executor = UploadExecutor(max_concurrency=self.max_concurrency)
+        running = set()
+
+        def on_done(task):
+            running.discard(task)
+            # 有名额空出来，立即尝试领取下一个任务
+            self._wakeup.set()
+
+        # 整个 worker 生命周期共用一个浏览器池会话
+        async with browser_pool.session():
+            while True:
+                self._wakeup.clear()
+                while len(running) < self.max_concurrency:
+                    try:
+                        job = claim_next_job(exclude_accounts=executor.busy_accounts)
+                    except Exception as e:
+                        print(f"[-] 领取发布任务失败: {e}")
+                        job = None
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self.run_job(executor, job))
+                    # run_job 开始前账号就要算作忙碌，避免下一轮又领到同一账号的任务
+                    executor.reserve(job['account_file'])
+                    running.add(task)
+                    task.add_done_callback(on_done)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    @staticmethod
+    async def run_job(executor, job):
+        print(f"[+] 开始执行发布任务 {job['id']}: {job['file_path']} -> {job['account_file']}")
+        started = time.monotonic()
+        # 发布历史检查和预处理都在打开上传页面之前：出错（数据库忙、文件缺失等）时释放账号，可以安全地自动重试
+        history = None
+        try:
+            if not job.get('allow_republish'):
+                # 重复提交的任务在入队后才被其他任务发布成功时，到这里直接跳过
+                history = await asyncio.to_thread(find_publish_history, job_content_hash(job), job['type'],
+                                                  job['account_file'], job['publish_time'])
+            if history is None:
+                # 上传前按平台要求预处理，在进程池中执行，不占用上传名额
+                source = Path(BASE_DIR / "videoFile" / job['file_path'])
+                file_path = await asyncio.to_thread(media_normalizer.prepare, job['type'], source)
+                thumbnail = await asyncio.to_thread(find_cover, source) if job.get('use_cover') else None
+        except Exception as e:
+            executor.release(job['account_file'])
+            status = finish_job(job, error=str(e) or e.__class__.__name__, retryable=True)
+            print(f"[-] 发布任务 {job['id']} 准备失败({status}): {e}")
+            return
+        if history is not None:
+            executor.release(job['account_file'])
+            finish_job(job)
+            print(f"[-] 发布任务 {job['id']} 已于 {history['published_at']} 发布过，跳过")
+            return
+        try:
+            await executor.run_one(job['type'], job['account_file'],
+                                   lambda: job_to_app(job, file_path, thumbnail).main(), reserved=True)
+        except Exception as e:
+            status = finish_job(job, error=str(e) or e.__class__.__name__)
+            print(f"[-] 发布任务 {job['id']} 执行失败({status}): {e}")
+        else:
+            finish_job(job)
+            print(f"[+] 发布任务 {job['id']} 完成，耗时 {time.monotonic() - started:.1f}s")
+
+
+publish_worker = PublishWorker()
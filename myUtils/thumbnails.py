@@ -0,0 +1,232 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from conf import BASE_DIR
+from myUtils.database import execute, query, query_one
+from myUtils.material_store import hash_file
+
+# ffmpeg / ffprobe 可执行文件，不在 PATH 中时改成绝对路径
+FFMPEG_PATH = 'ffmpeg'
+FFPROBE_PATH = 'ffprobe'
+# 生成缩略图的进程数
+THUMBNAIL_WORKERS = 2
+# 封面取第几秒的画面（视频更短时取第一帧）
+POSTER_SECOND = 1
+# 封面最大宽度
+POSTER_MAX_WIDTH = 1080
+# 预览雪碧图：列数 x 行数，以及每一格的宽度
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 2
+SPRITE_TILE_WIDTH = 160
+# 单个 ffmpeg 命令的超时时间（秒）
+FFMPEG_TIMEOUT = 120
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+# 按内容哈希缓存，同一内容的素材共用一份封面
+THUMBNAIL_DIR = Path(BASE_DIR / "thumbnailFile")
+
+THUMBNAIL_KINDS = {
+    'poster': 'poster.png',
+    'sprite': 'sprite.jpg',
+}
+
+
+def thumbnail_path(content_hash, kind='poster'):
+    return THUMBNAIL_DIR / f"{content_hash}_{THUMBNAIL_KINDS[kind]}"
+
+
+def remove_thumbnails(content_hash):
+    """
+    删除素材内容对应的封面帧和预览雪碧图
+
+    Returns:
+        int: 删除的文件数
+    """
+    removed = 0
+    for kind in THUMBNAIL_KINDS:
+        path = thumbnail_path(content_hash, kind)
+        if path.exists():
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _run(args):
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=FFMPEG_TIMEOUT)
+
+
+def _probe_duration(video_path):
+    result = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', str(video_path)],
+        check=True, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    try:
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (KeyError, ValueError, TypeError):
+        return 0.0
+
+
+def _atomic_output(target):
+    # 先写临时文件再改名，避免读到生成了一半的图片
+    return target.with_name(f".{target.stem}.tmp{target.suffix}")
+
+
+def generate_thumbnails(video_path, content_hash=None):
+    """
+    在子进程中执行：抽取封面帧和预览雪碧图，写入 THUMBNAIL_DIR
+
+    Returns:
+        str: 内容哈希（旧素材没有记录哈希时在这里顺带计算）
+    """
+    video_path = Path(video_path)
+    content_hash = content_hash or hash_file(video_path)
+    THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+    duration = _probe_duration(video_path)
+
+    poster = thumbnail_path(content_hash, 'poster')
+    if not poster.exists():
+        tmp = _atomic_output(poster)
+        seek = POSTER_SECOND if duration > POSTER_SECOND else 0
+        _run([FFMPEG_PATH, '-y', '-v', 'error', '-ss', str(seek), '-i', str(video_path), '-frames:v', '1',
+              '-vf', f"scale='min({POSTER_MAX_WIDTH},iw)':-2", str(tmp)])
+        os.replace(tmp, poster)
+
+    sprite = thumbnail_path(content_hash, 'sprite')
+    if not sprite.exists():
+        tmp = _atomic_output(sprite)
+        tiles = SPRITE_COLUMNS * SPRITE_ROWS
+        # 均匀抽取 tiles 帧拼成一张图，前端悬停时按位置显示对应的格子
+        interval = max(duration / tiles, 0.1) if duration else 1
+        _run([FFMPEG_PATH, '-y', '-v', 'error', '-i', str(video_path), '-frames:v', '1', '-q:v', '5',
+              '-vf', f"fps=1/{interval:.3f},scale={SPRITE_TILE_WIDTH}:-2,tile={SPRITE_COLUMNS}x{SPRITE_ROWS}",
+              str(tmp)])
+        os.replace(tmp, sprite)
+    return content_hash
+
+
+def find_content_hash(file_path):
+    """
+    按 videoFile 下的文件名查询素材的内容哈希，没有记录时返回 None
+    """
+    row = query_one("SELECT content_hash FROM file_records WHERE file_path = ? AND content_hash IS NOT NULL LIMIT 1",
+                    (file_path,))
+    return row['content_hash'] if row else None
+
+
+def _is_portrait(png_path):
+    # 读 PNG 的 IHDR 头取宽高，不用解码整张图片
+    try:
+        with open(png_path, 'rb') as file:
+            header = file.read(24)
+    except OSError:
+        return False
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n':
+        return False
+    width, height = int.from_bytes(header[16:20], 'big'), int.from_bytes(header[20:24], 'big')
+    return height >= width
+
+
+def find_cover(video_path):
+    """
+    发布请求要求设置封面（useCover）时使用：优先使用视频旁边手动放置的同名 .png，
+    其次使用缓存的封面帧（只用竖版的，抖音的封面对话框是竖封面），都没有时返回 None
+    """
+    video_path = Path(video_path)
+    manual = video_path.with_suffix('.png')
+    if manual.exists():
+        return str(manual)
+    prefix = video_path.name.split('_')[0]
+    if len(prefix) == 64 and all(c in '0123456789abcdef' for c in prefix):
+        # 预处理后的文件以内容哈希命名
+        content_hash = prefix
+    else:
+        try:
+            content_hash = find_content_hash(video_path.name)
+        except sqlite3.Error:
+            # 命令行单独上传时可能没有素材库
+            content_hash = None
+    if content_hash:
+        poster = thumbnail_path(content_hash, 'poster')
+        if poster.exists() and _is_portrait(poster):
+            return str(poster)
+    return None
+
+
+class ThumbnailService(object):
+    """
+    素材封面 / 预览图的后台生成服务
+
+    ffmpeg 在进程池中执行，不占用 Web 线程；同一内容只会同时生成一次。
+    """
+
+    def __init__(self, workers=THUMBNAIL_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._available = None
+
+    @property
+    def available(self):
+        if self._available is None:
+            self._available = bool(shutil.which(FFMPEG_PATH) and shutil.which(FFPROBE_PATH))
+            if not self._available:
+                print("[-] 未找到 ffmpeg/ffprobe，跳过素材封面生成")
+        return self._available
+
+    def submit(self, file_path, content_hash=None):
+        """
+        为 videoFile 下的文件生成封面（已缓存或正在生成时直接返回）
+        """
+        if not self.available:
+            return None
+        content_hash = content_hash or find_content_hash(file_path)
+        if content_hash and all(thumbnail_path(content_hash, kind).exists() for kind in THUMBNAIL_KINDS):
+            return None
+        key = content_hash or file_path
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            if self._executor is None:
+                # 同 media_normalize：不 fork 多线程的后端进程
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            future = self._executor.submit(generate_thumbnails, str(VIDEO_DIR / file_path), content_hash)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._on_done(key, file_path, content_hash, f))
+        return future
+
+    def _on_done(self, key, file_path, content_hash, future):
+        with self._lock:
+            self._pending.pop(key, None)
+        try:
+            generated_hash = future.result()
+        except Exception as e:
+            stderr = getattr(e, 'stderr', None)
+            print(f"[-] 生成素材封面失败 {file_path}: {e} {stderr.decode(errors='ignore') if stderr else ''}")
+            return
+        if not content_hash:
+            # 旧素材补写内容哈希，之后按哈希命中缓存
+            execute("UPDATE file_records SET content_hash = ? WHERE file_path = ? AND content_hash IS NULL",
+                    (generated_hash, file_path))
+        print(f"✅ 素材封面已生成: {file_path}")
+
+    def scan_missing(self):
+        """
+        启动时为还没有封面的素材补生成
+        """
+        if not self.available:
+            return
+        rows = query("SELECT file_path, content_hash FROM file_records")
+        for row in rows:
+            if row['file_path'] and (VIDEO_DIR / row['file_path']).exists():
+                self.submit(row['file_path'], row['content_hash'])
+
+
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,73 @@
+import json
+import time
+
+from myUtils.database import query, transaction
+
+# 话题缓存的有效期（秒）；没有推荐话题的标签缓存时间短一些，平台新增话题后能较快拿到
+XHS_TOPIC_CACHE_TTL = 7 * 24 * 3600
+XHS_TOPIC_EMPTY_TTL = 24 * 3600
+# 一次 IN 查询的标签数，低于 SQLite 的参数个数上限
+XHS_TOPIC_BATCH_SIZE = 500
+
+
+def _load(tags):
+    now = time.time()
+    cached = {}
+    for start in range(0, len(tags), XHS_TOPIC_BATCH_SIZE):
+        batch = tags[start:start + XHS_TOPIC_BATCH_SIZE]
+        rows = query(f"SELECT tag, topic, fetched_at FROM xhs_topic_cache WHERE tag IN ({','.join('?' * len(batch))})",
+                     batch)
+        for row in rows:
+            ttl = XHS_TOPIC_CACHE_TTL if row['topic'] else XHS_TOPIC_EMPTY_TTL
+            if now - row['fetched_at'] < ttl:
+                cached[row['tag']] = json.loads(row['topic']) if row['topic'] else None
+    return cached
+
+
+def _store(fetched):
+    if not fetched:
+        return
+    now = time.time()
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO xhs_topic_cache (tag, topic, fetched_at) VALUES (?, ?, ?)
+        ON CONFLICT(tag) DO UPDATE SET topic = excluded.topic, fetched_at = excluded.fetched_at
+        ''', [(tag, json.dumps(topic, ensure_ascii=False) if topic else None, now)
+              for tag, topic in fetched.items()])
+
+
+def warm_up(xhs_client, tags):
+    """
+    批量预热话题缓存：一次查询找出缺失或过期的标签，只为它们请求接口，结果在一个事务中写入
+
+    Returns:
+        dict: 标签 -> 话题（没有推荐话题时为 None），顺序与去重后的 tags 一致
+    """
+    tags = list(dict.fromkeys(tags))
+    cached = _load(tags)
+    fetched = {}
+    try:
+        for tag in tags:
+            if tag in cached:
+                continue
+            topic_official = xhs_client.get_suggest_topic(tag)
+            if topic_official:
+                topic_official[0]['type'] = 'topic'
+                fetched[tag] = topic_official[0]
+            else:
+                fetched[tag] = None
+    finally:
+        # 中途请求失败时，已经拿到的话题也写入缓存
+        _store(fetched)
+    cached.update(fetched)
+    return {tag: cached[tag] for tag in tags}
+
+
+def get_topics(xhs_client, tags):
+    """
+    返回 create_video_note 使用的 topics：每个标签取推荐的第一个话题，没有推荐话题的标签跳过
+
+    缓存命中时不请求接口，结果与直接调用 get_suggest_topic 相同
+    """
+    topics = warm_up(xhs_client, tags)
+    return [topics[tag] for tag in tags if topics[tag]]
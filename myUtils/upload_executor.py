@@ -0,0 +1,145 @@
+import asyncio
+import threading
+
+from utils.browser_pool import browser_pool
+from utils.rate_limiter import rate_limiter
+
+# 同时进行的上传总数
+UPLOAD_MAX_CONCURRENCY = 4
+# 每个平台同时进行的上传数，未单独配置的平台使用该值
+UPLOAD_PLATFORM_CONCURRENCY = 2
+# 按平台单独配置并发数，例如 {3: 3} 表示抖音最多同时 3 个
+UPLOAD_PLATFORM_LIMITS = {}
+# 平台类型对应的限流平台名
+UPLOAD_PLATFORM_NAMES = {1: 'xhs', 2: 'tencent', 3: 'douyin', 4: 'kuaishou'}
+
+
+class UploadExecutor(object):
+    """
+    基于 asyncio 的多账号并发上传执行器
+
+    - 全局并发上限 max_concurrency
+    - 每个平台的并发上限 platform_limits（未配置的平台使用 default_platform_limit）
+    - 同一个账号的上传严格串行，按提交顺序依次执行（同一份 cookie 同时登录多个浏览器容易触发风控）
+
+    排队等待账号的任务不会占用全局和平台名额，因此总耗时随账号数量而不是 文件数 × 账号数 增长。
+    执行器需要在一个事件循环内使用。
+    """
+
+    def __init__(self, max_concurrency=UPLOAD_MAX_CONCURRENCY, platform_limits=None,
+                 default_platform_limit=UPLOAD_PLATFORM_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.platform_limits = dict(UPLOAD_PLATFORM_LIMITS if platform_limits is None else platform_limits)
+        self.default_platform_limit = default_platform_limit
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._platforms = {}
+        self._accounts = {}
+        self._active_accounts = {}
+
+    def _platform_semaphore(self, platform):
+        if platform not in self._platforms:
+            limit = self.platform_limits.get(platform, self.default_platform_limit)
+            self._platforms[platform] = asyncio.Semaphore(limit)
+        return self._platforms[platform]
+
+    def _account_lock(self, account):
+        if account not in self._accounts:
+            self._accounts[account] = asyncio.Lock()
+        return self._accounts[account]
+
+    @property
+    def busy_accounts(self):
+        """
+        正在上传或已在排队等待的账号
+        """
+        return {account for account, count in self._active_accounts.items() if count}
+
+    def reserve(self, account):
+        """
+        提前把账号标记为忙碌，之后需要以 reserved=True 调用 run_one
+        """
+        account = str(account)
+        self._active_accounts[account] = self._active_accounts.get(account, 0) + 1
+
+    def release(self, account):
+        """
+        撤销 reserve()，用于预留了账号但最终没有调用 run_one 的任务
+        """
+        account = str(account)
+        self._active_accounts[account] -= 1
+        if not self._active_accounts[account]:
+            del self._active_accounts[account]
+
+    async def run_one(self, platform, account, coro_factory, reserved=False):
+        """
+        在并发限制下执行一个上传任务
+
+        Args:
+            platform: 平台标识
+            account: 账号标识（如 cookie 文件路径），同一账号的任务互斥
+            coro_factory: 无参函数，返回真正执行上传的协程（例如 app.main）
+            reserved: 是否已经通过 reserve() 标记过账号
+        """
+        account = str(account)
+        if not reserved:
+            self.reserve(account)
+        try:
+            # 先拿账号锁，再拿平台和全局名额，避免排队中的任务占着名额不干活
+            async with self._account_lock(account):
+                # 等令牌时不占用平台和全局名额，其他账号照常上传
+                await rate_limiter.acquire_async(UPLOAD_PLATFORM_NAMES.get(platform, platform), account)
+                async with self._platform_semaphore(platform):
+                    async with self._global:
+                        return await coro_factory()
+        finally:
+            self.release(account)
+
+    async def run_all(self, tasks):
+        """
+        并发执行一批任务
+
+        Args:
+            tasks: [(platform, account, coro_factory), ...]
+
+        Returns:
+            list: 与 tasks 一一对应的结果，执行出错的任务对应位置为异常对象
+        """
+        async with browser_pool.session():
+            return await asyncio.gather(
+                *(self.run_one(platform, account, factory) for platform, account, factory in tasks),
+                return_exceptions=True)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _ensure_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="upload-executor", daemon=True)
+            thread.start()
+            asyncio.run_coroutine_threadsafe(_hold_session(), loop)
+            _loop = loop
+        return _loop
+
+
+async def _hold_session():
+    # 常驻的最外层会话，多次 run_uploads 之间不会关闭 Playwright 驱动和浏览器
+    async with browser_pool.session():
+        await asyncio.Event().wait()
+
+
+def run_uploads(tasks, **executor_options):
+    """
+    同步入口：并发执行一批上传任务，返回每个任务的结果或异常，可以在任意线程调用
+
+    任务在进程内常驻的后台事件循环中执行（与 login_service 相同），同一进程内多次调用共用浏览器池，
+    只有第一次调用需要冷启动浏览器；每次调用各自使用一个执行器，并发限制不跨调用共享。
+    """
+    async def runner():
+        return await UploadExecutor(**executor_options).run_all(tasks)
+
+    return asyncio.run_coroutine_threadsafe(runner(), _ensure_loop()).result()
@@ -1,19 +1,44 @@
-import asyncio
 import os
-import sqlite3
-import threading
 import time
 import uuid
 from pathlib import Path
-from queue import Queue
+from queue import Empty, Queue
 from flask_cors import CORS
-from myUtils.auth import check_cookie
-from flask import Flask, request, jsonify, Response, render_template, send_from_directory
+from myUtils.auth import check_cookies
+from myUtils.chunk_upload import ChunkUploadError, init_upload, get_upload_status, write_chunk, complete_upload, \
+    start_expiry_sweeper
+from myUtils.cookie_cache import cookie_cache
+from myUtils.database import execute, executemany, query, query_one
+from myUtils.file_serving import send_video_file
+from myUtils.material_store import save_material
+from myUtils.media_normalize import remove_normalized, start_prune_sweeper
+from myUtils.pagination import PaginationError, count_cache, keyset_page, like_pattern, parse_limit
+from myUtils.thumbnails import THUMBNAIL_KINDS, find_content_hash, remove_thumbnails, thumbnail_path, \
+    thumbnail_service
+from flask import Flask, request, jsonify, Response, render_template, send_from_directory, send_file
 from conf import BASE_DIR
 from myUtils.login import get_tencent_cookie, douyin_cookie_gen, get_ks_cookie, xiaohongshu_cookie_gen
-from myUtils.postVideo import post_video_tencent, post_video_DouYin, post_video_ks, post_video_xhs
+from myUtils.login_service import login_service
+from myUtils.publish_history import get_publish_history
+from myUtils.publish_queue import enqueue_publish, get_publish_jobs, publish_worker, retry_jobs
 
 active_queues = {}
+# SSE 登录流的心跳间隔（秒），同时也是发现客户端断开的最长延迟
+SSE_HEARTBEAT_INTERVAL = 15
+# 扫码登录的最长时间（秒），超时后推送 500 并关闭流
+LOGIN_SSE_TIMEOUT = 10 * 60
+# 登录结束状态：200 成功，500 失败
+LOGIN_TERMINAL_STATUSES = ('200', '500')
+# 素材列表可选的排序方式 -> 列名（都有索引）
+MATERIAL_SORT_COLUMNS = {'upload_time': 'upload_time', 'size': 'filesize'}
+# 登录类型 -> 登录协程：1 小红书 2 视频号 3 抖音 4 快手
+LOGIN_FUNCTIONS = {
+    '1': xiaohongshu_cookie_gen,
+    '2': get_tencent_cookie,
+    '3': douyin_cookie_gen,
+    '4': get_ks_cookie,
+}
+
 app = Flask(__name__)
 
 #允许所有来源跨域访问
@@ -80,8 +105,30 @@ def get_file():
     # 拼接完整路径
     file_path = str(Path(BASE_DIR / "videoFile"))
 
-    # 返回文件
-    return send_from_directory(file_path,filename)
+    # 返回文件（支持 Range 断点/拖动进度条和 304 缓存）
+    return send_video_file(file_path, filename)
+
+
+@app.route('/getThumbnail', methods=['GET'])
+def get_thumbnail():
+    """
+    获取素材的封面（kind=poster）或预览雪碧图（kind=sprite），还没生成时返回 404 并触发生成
+    """
+    filename = request.args.get('filename')
+    kind = request.args.get('kind', 'poster')
+    if not filename or kind not in THUMBNAIL_KINDS:
+        return {"error": "filename is required and kind must be poster or sprite"}, 400
+    if '..' in filename or filename.startswith('/'):
+        return {"error": "Invalid filename"}, 400
+
+    content_hash = find_content_hash(filename)
+    path = thumbnail_path(content_hash, kind) if content_hash else None
+    if path is None or not path.exists():
+        if (Path(BASE_DIR / "videoFile") / filename).exists():
+            thumbnail_service.submit(filename, content_hash)
+        return {"error": "thumbnail not ready"}, 404
+    # 按内容哈希命名，内容不会变化，可以长期缓存
+    return send_file(path, conditional=True, etag=True, max_age=365 * 24 * 60 * 60)
 
 
 @app.route('/uploadSave', methods=['POST'])
@@ -109,32 +156,18 @@ def upload_save():
         filename = file.filename
 
     try:
-        # 生成 UUID v1
-        uuid_v1 = uuid.uuid1()
-        print(f"UUID v1: {uuid_v1}")
-
-        # 构造文件名和路径
-        final_filename = f"{uuid_v1}_{filename}"
-        filepath = Path(BASE_DIR / "videoFile" / f"{uuid_v1}_{filename}")
-
-        # 保存文件
-        file.save(filepath)
-
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO file_records (filename, filesize, file_path)
-            VALUES (?, ?, ?)
-                                ''', (filename, round(float(os.path.getsize(filepath)) / (1024 * 1024),2), final_filename))
-            conn.commit()
-            print("✅ 上传文件已记录")
+        # 边写入边计算内容哈希，相同内容的素材只保存一份
+        record, duplicate = save_material(file.stream, filename)
+        # 后台生成封面和预览图
+        thumbnail_service.submit(record['file_path'], record.get('content_hash'))
 
         return jsonify({
             "code": 200,
-            "msg": "File uploaded and saved successfully",
+            "msg": "File already exists" if duplicate else "File uploaded and saved successfully",
             "data": {
-                "filename": filename,
-                "filepath": final_filename
+                "filename": record['filename'],
+                "filepath": record['file_path'],
+                "duplicate": duplicate
             }
         }), 200
 
@@ -145,20 +178,73 @@ def upload_save():
             "data": None
         }), 500
 
+def _chunk_upload_error(e):
+    return jsonify({"code": e.status, "msg": e.msg, "data": e.data}), e.status
+
+
+@app.route('/upload/init', methods=['POST'])
+def chunk_upload_init():
+    """
+    分片上传第一步：创建上传会话
+    body: {"filename": 原始文件名, "size": 文件字节数, "chunkSize": 可选, "customFilename": 可选, "saveRecord": 默认 true}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        session = init_upload(data.get('filename'), data.get('size'), data.get('chunkSize'),
+                              data.get('customFilename'), data.get('saveRecord', True))
+    except ChunkUploadError as e:
+        return _chunk_upload_error(e)
+    return jsonify({"code": 200, "msg": "upload session created", "data": session}), 200
+
+
+@app.route('/upload/status', methods=['GET'])
+def chunk_upload_status():
+    """
+    查询已确认的偏移量，断线后从该偏移量继续上传
+    """
+    try:
+        session = get_upload_status(request.args.get('uploadId'))
+    except ChunkUploadError as e:
+        return _chunk_upload_error(e)
+    return jsonify({"code": 200, "msg": "success", "data": session}), 200
+
+
+@app.route('/upload/chunk', methods=['PUT'])
+def chunk_upload_put():
+    """
+    上传一个分片：query 参数 uploadId / offset，请求体为分片原始字节，
+    请求头 X-Chunk-Sha256 为该分片的 sha256（十六进制，可选，带了才校验）
+    """
+    try:
+        session = write_chunk(request.args.get('uploadId'), request.args.get('offset'), request.stream,
+                              request.content_length, request.headers.get('X-Chunk-Sha256'))
+    except ChunkUploadError as e:
+        return _chunk_upload_error(e)
+    return jsonify({"code": 200, "msg": "chunk saved", "data": session}), 200
+
+
+@app.route('/upload/complete', methods=['POST'])
+def chunk_upload_complete():
+    data = request.get_json(silent=True) or {}
+    try:
+        result = complete_upload(data.get('uploadId'))
+    except ChunkUploadError as e:
+        return _chunk_upload_error(e)
+    thumbnail_service.submit(result['filepath'])
+    return jsonify({"code": 200, "msg": "File uploaded and saved successfully", "data": result}), 200
+
+
 @app.route('/getFiles', methods=['GET'])
 def get_all_files():
+    # 带分页参数时按游标分页返回，否则保持旧接口返回全部记录
+    if any(key in request.args for key in ('limit', 'cursor', 'keyword', 'sort')):
+        return get_files_page()
     try:
-        # 使用 with 自动管理数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row  # 允许通过列名访问结果
-            cursor = conn.cursor()
+        # 查询所有记录
+        rows = query("SELECT * FROM file_records")
 
-            # 查询所有记录
-            cursor.execute("SELECT * FROM file_records")
-            rows = cursor.fetchall()
-
-            # 将结果转为字典列表
-            data = [dict(row) for row in rows]
+        # 将结果转为字典列表
+        data = [dict(row) for row in rows]
 
         return jsonify({
             "code": 200,
@@ -173,36 +259,84 @@ def get_all_files():
         }), 500
 
 
+def get_files_page():
+    """
+    素材分页：limit、cursor（上一页的 nextCursor）、keyword（按文件名搜索）、
+    sort（upload_time / size）、order（desc / asc）
+    """
+    sort = request.args.get('sort', 'upload_time')
+    order = request.args.get('order', 'desc')
+    if sort not in MATERIAL_SORT_COLUMNS or order not in ('desc', 'asc'):
+        return jsonify({"code": 400, "msg": "Invalid sort or order", "data": None}), 400
+    conditions, params = [], []
+    keyword = request.args.get('keyword', '').strip()
+    if keyword:
+        conditions.append("filename LIKE ? ESCAPE '\\'")
+        params.append(like_pattern(keyword))
+    try:
+        page = keyset_page('file_records', f"{sort}:{order}", MATERIAL_SORT_COLUMNS[sort], order == 'desc',
+                           conditions, params, request.args.get('cursor'), parse_limit(request.args.get('limit')))
+    except PaginationError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
+    return jsonify({"code": 200, "msg": "success", "data": page}), 200
+
+
+@app.route('/getAccounts', methods=['GET'])
+def get_accounts_page():
+    """
+    账号分页（不校验 cookie）：limit、cursor、type、status、keyword（按账号名搜索），按 id 倒序
+    """
+    conditions, params = [], []
+    for column in ('type', 'status'):
+        value = request.args.get(column)
+        if value not in (None, ''):
+            if not value.isdigit():
+                return jsonify({"code": 400, "msg": f"Invalid {column}", "data": None}), 400
+            conditions.append(f"{column} = ?")
+            params.append(int(value))
+    keyword = request.args.get('keyword', '').strip()
+    if keyword:
+        conditions.append("userName LIKE ? ESCAPE '\\'")
+        params.append(like_pattern(keyword))
+    try:
+        page = keyset_page('user_info', 'id', 'id', True, conditions, params, request.args.get('cursor'),
+                           parse_limit(request.args.get('limit')))
+    except PaginationError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
+    return jsonify({"code": 200, "msg": "success", "data": page}), 200
+
+
 @app.route("/getValidAccounts",methods=['GET'])
 async def getValidAccounts():
-    with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-        SELECT * FROM user_info''')
-        rows = cursor.fetchall()
-        rows_list = [list(row) for row in rows]
-        print("\n📋 当前数据表内容：")
-        for row in rows:
-            print(row)
-        for row in rows_list:
-            flag = await check_cookie(row[1],row[2])
-            if not flag:
-                row[4] = 0
-                cursor.execute('''
-                UPDATE user_info 
-                SET status = ? 
-                WHERE id = ?
-                ''', (0,row[0]))
-                conn.commit()
-                print("✅ 用户状态已更新")
-        for row in rows:
-            print(row)
-        return jsonify(
-                        {
-                            "code": 200,
-                            "msg": None,
-                            "data": rows_list
-                        }),200
+    rows = query('''
+    SELECT * FROM user_info''')
+    rows_list = [list(row) for row in rows]
+    print("\n📋 当前数据表内容：")
+    for row in rows_list:
+        print(tuple(row))
+
+    # 并发校验所有账号（按平台限流，共用一个浏览器），校验期间不占用数据库连接
+    results = await check_cookies([(row[1], row[2]) for row in rows_list])
+    invalid_ids = []
+    for row, flag in zip(rows_list, results):
+        if not flag:
+            row[4] = 0
+            invalid_ids.append((0, row[0]))
+
+    if invalid_ids:
+        executemany('''
+        UPDATE user_info 
+        SET status = ? 
+        WHERE id = ?
+        ''', invalid_ids)
+        count_cache.invalidate('user_info')
+        print(f"✅ {len(invalid_ids)} 个用户状态已更新")
+    return jsonify(
+                    {
+                        "code": 200,
+                        "msg": None,
+                        "data": rows_list
+                    }),200
 
 @app.route('/deleteFile', methods=['GET'])
 def delete_file():
@@ -216,27 +350,26 @@ def delete_file():
         }), 400
 
     try:
-        # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # 查询要删除的记录
-            cursor.execute("SELECT * FROM file_records WHERE id = ?", (file_id,))
-            record = cursor.fetchone()
-
-            if not record:
-                return jsonify({
-                    "code": 404,
-                    "msg": "File not found",
-                    "data": None
-                }), 404
-
-            record = dict(record)
-
-            # 删除数据库记录
-            cursor.execute("DELETE FROM file_records WHERE id = ?", (file_id,))
-            conn.commit()
+        # 查询要删除的记录
+        record = query_one("SELECT * FROM file_records WHERE id = ?", (file_id,))
+
+        if not record:
+            return jsonify({
+                "code": 404,
+                "msg": "File not found",
+                "data": None
+            }), 404
+
+        record = dict(record)
+
+        # 删除数据库记录
+        execute("DELETE FROM file_records WHERE id = ?", (file_id,))
+        count_cache.invalidate('file_records')
+        # 没有其他素材记录使用同样的内容时，删除各平台的预处理结果和封面
+        content_hash = record.get('content_hash')
+        if content_hash and query_one("SELECT 1 FROM file_records WHERE content_hash = ?", (content_hash,)) is None:
+            remove_normalized(content_hash)
+            remove_thumbnails(content_hash)
 
         return jsonify({
             "code": 200,
@@ -259,27 +392,21 @@ def delete_account():
     account_id = int(request.args.get('id'))
 
     try:
-        # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        # 查询要删除的记录
+        record = query_one("SELECT * FROM user_info WHERE id = ?", (account_id,))
 
-            # 查询要删除的记录
-            cursor.execute("SELECT * FROM user_info WHERE id = ?", (account_id,))
-            record = cursor.fetchone()
+        if not record:
+            return jsonify({
+                "code": 404,
+                "msg": "account not found",
+                "data": None
+            }), 404
 
-            if not record:
-                return jsonify({
-                    "code": 404,
-                    "msg": "account not found",
-                    "data": None
-                }), 404
+        record = dict(record)
 
-            record = dict(record)
-
-            # 删除数据库记录
-            cursor.execute("DELETE FROM user_info WHERE id = ?", (account_id,))
-            conn.commit()
+        # 删除数据库记录
+        execute("DELETE FROM user_info WHERE id = ?", (account_id,))
+        count_cache.invalidate('user_info')
 
         return jsonify({
             "code": 200,
@@ -307,13 +434,24 @@ def login():
     status_queue = Queue()
     active_queues[id] = status_queue
 
+    login_func = LOGIN_FUNCTIONS.get(type)
+    if login_func is None:
+        status_queue.put("500")
+        future = None
+    else:
+        # 提交到常驻的登录服务，与其他登录共用事件循环和浏览器
+        future = login_service.submit(login_func, id, status_queue)
+
     def on_close():
-        print(f"清理队列: {id}")
-        del active_queues[id]
-    # 启动异步任务线程
-    thread = threading.Thread(target=run_async_function, args=(type,id,status_queue), daemon=True)
-    thread.start()
-    response = Response(sse_stream(status_queue,), mimetype='text/event-stream')
+        # 客户端断开时中断还没结束的登录，关闭对应的浏览器窗口
+        if future is not None and not future.done():
+            future.cancel()
+        # 同一账号重复打开登录时，只清理属于自己的队列
+        if active_queues.get(id) is status_queue:
+            print(f"清理队列: {id}")
+            del active_queues[id]
+    response = Response(sse_stream(status_queue, is_done=future.done if future else None, on_close=on_close),
+                        mimetype='text/event-stream')
     response.headers['Cache-Control'] = 'no-cache'
     response.headers['X-Accel-Buffering'] = 'no'  # 关键：禁用 Nginx 缓冲
     response.headers['Content-Type'] = 'text/event-stream'
@@ -325,45 +463,78 @@ def postVideo():
     # 获取JSON数据
     data = request.get_json()
 
-    # 从JSON数据中提取fileList和accountList
-    file_list = data.get('fileList', [])
-    account_list = data.get('accountList', [])
-    type = data.get('type')
-    title = data.get('title')
-    tags = data.get('tags')
-    category = data.get('category')
-    enableTimer = data.get('enableTimer')
-    if category == 0:
-        category = None
-
-    videos_per_day = data.get('videosPerDay')
-    daily_times = data.get('dailyTimes')
-    start_days = data.get('startDays')
     # 打印获取到的数据（仅作为示例）
-    print("File List:", file_list)
-    print("Account List:", account_list)
-    match type:
-        case 1:
-            post_video_xhs(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days)
-        case 2:
-            post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days)
-        case 3:
-            post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                      start_days)
-        case 4:
-            post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                      start_days)
+    print("File List:", data.get('fileList', []))
+    print("Account List:", data.get('accountList', []))
+    # 拆成 文件 × 账号 的任务写入发布队列，由后台 worker 执行，接口立即返回任务 id
+    skipped = []
+    try:
+        job_ids = enqueue_publish(data, skipped)
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"enqueue failed: {e}",
+            "data": None
+        }), 500
+    publish_worker.notify()
     # 返回响应给客户端
     return jsonify(
         {
             "code": 200,
             "msg": None,
-            "data": None
+            "data": {"jobIds": job_ids, "skipped": skipped}
         }), 200
 
 
+@app.route('/getPublishJobs', methods=['GET'])
+def get_publish_jobs_route():
+    # 可选参数：ids=1,2,3 或 status=pending/running/success/failed
+    ids = request.args.get('ids')
+    status = request.args.get('status')
+    try:
+        job_ids = [int(i) for i in ids.split(',') if i.strip()] if ids else None
+    except ValueError:
+        return jsonify({
+            "code": 400,
+            "msg": "Invalid job ids",
+            "data": None
+        }), 400
+    return jsonify({
+        "code": 200,
+        "msg": "success",
+        "data": get_publish_jobs(job_ids, status)
+    }), 200
+
+
+@app.route('/retryPublishJobs', methods=['POST'])
+def retry_publish_jobs_route():
+    # 失败的任务不会自动重试（可能已经发布），确认没有发布后通过这里手动放回队列，请求体 {"ids": [1, 2]}
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return jsonify({"code": 400, "msg": "Invalid job ids", "data": None}), 400
+    count = retry_jobs(ids)
+    if count:
+        publish_worker.notify()
+    return jsonify({"code": 200, "msg": "success", "data": {"retried": count}}), 200
+
+
+@app.route('/getPublishHistory', methods=['GET'])
+def get_publish_history_route():
+    # 可选参数：type（平台）、account（cookiesFile 下的文件名）、limit、cursor（上一页的 nextCursor）、
+    # withTotal=1（需要总数时才统计，默认 total 为 null）
+    type = request.args.get('type')
+    if type not in (None, '') and not type.isdigit():
+        return jsonify({"code": 400, "msg": "Invalid type", "data": None}), 400
+    try:
+        page = get_publish_history(int(type) if type else None, request.args.get('account'),
+                                   request.args.get('cursor'), parse_limit(request.args.get('limit')),
+                                   with_total=request.args.get('withTotal') in ('1', 'true'))
+    except PaginationError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
+    return jsonify({"code": 200, "msg": "success", "data": page}), 200
+
+
 @app.route('/updateUserinfo', methods=['POST'])
 def updateUserinfo():
     # 获取JSON数据
@@ -374,19 +545,15 @@ def updateUserinfo():
     type = data.get('type')
     userName = data.get('userName')
     try:
-        # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # 更新数据库记录
-            cursor.execute('''
-                           UPDATE user_info
-                           SET type     = ?,
-                               userName = ?
-                           WHERE id = ?;
-                           ''', (type, userName, user_id))
-            conn.commit()
+        # 更新数据库记录
+        execute('''
+                UPDATE user_info
+                SET type     = ?,
+                    userName = ?
+                WHERE id = ?;
+                ''', (type, userName, user_id))
+        # 平台变化后按 type 统计的总数也跟着变
+        count_cache.invalidate('user_info')
 
         return jsonify({
             "code": 200,
@@ -407,77 +574,85 @@ def postVideoBatch():
 
     if not isinstance(data_list, list):
         return jsonify({"error": "Expected a JSON array"}), 400
-    for data in data_list:
-        # 从JSON数据中提取fileList和accountList
-        file_list = data.get('fileList', [])
-        account_list = data.get('accountList', [])
-        type = data.get('type')
-        title = data.get('title')
-        tags = data.get('tags')
-        category = data.get('category')
-        enableTimer = data.get('enableTimer')
-        if category == 0:
-            category = None
-
-        videos_per_day = data.get('videosPerDay')
-        daily_times = data.get('dailyTimes')
-        start_days = data.get('startDays')
-        # 打印获取到的数据（仅作为示例）
-        print("File List:", file_list)
-        print("Account List:", account_list)
-        match type:
-            case 1:
-                return
-            case 2:
-                post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                                   start_days)
-            case 3:
-                post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
-            case 4:
-                post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
+    job_ids = []
+    skipped = []
+    try:
+        for data in data_list:
+            # 打印获取到的数据（仅作为示例）
+            print("File List:", data.get('fileList', []))
+            print("Account List:", data.get('accountList', []))
+            job_ids.extend(enqueue_publish(data, skipped))
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"enqueue failed: {e}",
+            "data": {"jobIds": job_ids}
+        }), 500
+    finally:
+        if job_ids:
+            publish_worker.notify()
     # 返回响应给客户端
     return jsonify(
         {
             "code": 200,
             "msg": None,
-            "data": None
+            "data": {"jobIds": job_ids, "skipped": skipped}
         }), 200
 
-# 包装函数：在线程中运行异步函数
-def run_async_function(type,id,status_queue):
-    match type:
-        case '1':
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(xiaohongshu_cookie_gen(id, status_queue))
-            loop.close()
-        case '2':
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(get_tencent_cookie(id,status_queue))
-            loop.close()
-        case '3':
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(douyin_cookie_gen(id,status_queue))
-            loop.close()
-        case '4':
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(get_ks_cookie(id,status_queue))
-            loop.close()
-
 # SSE 流生成器函数
-def sse_stream(status_queue):
-    while True:
-        if not status_queue.empty():
-            msg = status_queue.get()
+def sse_stream(status_queue, is_done=None, on_close=None):
+    """
+    阻塞等待登录状态，没有新消息时定期发送心跳注释
+
+    收到 200 / 500 或登录任务意外结束后关闭流；客户端断开时，下一次心跳写入失败，
+    生成器被关闭，on_close 在 finally 中执行
+    """
+    deadline = time.monotonic() + LOGIN_SSE_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            try:
+                msg = status_queue.get(timeout=SSE_HEARTBEAT_INTERVAL)
+            except Empty:
+                if is_done is not None and is_done() and status_queue.empty():
+                    # 登录任务没有发出结束状态就退出了（例如被取消）
+                    yield "data: 500\n\n"
+                    return
+                yield ": heartbeat\n\n"
+                continue
             yield f"data: {msg}\n\n"
-        else:
-            # 避免 CPU 占满
-            time.sleep(0.1)
+            if msg in LOGIN_TERMINAL_STATUSES:
+                return
+        yield "data: 500\n\n"
+    finally:
+        if on_close is not None:
+            on_close()
+
+def start_background_services():
+    # 后台定期刷新 cookie 校验缓存，账号列表和上传前校验直接读缓存
+    cookie_cache.start_sweeper()
+    # 启动发布 worker，并恢复上次进程退出时未完成的任务
+    publish_worker.start()
+    # 为还没有封面的素材补生成
+    thumbnail_service.scan_missing()
+    # 定期清理放弃的分片上传（.part 文件和会话记录）
+    start_expiry_sweeper()
+    # 定期清理长期未使用的预处理视频
+    start_prune_sweeper()
+
+
+def create_app():
+    """
+    供 gunicorn 使用的入口：启动后台服务后返回 app，文件下载由 gunicorn 用 sendfile 发送
+
+        gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:5409 'sau_backend:create_app()'
+
+    发布 worker 和扫码登录的 SSE 队列都在进程内，只能使用一个 worker 进程，用线程数提高并发
+    """
+    start_background_services()
+    return app
+
 
 if __name__ == '__main__':
+    start_background_services()
+    # 开发服务器在请求线程中逐块读取并发送文件，不使用 sendfile；大量播放/下载素材时建议使用 create_app 的 gunicorn 部署
     app.run(host='0.0.0.0' ,port=5409)
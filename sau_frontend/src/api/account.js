@@ -6,6 +6,11 @@ export const accountApi = {
   getValidAccounts() {
     return http.get('/getValidAccounts')
   },
+
+  // 分页获取账号（不校验 cookie）：{ limit, cursor, type, status, keyword }
+  getAccountsPage(params) {
+    return http.get('/getAccounts', params)
+  },
   
   // 添加账号
   addAccount(data) {
@@ -1,11 +1,31 @@
 import { http } from '@/utils/request'
 
+// 分片大小，与后端默认值一致
+const CHUNK_SIZE = 8 * 1024 * 1024
+
+// 计算分片的 sha256（十六进制）；crypto.subtle 只在安全上下文（HTTPS / localhost）中可用，
+// 通过 http://局域网IP 访问时返回 null，不带校验和上传，后端只在收到校验和时才校验
+const sha256Hex = async (blob) => {
+  if (!window.isSecureContext || !globalThis.crypto?.subtle) return null
+  const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer())
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('')
+}
+
+// 同一个文件断线/刷新后复用之前的上传会话
+const resumeKey = (file, customFilename) => `chunkUpload:${file.name}:${file.size}:${file.lastModified}:${customFilename || ''}`
+
 // 素材管理API
 export const materialApi = {
   // 获取所有素材
   getAllMaterials: () => {
     return http.get('/getFiles')
   },
+
+  // 分页获取素材：{ limit, cursor, keyword, sort: 'upload_time' | 'size', order: 'desc' | 'asc' }
+  // 返回 { items, nextCursor, total }，nextCursor 为空表示没有更多
+  getMaterialsPage: (params) => {
+    return http.get('/getFiles', params)
+  },
   
   // 上传素材
   uploadMaterial: (formData) => {
@@ -13,6 +33,46 @@ export const materialApi = {
     return http.upload('/uploadSave', formData)
   },
   
+  // 分片上传素材，支持断点续传；onProgress(已上传字节数, 总字节数)
+  uploadMaterialChunked: async (file, customFilename, onProgress) => {
+    const key = resumeKey(file, customFilename)
+    let session = null
+    const savedId = localStorage.getItem(key)
+    if (savedId) {
+      try {
+        session = (await http.get('/upload/status', { uploadId: savedId })).data
+        if (session.status !== 'uploading') session = null
+      } catch (error) {
+        session = null
+      }
+    }
+    if (!session) {
+      session = (await http.post('/upload/init', {
+        filename: file.name,
+        size: file.size,
+        chunkSize: CHUNK_SIZE,
+        customFilename: customFilename || undefined
+      })).data
+      localStorage.setItem(key, session.uploadId)
+    }
+
+    let offset = session.offset
+    onProgress && onProgress(offset, file.size)
+    while (offset < file.size) {
+      const chunk = file.slice(offset, offset + session.chunkSize)
+      const checksum = await sha256Hex(chunk)
+      const headers = { 'Content-Type': 'application/octet-stream' }
+      if (checksum) headers['X-Chunk-Sha256'] = checksum
+      const result = await http.put(`/upload/chunk?uploadId=${session.uploadId}&offset=${offset}`, chunk, { headers })
+      offset = result.data.offset
+      onProgress && onProgress(offset, file.size)
+    }
+
+    const response = await http.post('/upload/complete', { uploadId: session.uploadId })
+    localStorage.removeItem(key)
+    return response
+  },
+
   // 删除素材
   deleteMaterial: (id) => {
     return http.get(`/deleteFile?id=${id}`)
@@ -26,5 +86,10 @@ export const materialApi = {
   // 获取素材预览URL
   getMaterialPreviewUrl: (filename) => {
     return `${import.meta.env.VITE_API_BASE_URL || 'http://localhost:5409'}/getFile?filename=${filename}`
+  },
+
+  // 获取素材封面URL，kind 为 poster（封面帧）或 sprite（预览雪碧图）
+  getMaterialPosterUrl: (filename, kind = 'poster') => {
+    return `${import.meta.env.VITE_API_BASE_URL || 'http://localhost:5409'}/getThumbnail?filename=${filename}&kind=${kind}`
   }
 }
\ No newline at end of file
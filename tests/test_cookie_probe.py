@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from myUtils import cookie_probe
+
+# 各平台接口在已登录时返回的数据
+LOGGED_IN_RESPONSES = {
+    'douyin': {'status_code': 0, 'user': {'uid': '1'}},
+    'tencent': {'errCode': 0, 'data': {'finderUser': {'nickname': 'test'}}},
+    'kuaishou': {'result': 1, 'data': {'userId': 1}},
+    'xhs': {'success': True, 'code': 0, 'data': {'userId': 'test'}},
+}
+# cookie 失效时接口重定向到的登录页，需要落在 PROBE_ENDPOINTS 的 login_pages 中
+LOGIN_REDIRECTS = {
+    'douyin': 'https://sso.douyin.com/login/?service=https%3A%2F%2Fcreator.douyin.com',
+    'tencent': 'https://channels.weixin.qq.com/login.html',
+    'kuaishou': 'https://passport.kuaishou.com/pc/account/login/',
+    'xhs': 'https://creator.xiaohongshu.com/login',
+}
+
+
+class _PlatformHandler(BaseHTTPRequestHandler):
+    """
+    模拟平台接口：/<平台>/valid 返回已登录的数据，/<平台>/expired 重定向到登录页，其他路径返回未知格式
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        _, platform, state = self.path.split('/', 2)
+        if state == 'valid':
+            body = json.dumps(LOGGED_IN_RESPONSES[platform]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        elif state == 'expired':
+            body = b''
+            self.send_response(302)
+            self.send_header('Location', LOGIN_REDIRECTS[platform])
+        else:
+            body = b'<html></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+
+@pytest.fixture(scope='module')
+def platform_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PlatformHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def account_file(tmp_path):
+    path = tmp_path / 'account.json'
+    path.write_text(json.dumps({'cookies': [
+        {'name': 'sessionid', 'value': 'test', 'domain': '127.0.0.1', 'path': '/', 'expires': time.time() + 3600},
+    ]}), encoding='utf-8')
+    return str(path)
+
+
+def _point_at(monkeypatch, platform, url):
+    monkeypatch.setitem(cookie_probe.PROBE_ENDPOINTS[platform], 'url', url)
+
+
+@pytest.mark.parametrize('platform', sorted(cookie_probe.PROBE_ENDPOINTS))
+def test_probe_valid_session(monkeypatch, platform_server, account_file, platform):
+    _point_at(monkeypatch, platform, f'{platform_server}/{platform}/valid')
+    assert asyncio.run(cookie_probe.probe_cookie(platform, account_file)) is True
+
+
+@pytest.mark.parametrize('platform', sorted(cookie_probe.PROBE_ENDPOINTS))
+def test_probe_redirect_to_login_page(monkeypatch, platform_server, account_file, platform):
+    _point_at(monkeypatch, platform, f'{platform_server}/{platform}/expired')
+    assert asyncio.run(cookie_probe.probe_cookie(platform, account_file)) is False
+
+
+def test_probe_unknown_response_falls_back(monkeypatch, platform_server, account_file):
+    _point_at(monkeypatch, 'douyin', f'{platform_server}/douyin/changed')
+    assert asyncio.run(cookie_probe.probe_cookie('douyin', account_file)) is None
+
+
+def test_probe_expired_cookies_without_request(monkeypatch, tmp_path):
+    # 没有未过期的 cookie 时直接判定失效，不会发出请求
+    _point_at(monkeypatch, 'douyin', 'http://127.0.0.1:9/douyin/valid')
+    path = tmp_path / 'account.json'
+    path.write_text(json.dumps({'cookies': [
+        {'name': 'sessionid', 'value': 'test', 'domain': '127.0.0.1', 'path': '/', 'expires': time.time() - 60},
+    ]}), encoding='utf-8')
+    assert asyncio.run(cookie_probe.probe_cookie('douyin', str(path))) is False
+
+
+COOKIE_AUTH_PLATFORMS = {
+    'cookie_auth_douyin': 'douyin',
+    'cookie_auth_tencent': 'tencent',
+    'cookie_auth_ks': 'kuaishou',
+    'cookie_auth_xhs': 'xhs',
+}
+
+
+@pytest.mark.parametrize('state, expected', [('valid', True), ('expired', False)])
+@pytest.mark.parametrize('name', sorted(COOKIE_AUTH_PLATFORMS))
+def test_cookie_auth_uses_probe_result(monkeypatch, platform_server, account_file, name, state, expected):
+    # myUtils.auth 依赖 playwright 和 xhs，没有安装时跳过
+    pytest.importorskip('playwright')
+    pytest.importorskip('xhs')
+    from myUtils import auth
+
+    platform = COOKIE_AUTH_PLATFORMS[name]
+    _point_at(monkeypatch, platform, f'{platform_server}/{platform}/{state}')
+
+    def no_browser():
+        raise AssertionError('探测结论明确时不应启动浏览器')
+
+    monkeypatch.setattr(auth.browser_pool, 'session', no_browser)
+    # __wrapped__ 跳过 cookie_cache，直接执行校验
+    assert asyncio.run(getattr(auth, name).__wrapped__(account_file)) is expected
@@ -8,7 +8,10 @@ import time
 import asyncio
 
 from conf import LOCAL_CHROME_PATH
+from myUtils.cookie_cache import save_published_cookie
 from utils.base_social_media import set_init_script
+from utils.browser_pool import browser_pool
+from utils.upload_progress import UploadProgressTracker
 from utils.log import baijiahao_logger
 from utils.network import async_retry
 
@@ -117,11 +120,11 @@ class BaiJiaHaoVideo(object):
         return
         print("视频出错了，重新上传中")
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        browser = await playwright.chromium.launch(headless=False, executable_path=self.local_executable_path, proxy=self.proxy_setting)
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}", user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.4324.150 Safari/537.36')
+    async def upload(self) -> None:
+        # 从浏览器池借出一个上下文，使用指定的 cookie 文件
+        context = await browser_pool.new_context(storage_state=self.account_file, headless=False,
+                                                 executable_path=self.local_executable_path, proxy=self.proxy_setting,
+                                                 user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.4324.150 Safari/537.36')
         # context = await set_init_script(context)
         await context.grant_permissions(['geolocation'])
 
@@ -134,26 +137,31 @@ class BaiJiaHaoVideo(object):
         baijiahao_logger.info('正在打开主页...')
         await page.wait_for_url("https://baijiahao.baidu.com/builder/rc/edit?type=videoV2", timeout=60000)
 
-        # 点击 "上传视频" 按钮
-        await page.locator("div[class^='video-main-container'] input").set_input_files(self.file_path)
-
-        # 等待页面跳转到指定的 URL
-        while True:
-            # 判断是是否进入视频发布页面，没进入，则自动等待到超时
-            try:
-                await page.wait_for_selector("div#formMain:visible")
-                break
-            except:
-                baijiahao_logger.info("正在等待进入视频发布页面...")
-                await asyncio.sleep(0.1)
-
-        # 填充标题和话题
-        # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
-        baijiahao_logger.info("正在填充标题和话题...")
-        await self.add_title_tags(page)
-
-        upload_status = await self.uploading_video(page)
+        # 选择文件之前开始监听上传请求
+        tracker = UploadProgressTracker(page, 'baijiahao', self.file_path, baijiahao_logger).attach()
+        try:
+            # 点击 "上传视频" 按钮
+            await page.locator("div[class^='video-main-container'] input").set_input_files(self.file_path)
+
+            # 等待页面跳转到指定的 URL
+            while True:
+                # 判断是是否进入视频发布页面，没进入，则自动等待到超时
+                try:
+                    await page.wait_for_selector("div#formMain:visible")
+                    break
+                except:
+                    baijiahao_logger.info("正在等待进入视频发布页面...")
+                    await asyncio.sleep(0.1)
+
+            # 填充标题和话题
+            # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
+            await asyncio.sleep(1)
+            baijiahao_logger.info("正在填充标题和话题...")
+            await self.add_title_tags(page)
+
+            upload_status = await self.uploading_video(page, tracker)
+        finally:
+            tracker.detach()
         if not upload_status:
             baijiahao_logger.error(f"发现上传出错了... 文件:{self.file_path}")
             raise
@@ -176,16 +184,15 @@ class BaiJiaHaoVideo(object):
         await page.wait_for_url("https://baijiahao.baidu.com/builder/rc/clue**", timeout=5000)
         baijiahao_logger.success("视频发布成功")
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
+        await save_published_cookie(context, self.account_file)  # 保存cookie
         baijiahao_logger.info('cookie更新完毕！')
         await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+        # 关闭浏览器上下文，浏览器归还到池中
+        await browser_pool.release(context)
 
 
     @async_retry(timeout=300)  # 例如，最多重试3次，超时时间为180秒
-    async def uploading_video(self, page):
+    async def uploading_video(self, page, tracker):
         while True:
             upload_failed = await page.locator('div .cover-overlay:has-text("上传失败")').count()
             if upload_failed:
@@ -195,8 +202,10 @@ class BaiJiaHaoVideo(object):
 
             uploading = await page.locator('div .cover-overlay:has-text("上传中")').count()
             if uploading:
-                baijiahao_logger.info("正在上传视频中...")
-                await asyncio.sleep(2)  # 等待2秒再次检查
+                # 等待上传完成接口返回，出错或超时后再检查一次页面
+                if await tracker.wait():
+                    baijiahao_logger.success("视频上传完毕")
+                    return True
                 continue
 
             # 检查上传是否成功
@@ -244,8 +253,8 @@ class BaiJiaHaoVideo(object):
         await title_container.fill(self.title[:30])
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        async with browser_pool.session():
+            await self.upload()
 
 
 
@@ -1,10 +1,33 @@
+import asyncio
 import json
+import os
 import pathlib
 import random
+import socket
+import threading
+import time
+
+import aiohttp
 from biliup.plugins.bili_webup import BiliBili, Data
 
+from conf import BASE_DIR
 from utils.log import bilibili_logger
 
+# 自适应分片并发（AIMD）：初始、最小、最大并发数
+BILIBILI_UPLOAD_TASKS_START = 2
+BILIBILI_UPLOAD_TASKS_MIN = 1
+BILIBILI_UPLOAD_TASKS_MAX = 16
+# 一轮的吞吐比上一轮高出该比例时并发 +1，低于上一轮的该比例时并发减半
+BILIBILI_AIMD_INCREASE_GAIN = 1.05
+BILIBILI_AIMD_DECREASE_RATIO = 0.8
+# 单个分片的重试次数，每次失败都会让并发减半
+BILIBILI_CHUNK_RETRIES = 10
+# 测速得到的最快线路按网络缓存在这里，有效期内的上传不再测速
+BILIBILI_LINE_CACHE_FILE = pathlib.Path(BASE_DIR / "cookies" / "bilibili_uploader" / "upload_line.json")
+BILIBILI_LINE_CACHE_TTL = 6 * 3600
+
+_line_cache_lock = threading.Lock()
+
 
 def extract_keys_from_json(data):
     """Extract specified keys from the provided JSON data."""
@@ -39,9 +62,163 @@ def random_emoji():
     return random.choice(emoji_list)
 
 
+def _network_key():
+    """
+    当前网络的标识：访问 B 站时使用的本机出口地址（切换网络、代理后会重新测速）；UDP connect 不会发送数据
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("member.bilibili.com", 443))
+            return sock.getsockname()[0]
+    except OSError:
+        return 'default'
+
+
+def _read_line_cache():
+    try:
+        with open(BILIBILI_LINE_CACHE_FILE, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_line_cache(cache):
+    BILIBILI_LINE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = BILIBILI_LINE_CACHE_FILE.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(cache, file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, BILIBILI_LINE_CACHE_FILE)
+
+
+def get_cached_line(network):
+    """
+    返回该网络缓存的最快线路（biliup 的线路 dict），没有或已过期时返回 None
+    """
+    with _line_cache_lock:
+        entry = _read_line_cache().get(network)
+    if entry and time.time() - entry.get('probed_at', 0) < BILIBILI_LINE_CACHE_TTL:
+        return entry['line']
+    return None
+
+
+def save_cached_line(network, line):
+    with _line_cache_lock:
+        cache = _read_line_cache()
+        cache[network] = {'line': line, 'probed_at': time.time()}
+        _write_line_cache(cache)
+
+
+def forget_cached_line(network):
+    with _line_cache_lock:
+        cache = _read_line_cache()
+        if cache.pop(network, None) is not None:
+            _write_line_cache(cache)
+
+
+class AimdConcurrency(object):
+    """
+    按轮调整分片并发：每完成 limit 个分片为一轮，吞吐明显提升则 +1，明显下降或分片出错则减半
+    """
+
+    def __init__(self, start=BILIBILI_UPLOAD_TASKS_START, minimum=BILIBILI_UPLOAD_TASKS_MIN,
+                 maximum=BILIBILI_UPLOAD_TASKS_MAX):
+        self.limit = start
+        self.minimum = minimum
+        self.maximum = maximum
+        self.peak = start
+        self._last_throughput = 0
+        self._settling = False
+
+    def _decrease(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        # 保留减半前的吞吐，下一轮用它判断减半的效果，不再无条件地重新增加并发
+        self._settling = True
+
+    def on_round(self, throughput):
+        if self._settling:
+            # 减半后的第一轮与减半前的吞吐比较：明显变低说明之前的并发是有用的（出错只是偶发），+1 继续试探；
+            # 没有变低说明网络已经饱和，保持不变。之后以这一轮的吞吐作为基准
+            self._settling = False
+            if throughput < self._last_throughput * BILIBILI_AIMD_DECREASE_RATIO:
+                self.limit = min(self.maximum, self.limit + 1)
+            self._last_throughput = throughput
+            return
+        if throughput >= self._last_throughput * BILIBILI_AIMD_INCREASE_GAIN:
+            self.limit = min(self.maximum, self.limit + 1)
+            self.peak = max(self.peak, self.limit)
+            self._last_throughput = throughput
+        elif throughput < self._last_throughput * BILIBILI_AIMD_DECREASE_RATIO:
+            self._decrease()
+        else:
+            self._last_throughput = throughput
+
+    def on_error(self):
+        self._decrease()
+
+
+class AdaptiveBiliBili(BiliBili):
+    """
+    分片并发按实测吞吐自动调整的 BiliBili；adaptive=False 时与 biliup 的固定线程数行为一致
+    """
+
+    def __init__(self, video, adaptive=True):
+        super().__init__(video)
+        self.adaptive = adaptive
+        self.concurrency = None
+
+    async def _upload(self, params, file, chunk_size, afunc, tasks=3):
+        if not self.adaptive:
+            return await BiliBili._upload(params, file, chunk_size, afunc, tasks=tasks)
+        aimd = self.concurrency = AimdConcurrency()
+
+        async def send(session, chunks_data, chunk_params):
+            for i in range(BILIBILI_CHUNK_RETRIES):
+                try:
+                    await afunc(session, chunks_data, chunk_params)
+                    return len(chunks_data)
+                except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                    aimd.on_error()
+                    bilibili_logger.error(f"retry chunk{chunk_params['chunk']} >> {i + 1}. {e}，并发降为 {aimd.limit}")
+            raise Exception(f"分片 {chunk_params['chunk']} 重试 {BILIBILI_CHUNK_RETRIES} 次仍上传失败")
+
+        async with aiohttp.ClientSession() as session:
+            pending = set()
+            index = 0
+            eof = False
+            round_bytes, round_chunks, round_start = 0, 0, time.perf_counter()
+            try:
+                while True:
+                    # 按当前并发上限补充在途分片，只有在途的分片会读入内存
+                    while not eof and len(pending) < aimd.limit:
+                        chunks_data = file.read(chunk_size)
+                        if not chunks_data:
+                            eof = True
+                            break
+                        start = index * chunk_size
+                        chunk_params = dict(params, chunk=index, size=len(chunks_data), partNumber=index + 1,
+                                            start=start, end=start + len(chunks_data))
+                        pending.add(asyncio.ensure_future(send(session, chunks_data, chunk_params)))
+                        index += 1
+                    if not pending:
+                        return
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        round_bytes += task.result()
+                        round_chunks += 1
+                    if round_chunks >= aimd.limit:
+                        now = time.perf_counter()
+                        aimd.on_round(round_bytes / max(now - round_start, 1e-6))
+                        round_bytes, round_chunks, round_start = 0, 0, now
+            finally:
+                for task in pending:
+                    task.cancel()
+
+
 class BilibiliUploader(object):
-    def __init__(self, cookie_data, file: pathlib.Path, title, desc, tid, tags, dtime):
+    def __init__(self, cookie_data, file: pathlib.Path, title, desc, tid, tags, dtime, adaptive=True):
+        # 固定线程数，只在 adaptive=False 时使用
         self.upload_thread_num = 3
+        self.adaptive = adaptive
         self.copyright = 1
         self.lines = 'AUTO'
         self.cookie_data = cookie_data
@@ -62,12 +239,42 @@ class BilibiliUploader(object):
         self.data.set_tag(self.tags)
         self.data.dtime = self.dtime
 
+    def _select_line(self, bili):
+        """
+        AUTO 线路优先使用当前网络缓存的测速结果，没有时测速一次并写入缓存
+        """
+        network = _network_key()
+        line = get_cached_line(network)
+        if line is not None:
+            bili._auto_os = line
+            return network, True
+        line = bili.probe()
+        if line:
+            save_cached_line(network, line)
+            bili._auto_os = line
+        return network, False
+
     def upload(self):
-        with BiliBili(self.data) as bili:
+        with AdaptiveBiliBili(self.data, adaptive=self.adaptive) as bili:
             bili.login_by_cookies(self.cookie_data)
             bili.access_token = self.cookie_data.get('access_token')
-            video_part = bili.upload_file(str(self.file), lines=self.lines,
-                                          tasks=self.upload_thread_num)  # 上传视频，默认线路AUTO自动选择，线程数量3。
+            if self.lines == 'AUTO':
+                network, cached = self._select_line(bili)
+            started = time.perf_counter()
+            try:
+                video_part = bili.upload_file(str(self.file), lines=self.lines,
+                                              tasks=self.upload_thread_num)  # 上传视频，默认线路AUTO自动选择
+            except Exception:
+                # 缓存的线路可能已经不可用，下次重新测速
+                if self.lines == 'AUTO' and cached:
+                    forget_cached_line(network)
+                raise
+            elapsed = time.perf_counter() - started
+            size_mb = os.path.getsize(str(self.file)) / 1024 / 1024
+            concurrency = (f"自适应并发 峰值 {bili.concurrency.peak} / 结束 {bili.concurrency.limit}"
+                           if bili.concurrency else f"固定并发 {self.upload_thread_num}")
+            bilibili_logger.info(f'[+] {self.file.name} 上传 {size_mb:.1f}MB 用时 {elapsed:.1f}s，'
+                                 f'{size_mb / max(elapsed, 1e-6):.2f}MB/s，线路 {bili._auto_os.get("query")}，{concurrency}')
             video_part['title'] = self.title
             self.data.append(video_part)
             ret = bili.submit()  # 提交视频
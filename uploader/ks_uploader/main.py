@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import async_playwright
 import os
 import asyncio
 
 from conf import LOCAL_CHROME_PATH
 from utils.base_social_media import set_init_script
+from utils.browser_pool import browser_pool
+from utils.upload_progress import UploadProgressTracker
 from utils.files_times import get_absolute_path
 from utils.log import kuaishou_logger
+from myUtils.cookie_cache import save_published_cookie
 from myUtils.auth import cookie_auth_ks as cookie_auth, wait_for_login_success
 
 
@@ -69,19 +72,10 @@ class KSVideo(object):
         kuaishou_logger.error("视频出错了，重新上传中")
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        print(self.local_executable_path)
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=self.local_executable_path,
-            )
-        else:
-            browser = await playwright.chromium.launch(
-                headless=self.headless
-            )  # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
+    async def upload(self) -> None:
+        # 从浏览器池借出一个上下文，使用指定的 cookie 文件
+        context = await browser_pool.new_context(storage_state=self.account_file, headless=self.headless,
+                                                 executable_path=self.local_executable_path)
         context = await set_init_script(context)
         # 创建一个新的页面
         page = await context.new_page()
@@ -95,61 +89,64 @@ class KSVideo(object):
         upload_button = page.locator("button[class^='_upload-btn']")
         await upload_button.wait_for(state='visible')  # 确保按钮可见
 
-        async with page.expect_file_chooser() as fc_info:
-            await upload_button.click()
-        file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
-
-        await asyncio.sleep(2)
-
-        # if not await page.get_by_text("封面编辑").count():
-        #     raise Exception("似乎没有跳转到到编辑页面")
-
-        await asyncio.sleep(1)
-
-        # 等待按钮可交互
-        new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
-        if await new_feature_button.count() > 0:
-            await new_feature_button.click()
-
-        kuaishou_logger.info("正在填充标题和话题...")
-        await page.get_by_text("描述").locator("xpath=following-sibling::div").click()
-        kuaishou_logger.info("clear existing title")
-        await page.keyboard.press("Backspace")
-        await page.keyboard.press("Control+KeyA")
-        await page.keyboard.press("Delete")
-        kuaishou_logger.info("filling new  title")
-        await page.keyboard.type(self.title)
-        await page.keyboard.press("Enter")
+        # 选择文件之前开始监听上传请求
+        tracker = UploadProgressTracker(page, 'kuaishou', self.file_path, kuaishou_logger).attach()
+        try:
+            async with page.expect_file_chooser() as fc_info:
+                await upload_button.click()
+            file_chooser = await fc_info.value
+            await file_chooser.set_files(self.file_path)
 
-        # 快手只能添加3个话题
-        for index, tag in enumerate(self.tags[:3], start=1):
-            kuaishou_logger.info("正在添加第%s个话题" % index)
-            await page.keyboard.type(f"#{tag} ")
             await asyncio.sleep(2)
 
-        max_retries = 60  # 设置最大重试次数,最大等待时间为 2 分钟
-        retry_count = 0
-
-        while retry_count < max_retries:
-            try:
-                # 获取包含 '上传中' 文本的元素数量
-                number = await page.locator("text=上传中").count()
-
-                if number == 0:
+            # if not await page.get_by_text("封面编辑").count():
+            #     raise Exception("似乎没有跳转到到编辑页面")
+
+            await asyncio.sleep(1)
+
+            # 等待按钮可交互
+            new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
+            if await new_feature_button.count() > 0:
+                await new_feature_button.click()
+
+            kuaishou_logger.info("正在填充标题和话题...")
+            await page.get_by_text("描述").locator("xpath=following-sibling::div").click()
+            kuaishou_logger.info("clear existing title")
+            await page.keyboard.press("Backspace")
+            await page.keyboard.press("Control+KeyA")
+            await page.keyboard.press("Delete")
+            kuaishou_logger.info("filling new  title")
+            await page.keyboard.type(self.title)
+            await page.keyboard.press("Enter")
+
+            # 快手只能添加3个话题
+            for index, tag in enumerate(self.tags[:3], start=1):
+                kuaishou_logger.info("正在添加第%s个话题" % index)
+                await page.keyboard.type(f"#{tag} ")
+                await asyncio.sleep(2)
+
+            max_wait = 120  # 最大等待时间为 2 分钟
+            started = asyncio.get_running_loop().time()
+
+            while True:
+                try:
+                    # 获取包含 '上传中' 文本的元素数量
+                    number = await page.locator("text=上传中").count()
+
+                    if number == 0:
+                        kuaishou_logger.success("视频上传完毕")
+                        break
+                except Exception as e:
+                    kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
+                if asyncio.get_running_loop().time() - started >= max_wait:
+                    kuaishou_logger.warning("超过最大等待时间，视频上传可能未完成。")
+                    break
+                # 等待上传完成接口返回，出错或超时后再检查一次页面
+                if await tracker.wait():
                     kuaishou_logger.success("视频上传完毕")
                     break
-                else:
-                    if retry_count % 5 == 0:
-                        kuaishou_logger.info("正在上传视频中...")
-                    await asyncio.sleep(2)
-            except Exception as e:
-                kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
-                await asyncio.sleep(2)  # 等待 2 秒后重试
-            retry_count += 1
-
-        if retry_count == max_retries:
-            kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
+        finally:
+            tracker.detach()
 
         # 定时任务
         if self.publish_date != 0:
@@ -179,16 +176,15 @@ class KSVideo(object):
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(1)
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
+        await save_published_cookie(context, self.account_file)  # 保存cookie
         kuaishou_logger.info('cookie更新完毕！')
         await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+        # 关闭浏览器上下文，浏览器归还到池中
+        await browser_pool.release(context)
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        async with browser_pool.session():
+            await self.upload()
 
     async def set_schedule_time(self, page, publish_date):
         kuaishou_logger.info("click schedule")
@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import async_playwright
 import os
 import asyncio
 
 from conf import LOCAL_CHROME_PATH
 from utils.base_social_media import set_init_script
+from utils.browser_pool import browser_pool
+from utils.upload_progress import UploadProgressTracker
 from utils.files_times import get_absolute_path
 from utils.log import tencent_logger
+from myUtils.cookie_cache import save_published_cookie
 from myUtils.auth import cookie_auth_tencent as cookie_auth, wait_for_login_success
 
 
@@ -127,11 +130,11 @@ class TencentVideo(object):
         file_input = page.locator('input[type="file"]')
         await file_input.set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
+    async def upload(self) -> None:
         # 使用 Chromium (这里使用系统内浏览器，用chromium 会造成h264错误
-        browser = await playwright.chromium.launch(headless=False, executable_path=self.local_executable_path)
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
+        # 从浏览器池借出一个上下文，使用指定的 cookie 文件
+        context = await browser_pool.new_context(storage_state=self.account_file, headless=False,
+                                                 executable_path=self.local_executable_path)
         context = await set_init_script(context)
 
         # 创建一个新的页面
@@ -142,18 +145,23 @@ class TencentVideo(object):
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         await page.wait_for_url("https://channels.weixin.qq.com/platform/post/create")
         # await page.wait_for_selector('input[type="file"]', timeout=10000)
-        file_input = page.locator('input[type="file"]')
-        await file_input.set_input_files(self.file_path)
-        # 填充标题和话题
-        await self.add_title_tags(page)
-        # 添加商品
-        # await self.add_product(page)
-        # 合集功能
-        await self.add_collection(page)
-        # 原创选择
-        await self.add_original(page)
-        # 检测上传状态
-        await self.detect_upload_status(page)
+        # 选择文件之前开始监听上传请求
+        tracker = UploadProgressTracker(page, 'tencent', self.file_path, tencent_logger).attach()
+        try:
+            file_input = page.locator('input[type="file"]')
+            await file_input.set_input_files(self.file_path)
+            # 填充标题和话题
+            await self.add_title_tags(page)
+            # 添加商品
+            # await self.add_product(page)
+            # 合集功能
+            await self.add_collection(page)
+            # 原创选择
+            await self.add_original(page)
+            # 检测上传状态
+            await self.detect_upload_status(page, tracker)
+        finally:
+            tracker.detach()
         if self.publish_date != 0:
             await self.set_schedule_time_tencent(page, self.publish_date)
         # 添加短标题
@@ -161,12 +169,11 @@ class TencentVideo(object):
 
         await self.click_publish(page)
 
-        await context.storage_state(path=f"{self.account_file}")  # 保存cookie
+        await save_published_cookie(context, self.account_file)  # 保存cookie
         tencent_logger.success('  [-]cookie更新完毕！')
         await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+        # 关闭浏览器上下文，浏览器归还到池中
+        await browser_pool.release(context)
 
     async def add_short_title(self, page):
         short_title_element = page.get_by_text("短标题", exact=True).locator("..").locator(
@@ -195,7 +202,7 @@ class TencentVideo(object):
                     tencent_logger.info("  [-] 视频正在发布中...")
                     await asyncio.sleep(0.5)
 
-    async def detect_upload_status(self, page):
+    async def detect_upload_status(self, page, tracker):
         while True:
             # 匹配删除按钮，代表视频上传完毕，如果不存在，代表视频正在上传，则等待
             try:
@@ -204,17 +211,17 @@ class TencentVideo(object):
                         'class'):
                     tencent_logger.info("  [-]视频上传完毕")
                     break
-                else:
-                    tencent_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-                    # 出错了视频出错
-                    if await page.locator('div.status-msg.error').count() and await page.locator(
-                            'div.media-status-content div.tag-inner:has-text("删除")').count():
-                        tencent_logger.error("  [-] 发现上传出错了...准备重试")
-                        await self.handle_upload_error(page)
+                # 出错了视频出错
+                if await page.locator('div.status-msg.error').count() and await page.locator(
+                        'div.media-status-content div.tag-inner:has-text("删除")').count():
+                    tencent_logger.error("  [-] 发现上传出错了...准备重试")
+                    await self.handle_upload_error(page)
             except:
                 tencent_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+            # 等待上传完成接口返回，出错或超时后再检查一次页面
+            if await tracker.wait():
+                tencent_logger.info("  [-]视频上传完毕")
+                break
 
     async def add_title_tags(self, page):
         await page.locator("div.input-editor").click()
@@ -257,5 +264,5 @@ class TencentVideo(object):
                 await page.locator('button:has-text("声明原创"):visible').click()
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        async with browser_pool.session():
+            await self.upload()
@@ -2,11 +2,12 @@
 import re
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import async_playwright
 import os
 import asyncio
 from uploader.tk_uploader.tk_config import Tk_Locator
 from utils.base_social_media import set_init_script
+from utils.browser_pool import browser_pool
 from utils.files_times import get_absolute_path
 from utils.log import tiktok_logger
 
@@ -139,9 +140,9 @@ class TiktokVideo(object):
         file_chooser = await fc_info.value
         await file_chooser.set_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.firefox.launch(headless=False)
-        context = await browser.new_context(storage_state=f"{self.account_file}")
+    async def upload(self) -> None:
+        context = await browser_pool.new_context(storage_state=self.account_file, headless=False,
+                                                 browser_type='firefox')
         context = await set_init_script(context)
         page = await context.new_page()
 
@@ -178,9 +179,8 @@ class TiktokVideo(object):
         await context.storage_state(path=f"{self.account_file}")  # save cookie
         tiktok_logger.info('  [-] update cookie！')
         await asyncio.sleep(2)  # close delay for look the video status
-        # close all
-        await context.close()
-        await browser.close()
+        # close context, the browser goes back to the pool
+        await browser_pool.release(context)
 
     async def add_title_tags(self, page):
 
@@ -260,6 +260,6 @@ class TiktokVideo(object):
             self.locator_base = page.locator(Tk_Locator.default) 
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        async with browser_pool.session():
+            await self.upload()
 
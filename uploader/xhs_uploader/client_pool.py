@@ -0,0 +1,109 @@
+import configparser
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from xhs import XhsClient
+
+from conf import BASE_DIR
+from uploader.xhs_uploader.main import sign_local
+
+XHS_ACCOUNTS_FILE = Path(BASE_DIR / "uploader" / "xhs_uploader" / "accounts.ini")
+# cookie 校验通过后的有效期（秒），期内借出客户端不再请求接口校验
+XHS_CLIENT_VALIDATE_TTL = 10 * 60
+XHS_CLIENT_TIMEOUT = 60
+
+
+class XhsCookieInvalid(Exception):
+    pass
+
+
+class _PooledClient(object):
+    def __init__(self, cookies, client):
+        self.cookies = cookies
+        self.client = client
+        self.lock = threading.Lock()
+        # 只缓存校验通过的结果，失败（可能只是网络波动）时下次借出重新校验
+        self.valid = False
+        self.validated_at = 0
+
+
+class XhsClientPool(object):
+    """
+    按账号（accounts.ini 中的配置节名）复用 XhsClient
+
+    - accounts.ini 只在首次使用和文件修改后解析
+    - 客户端的 requests.Session 在多次上传之间保持，复用 keep-alive 连接
+    - cookie 在借出时按需校验，校验通过后 validate_ttl 秒内不再重复校验
+    - XhsClient 每次请求都会改写 session 的签名头，同一个客户端同一时间只借给一个调用方
+    """
+
+    def __init__(self, accounts_file=XHS_ACCOUNTS_FILE, validate_ttl=XHS_CLIENT_VALIDATE_TTL, sign=sign_local):
+        self.accounts_file = accounts_file
+        self.validate_ttl = validate_ttl
+        self.sign = sign
+        self._accounts = {}
+        self._accounts_mtime = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _load_accounts(self):
+        try:
+            mtime = os.stat(self.accounts_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._accounts_mtime:
+            return
+        config = configparser.RawConfigParser()
+        config.read(self.accounts_file)
+        self._accounts = {section: config.get(section, 'cookies') for section in config.sections()
+                          if config.has_option(section, 'cookies')}
+        self._accounts_mtime = mtime
+
+    def _get(self, account):
+        with self._lock:
+            self._load_accounts()
+            cookies = self._accounts.get(account)
+            if cookies is None:
+                raise XhsCookieInvalid(f"accounts.ini 中没有账号 {account}")
+            pooled = self._clients.get(account)
+            # cookie 被更新后换一个新客户端，旧的校验结果也随之作废
+            if pooled is None or pooled.cookies != cookies:
+                pooled = self._clients[account] = _PooledClient(
+                    cookies, XhsClient(cookies, sign=self.sign, timeout=XHS_CLIENT_TIMEOUT))
+            return pooled
+
+    def _validate(self, account, pooled):
+        if pooled.valid and time.monotonic() - pooled.validated_at < self.validate_ttl:
+            return
+        # 注意：该校验cookie方式可能并没那么准确
+        try:
+            pooled.client.get_video_first_frame_image_id("3214")
+        except Exception as e:
+            raise XhsCookieInvalid(f"账号 {account} 的 cookie 已失效: {e}")
+        pooled.valid = True
+        pooled.validated_at = time.monotonic()
+
+    @contextmanager
+    def lease(self, account, validate=True):
+        """
+        借出账号对应的客户端，期间其他调用方使用同一账号会等待
+
+        Raises:
+            XhsCookieInvalid: 账号不存在或 cookie 校验失败
+        """
+        pooled = self._get(account)
+        with pooled.lock:
+            if validate:
+                self._validate(account, pooled)
+            try:
+                yield pooled.client
+            except Exception:
+                # 出错后下次借出时重新校验 cookie
+                pooled.valid = False
+                raise
+
+
+xhs_client_pool = XhsClientPool()
@@ -1,57 +1,34 @@
 import configparser
 import json
-import pathlib
-from time import sleep
 
-import requests
-from playwright.sync_api import sync_playwright
+from conf import XHS_SERVER
+from uploader.xhs_uploader.sign_client import SignClient, SignServiceUnavailable
+from uploader.xhs_uploader.sign_worker import xhs_sign_worker
+from utils.log import xiaohongshu_logger
 
-from conf import BASE_DIR, XHS_SERVER
+# 签名服务不可用（请求失败或已熔断）时是否改用本进程内的签名 worker
+XHS_SIGN_FALLBACK_LOCAL = True
 
 config = configparser.RawConfigParser()
 config.read('accounts.ini')
 
+sign_client = SignClient(XHS_SERVER)
+
 
 def sign_local(uri, data=None, a1="", web_session=""):
-    for _ in range(10):
-        try:
-            with sync_playwright() as playwright:
-                stealth_js_path = pathlib.Path(BASE_DIR / "utils/stealth.min.js")
-                chromium = playwright.chromium
-
-                # 如果一直失败可尝试设置成 False 让其打开浏览器，适当添加 sleep 可查看浏览器状态
-                browser = chromium.launch(headless=True)
-
-                browser_context = browser.new_context()
-                browser_context.add_init_script(path=stealth_js_path)
-                context_page = browser_context.new_page()
-                context_page.goto("https://www.xiaohongshu.com")
-                browser_context.add_cookies([
-                    {'name': 'a1', 'value': a1, 'domain': ".xiaohongshu.com", 'path': "/"}]
-                )
-                context_page.reload()
-                # 这个地方设置完浏览器 cookie 之后，如果这儿不 sleep 一下签名获取就失败了，如果经常失败请设置长一点试试
-                sleep(2)
-                encrypt_params = context_page.evaluate("([url, data]) => window._webmsxyw(url, data)", [uri, data])
-                return {
-                    "x-s": encrypt_params["X-s"],
-                    "x-t": str(encrypt_params["X-t"])
-                }
-        except Exception:
-            # 这儿有时会出现 window._webmsxyw is not a function 或未知跳转错误，因此加一个失败重试趴
-            pass
-    raise Exception("重试了这么多次还是无法签名成功，寄寄寄")
+    # 由常驻的签名 worker 在预热好的页面中签名，每个 a1 只在第一次签名时打开页面
+    return xhs_sign_worker.sign(uri, data, a1)
 
 
 def sign(uri, data=None, a1="", web_session=""):
-    # 填写自己的 flask 签名服务端口地址
-    res = requests.post(f"{XHS_SERVER}/sign",
-                        json={"uri": uri, "data": data, "a1": a1, "web_session": web_session})
-    signs = res.json()
-    return {
-        "x-s": signs["x-s"],
-        "x-t": signs["x-t"]
-    }
+    # 请求 XHS_SERVER 签名服务（python -m uploader.xhs_uploader.sign_server），复用连接，超时和熔断见 sign_client
+    try:
+        return sign_client.sign(uri, data, a1, web_session)
+    except SignServiceUnavailable as e:
+        if not XHS_SIGN_FALLBACK_LOCAL:
+            raise
+        xiaohongshu_logger.warning(f"[xhs-sign] {e}，改为本地签名")
+        return sign_local(uri, data, a1, web_session)
 
 
 def beauty_print(data: dict):
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.log import xiaohongshu_logger
+
+# 连接 / 读取超时（秒）
+XHS_SIGN_CONNECT_TIMEOUT = 3
+XHS_SIGN_READ_TIMEOUT = 30
+# 连接池大小，与并发签名的线程数相当即可
+XHS_SIGN_POOL_SIZE = 16
+# 连接失败或 502/503/504 时的自动重试次数
+XHS_SIGN_HTTP_RETRIES = 2
+# 连续失败多少次后熔断，熔断多久（秒）后放一个请求试探
+XHS_SIGN_BREAKER_THRESHOLD = 5
+XHS_SIGN_BREAKER_RESET = 30
+
+
+class SignServiceUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    简单的熔断器：连续失败 threshold 次后熔断，reset_timeout 秒内直接拒绝；
+    之后只放行一个试探请求，成功则恢复，失败则继续熔断
+    """
+
+    def __init__(self, threshold=XHS_SIGN_BREAKER_THRESHOLD, reset_timeout=XHS_SIGN_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None or self._probing:
+                    xiaohongshu_logger.warning(f"[xhs-sign] 签名服务连续失败 {self._failures} 次，熔断 "
+                                               f"{self.reset_timeout}s")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class SignClient(object):
+    """
+    签名服务客户端：keep-alive 连接池 + 超时 + 有限重试 + 熔断
+
+    熔断期间直接抛出 SignServiceUnavailable，不再等待超时。
+    """
+
+    def __init__(self, base_url, pool_size=XHS_SIGN_POOL_SIZE, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        retry = Retry(total=XHS_SIGN_HTTP_RETRIES, connect=XHS_SIGN_HTTP_RETRIES, backoff_factor=0.2,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset(['POST']))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def sign(self, uri, data=None, a1="", web_session=""):
+        if not self.breaker.allow():
+            raise SignServiceUnavailable(f"签名服务 {self.base_url} 已熔断")
+        try:
+            res = self.session.post(f"{self.base_url}/sign",
+                                    json={"uri": uri, "data": data, "a1": a1, "web_session": web_session},
+                                    timeout=(XHS_SIGN_CONNECT_TIMEOUT, XHS_SIGN_READ_TIMEOUT))
+            res.raise_for_status()
+            signs = res.json()
+            result = {
+                "x-s": signs["x-s"],
+                "x-t": signs["x-t"]
+            }
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.breaker.record_failure()
+            raise SignServiceUnavailable(f"签名服务请求失败: {e}") from e
+        self.breaker.record_success()
+        return result
@@ -0,0 +1,53 @@
+"""
+小红书签名服务，即 conf.XHS_SERVER 指向的 /sign 接口
+
+签名在常驻的 xhs_sign_worker 中执行：每个 a1 对应一个预热好的页面，不同 a1 的请求并发签名。
+
+用法：
+    python -m uploader.xhs_uploader.sign_server --host 127.0.0.1 --port 11901
+"""
+import argparse
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from conf import XHS_SERVER
+from uploader.xhs_uploader.sign_worker import xhs_sign_worker
+from utils.log import xiaohongshu_logger
+
+app = FastAPI(title="小红书签名服务", description="为小红书接口请求生成 x-s / x-t 签名。")
+
+
+class SignRequest(BaseModel):
+    uri: str
+    data: Optional[Any] = None
+    a1: str = ""
+    web_session: str = ""
+
+
+@app.post("/sign", summary="生成 x-s / x-t 签名")
+async def sign(request: SignRequest):
+    try:
+        return await xhs_sign_worker.sign_async(request.uri, request.data, request.a1)
+    except Exception as e:
+        xiaohongshu_logger.error(f"[xhs-sign] 签名失败: {e}")
+        raise HTTPException(status_code=500, detail=f"签名失败: {e}")
+
+
+@app.get("/health", summary="健康检查")
+async def health():
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    server = urlsplit(XHS_SERVER)
+    parser = argparse.ArgumentParser(description="小红书签名服务")
+    parser.add_argument('--host', default=server.hostname or '127.0.0.1')
+    parser.add_argument('--port', type=int, default=server.port or 11901)
+    args = parser.parse_args()
+    # 页面和浏览器都在签名 worker 的后台线程中，这里只需要一个进程
+    uvicorn.run(app, host=args.host, port=args.port)
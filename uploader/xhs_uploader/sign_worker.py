@@ -0,0 +1,183 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from conf import BASE_DIR
+from utils.browser_pool import browser_pool
+from utils.log import xiaohongshu_logger
+
+# 最多同时保持的预热页面数（每个 a1 一个），超出时关闭最久未使用的
+XHS_SIGN_MAX_PAGES = 8
+# 页面空闲超过该时间（秒）后关闭，下次签名时重新预热
+XHS_SIGN_PAGE_IDLE_TTL = 30 * 60
+# 设置 a1 cookie 并刷新后等待签名函数就绪的时间（秒），只在预热时等待一次
+XHS_SIGN_WARMUP_DELAY = 2
+# 单次签名的超时时间（秒）
+XHS_SIGN_TIMEOUT = 10
+# 签名失败时丢弃页面重新预热的次数
+XHS_SIGN_RETRIES = 3
+# 调用方等待签名结果的最长时间（秒），包含首次启动浏览器和预热页面
+XHS_SIGN_WAIT_TIMEOUT = 90
+
+XHS_HOME_URL = "https://www.xiaohongshu.com"
+STEALTH_JS_PATH = Path(BASE_DIR / "utils/stealth.min.js")
+
+
+class _WarmPage(object):
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.last_used = time.monotonic()
+
+
+class XhsSignWorker(object):
+    """
+    常驻的小红书签名 worker
+
+    在独立的后台事件循环线程中保持一个浏览器，每个 a1 对应一个已经打开小红书并设置好 cookie 的页面，
+    签名时直接调用页面里的 window._webmsxyw，不再为每次签名启动浏览器和等待页面加载。
+    不同 a1 的签名并发执行；可以在任意线程同步调用 sign()，也可以在其他事件循环中 await sign_async()。
+    """
+
+    def __init__(self, max_pages=XHS_SIGN_MAX_PAGES, idle_ttl=XHS_SIGN_PAGE_IDLE_TTL):
+        self.max_pages = max_pages
+        self.idle_ttl = idle_ttl
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._warming = {}
+        self._session = None
+        self._sweeper = None
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="xhs-sign-worker", daemon=True)
+                thread.start()
+                # 等浏览器池在后台循环中启动后再返回，之后的签名可以直接借上下文
+                try:
+                    asyncio.run_coroutine_threadsafe(self._start(), loop).result(timeout=XHS_SIGN_WAIT_TIMEOUT)
+                except BaseException:
+                    # 启动失败时停掉后台线程，下次调用重新启动，不留下空转的事件循环
+                    loop.call_soon_threadsafe(loop.stop)
+                    thread.join()
+                    loop.close()
+                    raise
+                self._loop = loop
+            return self._loop
+
+    async def _start(self):
+        loop = asyncio.get_running_loop()
+        entered = loop.create_future()
+        self._session = loop.create_task(self._hold_session(entered))
+        # 等会话进入（Playwright 驱动启动）后再返回；启动失败时把异常抛给调用方
+        await asyncio.wait((entered, self._session), return_when=asyncio.FIRST_COMPLETED)
+        if not entered.done():
+            self._session.result()
+        self._sweeper = loop.create_task(self._sweep_idle_pages())
+
+    async def _hold_session(self, entered):
+        # 常驻的最外层会话（不退出），签名之间不会关闭浏览器；预热的页面不能放在会退出的会话里，否则会被回收
+        async with browser_pool.session():
+            entered.set_result(None)
+            await asyncio.Event().wait()
+
+    async def _sweep_idle_pages(self):
+        while True:
+            await asyncio.sleep(60)
+            await self._close_idle_pages()
+
+    async def _close_idle_pages(self):
+        now = time.monotonic()
+        for a1, warm in list(self._pages.items()):
+            if now - warm.last_used > self.idle_ttl:
+                await self._discard(a1)
+
+    async def _discard(self, a1):
+        warm = self._pages.pop(a1, None)
+        if warm is not None:
+            await browser_pool.release(warm.context)
+
+    async def _warm_up(self, a1):
+        context = await browser_pool.new_context(headless=True)
+        try:
+            await context.add_init_script(path=STEALTH_JS_PATH)
+            page = await context.new_page()
+            await page.goto(XHS_HOME_URL)
+            await context.add_cookies([
+                {'name': 'a1', 'value': a1, 'domain': ".xiaohongshu.com", 'path': "/"}]
+            )
+            await page.reload()
+            # 设置完 cookie 之后要等签名函数初始化，否则签名会失败
+            await asyncio.sleep(XHS_SIGN_WARMUP_DELAY)
+        except Exception:
+            await browser_pool.release(context)
+            raise
+        xiaohongshu_logger.info(f"[xhs-sign] 已预热签名页面 a1={a1[:8]}...")
+        warm = self._pages[a1] = _WarmPage(context, page)
+        while len(self._pages) > self.max_pages:
+            await self._discard(next(iter(self._pages)))
+        return warm
+
+    async def _get_page(self, a1):
+        warm = self._pages.get(a1)
+        if warm is not None:
+            self._pages.move_to_end(a1)
+            return warm
+        # 同一个 a1 的并发请求共用一次预热
+        task = self._warming.get(a1)
+        if task is None:
+            task = self._warming[a1] = asyncio.ensure_future(self._warm_up(a1))
+            task.add_done_callback(lambda t: self._warming.pop(a1, None))
+        return await asyncio.shield(task)
+
+    async def _sign(self, uri, data, a1):
+        last_error = None
+        for _ in range(XHS_SIGN_RETRIES):
+            try:
+                warm = await self._get_page(a1)
+                warm.last_used = time.monotonic()
+                encrypt_params = await asyncio.wait_for(
+                    warm.page.evaluate("([url, data]) => window._webmsxyw(url, data)", [uri, data]),
+                    XHS_SIGN_TIMEOUT)
+                return {
+                    "x-s": encrypt_params["X-s"],
+                    "x-t": str(encrypt_params["X-t"])
+                }
+            except Exception as e:
+                # 有时会出现 window._webmsxyw is not a function 或页面跳转，丢弃页面重新预热
+                last_error = e
+                xiaohongshu_logger.warning(f"[xhs-sign] 签名失败，重新预热页面: {e}")
+                await self._discard(a1)
+        raise Exception(f"重试了 {XHS_SIGN_RETRIES} 次仍无法签名: {last_error}")
+
+    def sign(self, uri, data=None, a1=""):
+        """
+        同步签名，供 XhsClient(sign=...) 使用，可以在多个线程中同时调用
+        """
+        # 先启动后台循环再创建协程，启动失败时不会留下未执行的协程
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._sign(uri, data, a1), loop)
+        try:
+            return future.result(timeout=XHS_SIGN_WAIT_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            # 调用方不再等待，取消后台循环中的签名，避免继续占用页面
+            future.cancel()
+            raise
+
+    async def sign_async(self, uri, data=None, a1=""):
+        """
+        在其他事件循环中签名（例如签名服务），不阻塞调用方的事件循环
+        """
+        # 首次调用需要启动浏览器，放到线程里等，不阻塞调用方的事件循环
+        loop = await asyncio.to_thread(self._ensure_loop)
+        future = asyncio.run_coroutine_threadsafe(self._sign(uri, data, a1), loop)
+        # 超时取消包装的 future 时，后台循环中的签名也会被取消
+        return await asyncio.wait_for(asyncio.wrap_future(future), XHS_SIGN_WAIT_TIMEOUT)
+
+
+xhs_sign_worker = XhsSignWorker()
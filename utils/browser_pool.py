@@ -0,0 +1,227 @@
+import asyncio
+import json
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+from loguru import logger
+from playwright.async_api import async_playwright
+
+# 每种启动参数最多保持的常驻浏览器数量
+DEFAULT_POOL_SIZE = 2
+# 单个浏览器累计创建多少个上下文后回收重启，避免长期运行内存膨胀
+DEFAULT_MAX_USES = 20
+
+
+class _PooledBrowser(object):
+    def __init__(self, browser):
+        self.browser = browser
+        self.uses = 0
+        self.active = 0
+        self.retired = False
+
+
+class _LoopState(object):
+    def __init__(self):
+        self.playwright_manager = None
+        self.playwright = None
+        self.lock = asyncio.Lock()
+        # 有浏览器启动完成（或启动失败）时通知等待方，与 lock 共用一把锁
+        self.launched = asyncio.Condition(self.lock)
+        self.depth = 0
+        # launch key -> [_PooledBrowser]
+        self.browsers = {}
+        # launch key -> 正在启动的浏览器数，启动期间不持有 lock
+        self.launching = {}
+        # context -> (launch key, pooled browser)
+        self.contexts = {}
+        # task -> 该 task 借出但还未归还的 context
+        self.task_contexts = {}
+
+
+class BrowserPool(object):
+    """
+    进程内共享的 Playwright 浏览器池
+
+    - 按启动参数（浏览器类型 / headless / executable_path / proxy / args）分组，每组最多保持 size 个常驻浏览器
+    - 每次上传只新建一个隔离的 BrowserContext（加载账号的 storage_state），不再冷启动整个浏览器
+    - 浏览器累计使用 max_uses 次后标记回收，等其上的上下文全部关闭后再真正关闭
+
+    Playwright 的异步对象绑定在事件循环上，因此每个事件循环各自维护一份浏览器，
+    并跟随该循环里 session() 的最外层调用启动和关闭：
+    在同一个事件循环里批量上传时，外层包一层 `async with browser_pool.session():` 即可复用浏览器。
+
+    sau_backend 中的发布 worker、扫码登录、run_uploads 和 cookie 缓存巡检都运行在各自常驻的后台事件循环中，
+    浏览器在多次调用之间保持；examples / cli_main 等每次 asyncio.run 的脚本仍会在每次调用时冷启动浏览器。
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_uses: int = DEFAULT_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._states = weakref.WeakKeyDictionary()
+        self._states_lock = threading.Lock()
+
+    def configure(self, size: int = None, max_uses: int = None):
+        if size is not None:
+            self.size = size
+        if max_uses is not None:
+            self.max_uses = max_uses
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        with self._states_lock:
+            state = self._states.get(loop)
+            if state is None:
+                state = self._states[loop] = _LoopState()
+            return state
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        可嵌套的池生命周期，最外层退出时关闭当前事件循环的所有浏览器；
+        退出时会归还当前 task 因异常等原因未归还的上下文
+        """
+        state = self._state()
+        async with state.lock:
+            if state.playwright is None:
+                state.playwright_manager = async_playwright()
+                state.playwright = await state.playwright_manager.start()
+            state.depth += 1
+        task = asyncio.current_task()
+        try:
+            yield self
+        finally:
+            for context in list(state.task_contexts.get(task, ())):
+                await self.release(context)
+            async with state.lock:
+                state.depth -= 1
+                if state.depth == 0:
+                    await self._stop(state)
+
+    async def _stop(self, state):
+        for pooled_list in state.browsers.values():
+            for pooled in pooled_list:
+                try:
+                    await pooled.browser.close()
+                except Exception as e:
+                    logger.warning(f"[browser_pool] 关闭浏览器失败: {e}")
+        state.browsers = {}
+        state.contexts = {}
+        state.task_contexts = {}
+        manager = state.playwright_manager
+        state.playwright_manager = None
+        state.playwright = None
+        await manager.__aexit__(None, None, None)
+
+    @staticmethod
+    def _launch_key(browser_type, headless, executable_path, proxy, args):
+        return json.dumps([browser_type, headless, executable_path or None, proxy, list(args or [])], sort_keys=True)
+
+    @staticmethod
+    async def _launch(state, browser_type, headless, executable_path, proxy, args):
+        options = {'headless': headless}
+        if executable_path:
+            options['executable_path'] = executable_path
+        if proxy:
+            options['proxy'] = proxy
+        if args:
+            options['args'] = list(args)
+        browser = await getattr(state.playwright, browser_type).launch(**options)
+        logger.info(f"[browser_pool] 启动新的 {browser_type} 浏览器 headless={headless}")
+        return _PooledBrowser(browser)
+
+    def _check_out(self, pooled):
+        pooled.uses += 1
+        pooled.active += 1
+        if pooled.uses >= self.max_uses:
+            pooled.retired = True
+        return pooled
+
+    async def _acquire_browser(self, state, key, launch_args):
+        async with state.lock:
+            while True:
+                pooled_list = state.browsers.setdefault(key, [])
+                # 丢弃已经断开的浏览器
+                pooled_list[:] = [p for p in pooled_list if p.browser.is_connected()]
+                candidates = [p for p in pooled_list if not p.retired]
+                idle = [p for p in candidates if p.active == 0]
+                launching = state.launching.get(key, 0)
+                if idle:
+                    return self._check_out(idle[0])
+                if len(pooled_list) + launching < self.size or not (candidates or launching):
+                    state.launching[key] = launching + 1
+                    break
+                if candidates:
+                    # 已达到上限，选负载最小的浏览器共享（上下文之间仍然隔离）
+                    return self._check_out(min(candidates, key=lambda p: p.active))
+                # 没有可用的浏览器，等正在启动的浏览器
+                await state.launched.wait()
+
+        # 冷启动需要几秒，期间不持有 lock，其他任务可以继续借用已有的浏览器、归还上下文
+        try:
+            pooled = await self._launch(state, *launch_args)
+        except BaseException:
+            async with state.lock:
+                state.launching[key] -= 1
+                state.launched.notify_all()
+            raise
+        async with state.lock:
+            state.launching[key] -= 1
+            state.browsers.setdefault(key, []).append(pooled)
+            state.launched.notify_all()
+            return self._check_out(pooled)
+
+    async def new_context(self, storage_state=None, headless: bool = True, executable_path: str = None,
+                          proxy: dict = None, args=None, browser_type: str = 'chromium', **context_options):
+        """
+        借出一个新的隔离上下文，用完后必须调用 release()
+        """
+        state = self._state()
+        if state.playwright is None:
+            raise RuntimeError("browser_pool 未启动，请在 `async with browser_pool.session():` 中使用")
+        key = self._launch_key(browser_type, headless, executable_path, proxy, args)
+        pooled = await self._acquire_browser(state, key, (browser_type, headless, executable_path, proxy, args))
+        try:
+            if storage_state is not None:
+                context_options['storage_state'] = f"{storage_state}"
+            context = await pooled.browser.new_context(**context_options)
+        except Exception:
+            await self._give_back(state, key, pooled)
+            raise
+        state.contexts[context] = (key, pooled)
+        state.task_contexts.setdefault(asyncio.current_task(), set()).add(context)
+        return context
+
+    async def release(self, context):
+        """
+        关闭上下文并把浏览器归还到池中，重复调用是安全的
+        """
+        state = self._state()
+        entry = state.contexts.pop(context, None)
+        for task, contexts in list(state.task_contexts.items()):
+            contexts.discard(context)
+            if not contexts:
+                del state.task_contexts[task]
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"[browser_pool] 关闭上下文失败: {e}")
+        if entry is not None:
+            await self._give_back(state, *entry)
+
+    @staticmethod
+    async def _give_back(state, key, pooled):
+        async with state.lock:
+            pooled.active -= 1
+            if pooled.retired and pooled.active == 0:
+                pooled_list = state.browsers.get(key, [])
+                if pooled in pooled_list:
+                    pooled_list.remove(pooled)
+                logger.info(f"[browser_pool] 浏览器已使用 {pooled.uses} 次，回收")
+                try:
+                    await pooled.browser.close()
+                except Exception as e:
+                    logger.warning(f"[browser_pool] 关闭浏览器失败: {e}")
+
+
+browser_pool = BrowserPool()
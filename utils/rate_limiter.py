@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from myUtils.database import transaction
+
+# 每个账号的令牌桶：最多攒 capacity 次，每 interval 秒补充一次
+# 默认与原来"每次发布后强制休眠 30s"的节奏一致，但只限制同一个账号
+RATE_LIMIT_ACCOUNT_CAPACITY = 1
+RATE_LIMIT_ACCOUNT_INTERVAL = 30
+# 每个平台的令牌桶：同一平台下所有账号共享，限制整体发布频率
+RATE_LIMIT_PLATFORM_CAPACITY = 5
+RATE_LIMIT_PLATFORM_INTERVAL = 10
+# 按平台单独配置，例如 {'xhs': {'account': (1, 60), 'platform': (3, 20)}}，值为 (capacity, interval)
+RATE_LIMIT_RULES = {}
+
+
+class TokenBucketLimiter(object):
+    """
+    按 账号 + 平台 两级令牌桶限流，用于规避平台风控
+
+    - 一次发布需要同时从账号桶和平台桶各取一个令牌
+    - 只有自己的桶空了才需要等待，其他账号不受影响
+    - 桶状态保存在 SQLite 中，进程重启后不会"清零"，多进程共用同一个数据库时也能生效
+    """
+
+    def __init__(self, rules=None):
+        self.rules = RATE_LIMIT_RULES if rules is None else rules
+
+    def _buckets(self, platform, account):
+        rule = self.rules.get(platform, {})
+        account_capacity, account_interval = rule.get(
+            'account', (RATE_LIMIT_ACCOUNT_CAPACITY, RATE_LIMIT_ACCOUNT_INTERVAL))
+        platform_capacity, platform_interval = rule.get(
+            'platform', (RATE_LIMIT_PLATFORM_CAPACITY, RATE_LIMIT_PLATFORM_INTERVAL))
+        return [
+            (f"account:{platform}:{account}", account_capacity, account_interval),
+            (f"platform:{platform}", platform_capacity, platform_interval),
+        ]
+
+    def try_acquire(self, platform, account):
+        """
+        尝试取令牌
+
+        Returns:
+            float: 0 表示已取到令牌；否则为还需要等待的秒数（本次没有消耗令牌）
+        """
+        buckets = self._buckets(platform, str(account))
+        now = time.time()
+        # BEGIN IMMEDIATE 保证多进程同时取令牌时不会超发
+        with transaction() as conn:
+            states = []
+            for name, capacity, interval in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?", (name,)).fetchone()
+                if row is None:
+                    tokens = capacity
+                else:
+                    # 系统时间被回拨时不补充，也不倒扣
+                    elapsed = max(0.0, now - row[1])
+                    tokens = min(capacity, row[0] + elapsed / interval)
+                states.append((name, tokens, interval))
+            wait = max(max(0.0, (1 - tokens) * interval) for _, tokens, interval in states)
+            if wait <= 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(name, tokens - 1, now) for name, tokens, _ in states])
+        return wait
+
+    def acquire(self, platform, account):
+        """
+        阻塞直到取到令牌，返回实际等待的秒数
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(platform, account)
+            if wait <= 0:
+                return waited
+            print(f"[rate_limiter] {platform} 账号 {account} 发布过于频繁，等待 {wait:.1f}s")
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, platform, account):
+        """
+        acquire() 的协程版本，等待期间不阻塞事件循环
+        """
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, platform, account)
+            if wait <= 0:
+                return waited
+            print(f"[rate_limiter] {platform} 账号 {account} 发布过于频繁，等待 {wait:.1f}s")
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+rate_limiter = TokenBucketLimiter()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import re
+
+# 各平台视频分片上传 / 上传完成接口的 URL 特征（正则）
+# 平台改版后接口变化时只需要调整这里，识别不到时上传器会退回到页面检测
+UPLOAD_ENDPOINTS = {
+    'douyin': {
+        'chunk': [r'\.(snssdk|bytedance|byteimg)\.com/upload/v1/.*[?&]partNumber=', r'tos-.*[?&]partNumber='],
+        'finish': [r'vod\.bytedanceapi\.com/.*[?&]Action=CommitUploadInner'],
+    },
+    'tencent': {
+        'chunk': [r'/uploadpartdfs'],
+        'finish': [r'/completepartuploaddfs'],
+    },
+    'kuaishou': {
+        'chunk': [r'/api/upload/fragment'],
+        'finish': [r'/api/upload/complete', r'/rest/cp/works/v2/video/pc/upload/finish'],
+    },
+    'baijiahao': {
+        'chunk': [r'bcebos\.com/.*[?&]partNumber='],
+        'finish': [r'^(?!.*partNumber=).*bcebos\.com/.*[?&]uploadId='],
+    },
+}
+# 网络事件之外，兜底检查页面状态的间隔（秒）；不超过原来的 2 秒轮询间隔，接口特征失效时也不会更晚发现上传完成
+UPLOAD_PROGRESS_FALLBACK_INTERVAL = 2
+# 每上传多少百分比打印一次进度
+UPLOAD_PROGRESS_LOG_STEP = 10
+
+
+class UploadProgressTracker(object):
+    """
+    通过监听页面的网络请求跟踪视频上传进度
+
+    - 分片请求成功后累加字节数，得到真实的上传进度
+    - 命中"上传完成"接口时 done 立即完成，上传器不必等到下一次检查页面
+    - 分片请求失败时唤醒等待方，让上传器立即检查页面上的错误提示
+
+    用法：在选择文件之前 attach，之后循环"检查一次页面 -> `await tracker.wait()`"，
+    wait 返回 True 表示上传完成；返回 False 表示出错或到了兜底检查的时间，由上传器再检查一次页面。
+    """
+
+    def __init__(self, page, platform, file_path=None, logger=None,
+                 fallback_interval=UPLOAD_PROGRESS_FALLBACK_INTERVAL):
+        endpoints = UPLOAD_ENDPOINTS.get(platform, {})
+        self.page = page
+        self.platform = platform
+        self.logger = logger
+        self.fallback_interval = fallback_interval
+        self._chunk_patterns = [re.compile(p) for p in endpoints.get('chunk', [])]
+        self._finish_patterns = [re.compile(p) for p in endpoints.get('finish', [])]
+        try:
+            self.total_bytes = os.path.getsize(file_path) if file_path else 0
+        except OSError:
+            self.total_bytes = 0
+        self.sent_bytes = 0
+        self.chunks = 0
+        self.errors = 0
+        self.done = asyncio.get_running_loop().create_future()
+        self._changed = asyncio.Event()
+        self._last_logged = -1
+        self._attached = False
+
+    def attach(self):
+        if not self._attached:
+            self.page.on("response", self._on_response)
+            self.page.on("requestfailed", self._on_request_failed)
+            self._attached = True
+        return self
+
+    def detach(self):
+        if self._attached:
+            self.page.remove_listener("response", self._on_response)
+            self.page.remove_listener("requestfailed", self._on_request_failed)
+            self._attached = False
+
+    @property
+    def percent(self):
+        if not self.total_bytes:
+            return None
+        return min(100.0, self.sent_bytes * 100.0 / self.total_bytes)
+
+    @staticmethod
+    def _match(patterns, url):
+        return any(p.search(url) for p in patterns)
+
+    def _log(self, message, level='info'):
+        if self.logger:
+            getattr(self.logger, level)(message)
+        else:
+            print(message)
+
+    async def _on_response(self, response):
+        url = response.url
+        if self._match(self._chunk_patterns, url):
+            if response.ok:
+                self.chunks += 1
+                try:
+                    self.sent_bytes += (await response.request.sizes())['requestBodySize']
+                except Exception:
+                    pass
+                self._log_progress()
+            else:
+                self.errors += 1
+                self._log(f"  [-] 分片上传失败 HTTP {response.status}", 'warning')
+                self._changed.set()
+        elif self._match(self._finish_patterns, url) and response.ok and not self.done.done():
+            self.sent_bytes = max(self.sent_bytes, self.total_bytes)
+            self.done.set_result(True)
+            self._changed.set()
+
+    def _on_request_failed(self, request):
+        if self._match(self._chunk_patterns, request.url) or self._match(self._finish_patterns, request.url):
+            self.errors += 1
+            self._log(f"  [-] 上传请求失败: {request.failure}", 'warning')
+            self._changed.set()
+
+    def _log_progress(self):
+        percent = self.percent
+        if percent is None:
+            return
+        step = int(percent // UPLOAD_PROGRESS_LOG_STEP)
+        if step > self._last_logged:
+            self._last_logged = step
+            self._log(f"  [-] 正在上传视频中... {percent:.0f}% ({self.sent_bytes}/{self.total_bytes} 字节)")
+
+    async def wait(self, timeout=None):
+        """
+        等待上传完成或上传状态发生变化
+
+        Returns:
+            bool: True 表示命中了上传完成接口；False 表示超时或出现了错误，调用方需要检查页面
+        """
+        if self.done.done():
+            return True
+        self._changed.clear()
+        changed = asyncio.ensure_future(self._changed.wait())
+        try:
+            await asyncio.wait([self.done, changed], timeout=timeout or self.fallback_interval,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            changed.cancel()
+        return self.done.done()